@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import queue as queue_lib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from ExecutionContext import ExecutionContext
+from ResponseCache import PAGE_NOT_MODIFIED
+
+ASYNC_PREFIX = "AsyncFetchEngine: "
+WORKER_DRIVER = 'WebSitesScrapingWorker'
+
+
+def drain_queue(queue, first_msg, batch_size):
+    '''
+    Pull up to batch_size works from the queue without blocking
+    :param queue: the WLO works queue
+    :param first_msg: the work WLO already gave to the worker
+    :param batch_size: max works to return (including first_msg)
+    :return: list of works - first_msg is always the first one
+    '''
+    msgs = [first_msg]
+    while len(msgs) < batch_size:
+        try:
+            msg = queue.get_nowait()
+        except queue_lib.Empty:
+            break
+
+        # not our work - give it back to the queue
+        if msg['params'].get('worker_driver') != WORKER_DRIVER:
+            queue.put(msg)
+            queue.task_done()
+            break
+        msgs.append(msg)
+    logging.debug(f"{ASYNC_PREFIX}Pulled {len(msgs)} works from the queue")
+    return msgs
+
+
+class AsyncFetchEngine(object):
+    '''
+    Overlap the network I/O of many works in a single process.
+    Up to `concurrency` pages are fetched at the same time (and up to `per_host` for the same host), every page is
+    handed to the worker scrap flow as soon as it arrives.
+    The flow execution itself runs on the event loop thread - one page at a time (the flows are CPU bound, threads
+    would not run them faster). Every flow has its own ExecutionContext, the worker itself keeps no work state.
+
+    With a flow pool (FlowProcessPool) the flows run on the pool processes instead, while the loop keeps fetching.
+
+    :param worker: WebSiteScarperWorker
+    :param concurrency: max fetches in flight
+    :param per_host: max fetches in flight for the same host
+    :param flow_pool: FlowProcessPool or None
+    '''
+
+    def __init__(self, worker, concurrency=16, per_host=4, flow_pool=None):
+        self.worker = worker
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.flow_pool = flow_pool
+
+    def run(self, msgs):
+        '''
+        :return: list of the works results (by the works order) - failed work result is the raised exception
+        '''
+        return asyncio.run(self._run(msgs))
+
+    async def _run(self, msgs):
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        in_flight = asyncio.Semaphore(self.concurrency)
+        hosts = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+        try:
+            return await asyncio.gather(*[self._work(msg, executor, in_flight, hosts) for msg in msgs])
+        finally:
+            executor.shutdown(wait=True)
+
+    async def _work(self, msg, executor, in_flight, hosts):
+        loop = asyncio.get_running_loop()
+        URL = msg['payload']['url_to_scrap']
+        try:
+            scrap_flow = self.worker.load_flow(msg['payload'])
+            # the preProcess actions and the flow share the work context
+            ctx = ExecutionContext.for_work(msg)
+            # the host slot first - works that wait for a busy host must not hold the global slots of the other hosts
+            async with hosts[urlparse(URL).netloc]:
+                async with in_flight:
+                    page = await loop.run_in_executor(executor, self.worker.fetch_page, URL, scrap_flow,
+                                                      msg['params'], ctx)
+            # not modified page - the flow is skipped by the worker, the sentinel can't be handed to the pool
+            if self.flow_pool and page is not PAGE_NOT_MODIFIED:
+                return await asyncio.wrap_future(self.flow_pool.submit(msg, page, ctx.execution_vars))
+            return self.worker.scrap_page(msg, page, scrap_flow, ctx)
+        except Exception as e:
+            logging.exception(f"{ASYNC_PREFIX}Failed to scrap - {URL}")
+            return e
@@ -0,0 +1,271 @@
+import atexit
+import logging
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+BROWSER_PREFIX = "BrowserPool: "
+
+# Default browser pool settings - can be overridden per execution with the browserPool execution param
+DEFAULT_BROWSER_CONFIG = {
+    # max live browsers per worker process
+    'maxBrowsers': 1,
+    # the browser is recycled (quit and relaunched) after serving this number of pages
+    'maxPagesPerBrowser': 50,
+    'headless': True,
+}
+
+# Default readiness wait of a dynamic page - can be overridden with waitFor in the flow (see wait_for_page)
+DEFAULT_WAIT_CONFIG = {
+    'readyState': 'complete',
+    # ms without new network requests
+    'networkIdle': 500,
+    'selector': None,
+    # max seconds to wait
+    'timeout': 5,
+}
+WAIT_POLL_INTERVAL = 0.1
+READY_STATES = ('loading', 'interactive', 'complete')
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def resolve_driver_path():
+    '''
+    Resolve the chromedriver binary once per process (webdriver manager check the web for the latest driver)
+    '''
+    global _driver_path
+    with _driver_path_lock:
+        if not _driver_path:
+            from webdriver_manager.chrome import ChromeDriverManager
+            _driver_path = ChromeDriverManager().install()
+            logging.info(f"{BROWSER_PREFIX}Using chrome driver - {_driver_path}")
+        return _driver_path
+
+
+def create_driver(headless=True):
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+
+    try:
+        from selenium.webdriver.chrome.service import Service
+    except ImportError:
+        # selenium 3
+        return webdriver.Chrome(resolve_driver_path(), options=options)
+    return webdriver.Chrome(service=Service(resolve_driver_path()), options=options)
+
+
+def wait_for_page(driver, wait_for=None):
+    '''
+    Wait till the loaded page is ready instead of sleeping a fixed time
+    :param driver: web driver after driver.get(URL)
+    :param wait_for: optional conditions (all of them must be met)
+            readyState - minimal document.readyState (loading / interactive / complete)
+            networkIdle - ms without new network requests
+            selector - css selector of an element that must be present
+            timeout - max seconds to wait
+    :return: True if the page is ready, False if the timeout was reached
+    '''
+    config = dict(DEFAULT_WAIT_CONFIG)
+    if wait_for:
+        config.update(wait_for)
+
+    ready_state = config['readyState']
+    network_idle = config['networkIdle'] / 1000 if config['networkIdle'] else None
+    selector = config['selector']
+    deadline = time.monotonic() + config['timeout']
+
+    last_requests_count = -1
+    last_request_time = time.monotonic()
+    while True:
+        now = time.monotonic()
+        ready = True
+        if ready_state:
+            state = driver.execute_script('return document.readyState')
+            ready = state in READY_STATES and READY_STATES.index(state) >= READY_STATES.index(ready_state)
+        if ready and selector:
+            ready = driver.execute_script('return document.querySelector(arguments[0]) !== null', selector)
+        if network_idle:
+            requests_count = driver.execute_script("return performance.getEntriesByType('resource').length")
+            if requests_count != last_requests_count:
+                last_requests_count = requests_count
+                last_request_time = now
+            ready = ready and now - last_request_time >= network_idle
+
+        if ready:
+            return True
+        if now >= deadline:
+            logging.warning(f"{BROWSER_PREFIX}Page is not ready after {config['timeout']} seconds - {driver.current_url}")
+            return False
+        time.sleep(WAIT_POLL_INTERVAL)
+
+
+class BrowserPool(object):
+    '''
+    Pool of long lived web drivers.
+    Works lease a driver, use it and give it back. Between two leases the driver is reset (extra tabs closed,
+    cookies cleared, blank page loaded), after maxPagesPerBrowser leases the browser is recycled.
+    All the browsers are closed on process exit.
+
+    :param max_browsers: max live browsers - lease wait once all of them are in use
+    :param max_pages_per_browser: recycle a browser after this number of leases
+    :param headless: launch headless chrome
+    '''
+
+    def __init__(self, max_browsers=1, max_pages_per_browser=50, headless=True):
+        self.max_browsers = max_browsers
+        self.max_pages_per_browser = max_pages_per_browser
+        self.headless = headless
+        self._idle = []
+        self._pages = {}
+        self._condition = threading.Condition()
+        self._closed = False
+
+    @contextmanager
+    def lease(self):
+        driver = self._acquire()
+        try:
+            yield driver
+        finally:
+            self._release(driver)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            drivers = [driver for driver in self._pages.keys() if driver is not None]
+            self._idle = []
+            self._pages = {}
+            self._condition.notify_all()
+        for driver in drivers:
+            self._quit(driver)
+
+    def _acquire(self):
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError(f"{BROWSER_PREFIX}Browser pool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if len(self._pages) < self.max_browsers:
+                    # reserve the slot before launching the browser (outside the lock)
+                    self._pages[None] = self._pages.get(None, 0) + 1
+                    break
+                self._condition.wait()
+
+        try:
+            logging.info(f"{BROWSER_PREFIX}Launching new browser")
+            driver = create_driver(self.headless)
+        except Exception:
+            with self._condition:
+                self._free_reservation()
+                self._condition.notify()
+            raise
+
+        with self._condition:
+            self._free_reservation()
+            closed = self._closed
+            if not closed:
+                self._pages[driver] = 0
+        if closed:
+            self._quit(driver)
+            raise RuntimeError(f"{BROWSER_PREFIX}Browser pool is closed")
+        return driver
+
+    def _free_reservation(self):
+        if None not in self._pages:
+            return
+        self._pages[None] -= 1
+        if self._pages[None] == 0:
+            del self._pages[None]
+
+    def _release(self, driver):
+        with self._condition:
+            if driver not in self._pages:
+                # pool was closed while the driver was leased
+                recycle = True
+            else:
+                self._pages[driver] += 1
+                recycle = self._pages[driver] >= self.max_pages_per_browser
+
+        if not recycle:
+            try:
+                self._reset(driver)
+            except Exception:
+                logging.warning(f"{BROWSER_PREFIX}Failed to reset browser - going to recycle it")
+                recycle = True
+
+        with self._condition:
+            if recycle:
+                self._pages.pop(driver, None)
+            else:
+                self._idle.append(driver)
+            self._condition.notify()
+
+        if recycle:
+            logging.debug(f"{BROWSER_PREFIX}Recycle browser")
+            self._quit(driver)
+
+    def _reset(self, driver):
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.delete_all_cookies()
+        driver.get('about:blank')
+
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            logging.warning(f"{BROWSER_PREFIX}Failed to quit browser")
+
+
+_browser_pool = None
+_browser_config = dict(DEFAULT_BROWSER_CONFIG)
+_pool_lock = threading.Lock()
+
+
+def configure_browser_pool(browser_config=None):
+    '''
+    Set the pool settings - take effect only before the first lease of the process
+    '''
+    if browser_config:
+        _browser_config.update(browser_config)
+
+
+def get_browser_pool():
+    global _browser_pool
+    with _pool_lock:
+        if not _browser_pool:
+            _browser_pool = BrowserPool(max_browsers=_browser_config['maxBrowsers'],
+                                        max_pages_per_browser=_browser_config['maxPagesPerBrowser'],
+                                        headless=_browser_config['headless'])
+            _register_teardown(_browser_pool)
+        return _browser_pool
+
+
+def _register_teardown(pool):
+    atexit.register(pool.close)
+
+    # WLO workers are daemon processes that are terminated (SIGTERM) by the manager - atexit is not called then
+    if threading.current_thread() is not threading.main_thread():
+        return
+    previous_handler = signal.getsignal(signal.SIGTERM)
+
+    def on_sigterm(signum, frame):
+        pool.close()
+        if callable(previous_handler):
+            previous_handler(signum, frame)
+        elif previous_handler != signal.SIG_IGN:
+            os._exit(128 + signum)
+
+    signal.signal(signal.SIGTERM, on_sigterm)
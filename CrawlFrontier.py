@@ -0,0 +1,275 @@
+'''
+Crawl frontier - urls discovered by the flows (enqueueUrls action) are scraped in the same run.
+Enabled with the frontier execution param:
+
+    EXECUTION_PARAMS='{"urls": ..., "scarpFlowYAml": ..., "frontier": {"dir": "crawl_frontier", "maxDepth": 2}}'
+
+The frontier is a sqlite file shared by the message creator and the workers:
+    * the visited set - one row per (canonical url, flow), a url that was seen once is never added again
+    * the pending urls - the message creator send them as works while the workers are still running, and stop once
+      nothing is pending or in flight (sent or taken by a worker less than inFlightTimeout ago)
+A work that is still queued inFlightTimeout after it was sent, while the workers took later works, is considered
+lost (e.g. the worker died between the dequeue and marking it taken) and its urls are sent again.
+The workers must be started before the message creator - with no work taken by a worker for workerStartTimeout
+seconds the message creator stops sending the discovered urls (they are kept for a resume run), as it does after
+maxSeconds.
+Limits - maxDepth (the seed urls are depth 0), sameDomain (stay on the host of the page that found the url),
+allowedDomains (host suffixes) and maxUrls (max urls in the frontier).
+'''
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+from Dedup import canonicalize_url
+
+FRONTIER_PREFIX = "CrawlFrontier: "
+
+DEFAULT_FRONTIER_CONFIG = {
+    'dir': 'crawl_frontier',
+    'maxDepth': 2,
+    'sameDomain': True,
+    'allowedDomains': [],
+    'maxUrls': 1000000,
+    # seconds to wait for a work sent to the queue or taken by a worker before it is considered lost (the worker
+    # process died)
+    'inFlightTimeout': 600,
+    # seconds between two checks of the message creator for new urls
+    'pollInterval': 0.5,
+    # seconds to wait for the first work taken by a worker (the workers are not running)
+    'workerStartTimeout': 300,
+    # max seconds of sending the discovered urls (None - till the crawl is done)
+    'maxSeconds': None,
+}
+
+PENDING = 'pending'
+# in the works queue
+SENT = 'sent'
+# dequeued by a worker
+TAKEN = 'taken'
+DONE = 'done'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS frontier (
+    key BLOB PRIMARY KEY,
+    url TEXT NOT NULL,
+    flow TEXT NOT NULL,
+    title TEXT,
+    depth INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    updated REAL NOT NULL
+)
+'''
+_STATE_INDEX = 'CREATE INDEX IF NOT EXISTS frontier_state ON frontier (state, updated)'
+
+
+def build_frontier_config(frontier_config=None):
+    config = dict(DEFAULT_FRONTIER_CONFIG)
+    if frontier_config:
+        config.update(frontier_config)
+    return config
+
+
+def flow_reference(payload):
+    '''
+    :return: the flow part of a work payload as text (scrap_flow path or inline flow)
+    '''
+    return json.dumps({key: payload[key] for key in ('scrap_flow', 'inline_scrap_flow') if key in payload},
+                      sort_keys=True)
+
+
+def frontier_key(url, flow):
+    return hashlib.blake2b(f'{canonicalize_url(url)}\0{flow}'.encode('utf-8'), digest_size=16).digest()
+
+
+class FrontierUrl(object):
+    __slots__ = ('url', 'flow', 'title', 'depth')
+
+    def __init__(self, url, flow, title, depth):
+        self.url = url
+        self.flow = flow
+        self.title = title
+        self.depth = depth
+
+    def payload(self):
+        return dict(json.loads(self.flow), url_to_scrap=self.url, depth=self.depth)
+
+
+class CrawlFrontier(object):
+    '''
+    :param config: frontier config (see DEFAULT_FRONTIER_CONFIG)
+    '''
+
+    def __init__(self, config):
+        self.config = config
+        os.makedirs(config['dir'], exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(config['dir'], 'frontier.db'), timeout=30, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(_SCHEMA)
+        self._db.execute(_STATE_INDEX)
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._db.execute('DELETE FROM frontier')
+
+    def requeue_in_flight(self):
+        '''
+        Resume - the works that were sent by the previous run are sent again
+        '''
+        with self._lock:
+            self._db.execute('UPDATE frontier SET state = ?, updated = ? WHERE state IN (?, ?)',
+                             (PENDING, time.time(), SENT, TAKEN))
+
+    def add_seed(self, url, flow, title):
+        '''
+        Register a url of the urls file (sent by the message creator itself)
+        '''
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO frontier (key, url, flow, title, depth, state, updated) '
+                             'VALUES (?, ?, ?, ?, 0, ?, ?)',
+                             (frontier_key(url, flow), url, flow, title, SENT, time.time()))
+
+    def add(self, urls, flow, title, depth, source_url=None):
+        '''
+        Add discovered urls - already visited urls and urls out of the limits are ignored
+        :param urls: urls (relative urls are resolved against source_url)
+        :param depth: depth of the new urls
+        :return: number of new urls
+        '''
+        if depth > self.config['maxDepth']:
+            return 0
+        source_host = urlsplit(source_url).hostname if source_url else None
+        rows = []
+        for url in urls:
+            url = urljoin(source_url, url) if source_url else url
+            url = url.split('#', 1)[0]
+            parts = urlsplit(url)
+            if parts.scheme not in ('http', 'https') or not self._allowed_host(parts.hostname, source_host):
+                continue
+            rows.append((frontier_key(url, flow), url, flow, title, depth, PENDING, time.time()))
+        if not rows:
+            return 0
+
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                free = self.config['maxUrls'] - self._db.execute('SELECT COUNT(*) FROM frontier').fetchone()[0]
+                before = self._db.total_changes
+                self._db.executemany('INSERT OR IGNORE INTO frontier (key, url, flow, title, depth, state, updated) '
+                                     'VALUES (?, ?, ?, ?, ?, ?, ?)', rows[:max(0, free)])
+                added = self._db.total_changes - before
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+        logging.debug(f"{FRONTIER_PREFIX}{added} new urls of depth {depth}")
+        return added
+
+    def take_pending(self, limit):
+        '''
+        :return: up to limit pending urls - they are marked as sent
+        '''
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._db.execute('SELECT key, url, flow, title, depth FROM frontier WHERE state = ? LIMIT ?',
+                                        (PENDING, limit)).fetchall()
+                now = time.time()
+                self._db.executemany('UPDATE frontier SET state = ?, updated = ? WHERE key = ?',
+                                     [(SENT, now, row[0]) for row in rows])
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+        return [FrontierUrl(*row[1:]) for row in rows]
+
+    def requeue_lost(self):
+        '''
+        The works that are queued for more than inFlightTimeout while later works were taken by the workers are lost -
+        their urls are pending again
+        :return: number of requeued urls
+        '''
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                last_taken = self._db.execute('SELECT MAX(updated) FROM frontier WHERE state IN (?, ?)',
+                                              (TAKEN, DONE)).fetchone()[0] or 0
+                before = self._db.total_changes
+                self._db.execute('UPDATE frontier SET state = ?, updated = ? WHERE state = ? AND updated < ?',
+                                 (PENDING, time.time(), SENT,
+                                  min(last_taken, time.time() - self.config['inFlightTimeout'])))
+                requeued = self._db.total_changes - before
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+        if requeued:
+            logging.warning(f"{FRONTIER_PREFIX}{requeued} queued urls were not taken by a worker for "
+                            f"{self.config['inFlightTimeout']}s - sending them again")
+        return requeued
+
+    def mark_taken(self, urls, flow):
+        '''
+        The works of the urls were dequeued by a worker - the in flight timeout start now
+        '''
+        now = time.time()
+        with self._lock:
+            self._db.executemany('UPDATE frontier SET state = ?, updated = ? WHERE key = ? AND state = ?',
+                                 [(TAKEN, now, frontier_key(url, flow), SENT) for url in urls])
+
+    def mark_done(self, url, flow):
+        with self._lock:
+            self._db.execute('UPDATE frontier SET state = ?, updated = ? WHERE key = ?',
+                             (DONE, time.time(), frontier_key(url, flow)))
+
+    def num_of_in_flight(self):
+        '''
+        :return: number of works sent to the queue or taken by a worker less than inFlightTimeout ago
+        '''
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM frontier WHERE state IN (?, ?) AND updated > ?',
+                                    (SENT, TAKEN, time.time() - self.config['inFlightTimeout'])).fetchone()[0]
+
+    def last_taken(self):
+        '''
+        :return: time of the last work taken (or done) by a worker, 0 if none
+        '''
+        with self._lock:
+            return self._db.execute('SELECT MAX(updated) FROM frontier WHERE state IN (?, ?)',
+                                    (TAKEN, DONE)).fetchone()[0] or 0
+
+    def _allowed_host(self, host, source_host):
+        if not host:
+            return False
+        host = host.lower()
+        if self.config['sameDomain'] and source_host and host != source_host.lower():
+            return False
+        allowed_domains = self.config['allowedDomains']
+        if allowed_domains:
+            return any(host == domain or host.endswith('.' + domain) for domain in allowed_domains)
+        return True
+
+
+_frontiers = {}
+_frontiers_lock = threading.Lock()
+
+
+def get_crawl_frontier(frontier_config):
+    '''
+    :return: the process wide frontier of the frontier directory
+    '''
+    config = build_frontier_config(frontier_config)
+    frontier_dir = os.path.abspath(config['dir'])
+    # sqlite connection must not be shared with a forked process
+    key = (frontier_dir, os.getpid())
+    with _frontiers_lock:
+        if key not in _frontiers:
+            _frontiers[key] = CrawlFrontier(config)
+        return _frontiers[key]
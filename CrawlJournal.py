@@ -0,0 +1,104 @@
+'''
+Progress journal of a crawl, enabled with the journal execution param:
+
+    EXECUTION_PARAMS='{"urls": ..., "scarpFlowYAml": ..., "journal": {"dir": "crawl_journal"}}'
+
+Every worker process append a json line per completed work (url, flow fingerprint, title and the output files) to
+its own file in the journal directory - no locks between the processes and one buffered write per work.
+Resume a crawl that died halfway with "resume": true - the message creator read the journal and skip the works that
+were already completed with the same flow and title.
+'''
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+JOURNAL_PREFIX = "CrawlJournal: "
+
+DEFAULT_JOURNAL_CONFIG = {
+    'dir': 'crawl_journal',
+    # fsync every record (survive a machine crash, not only a process crash) - much slower
+    'fsync': False,
+}
+
+
+def build_journal_config(journal_config=None):
+    config = dict(DEFAULT_JOURNAL_CONFIG)
+    if journal_config:
+        config.update(journal_config)
+    return config
+
+
+def journal_key(url, key):
+    '''
+    :param key: scrap key of the work (flow fingerprint and title)
+    '''
+    return hashlib.blake2b(f'{url}\0{key}'.encode('utf-8'), digest_size=16).digest()
+
+
+class CrawlJournal(object):
+    '''
+    :param journal_dir: directory of the journal files
+    :param fsync: fsync every record
+    '''
+
+    def __init__(self, journal_dir, fsync=False):
+        os.makedirs(journal_dir, exist_ok=True)
+        self.path = os.path.join(journal_dir, f'journal-{os.getpid()}.jsonl')
+        self.fsync = fsync
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def record(self, url, key, outputs=()):
+        line = json.dumps({'url': url, 'key': key, 'outputs': list(outputs), 'time': time.time()},
+                          ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def load_completed(journal_dir):
+    '''
+    :return: set of journal_key of all the completed works in the journal directory
+    '''
+    completed = set()
+    for path in glob.glob(os.path.join(journal_dir, 'journal-*.jsonl')):
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # last line of a process that was killed while writing
+                    continue
+                completed.add(journal_key(record['url'], record['key']))
+    logging.info(f"{JOURNAL_PREFIX}{len(completed)} completed works in {journal_dir}")
+    return completed
+
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def get_crawl_journal(journal_config):
+    '''
+    :return: the journal of this process in the journal directory
+    '''
+    config = build_journal_config(journal_config)
+    journal_dir = os.path.abspath(config['dir'])
+    with _journals_lock:
+        journal = _journals.get(journal_dir)
+        # a forked process must not write to the journal file of its parent
+        if journal is None or journal.path != os.path.join(journal_dir, f'journal-{os.getpid()}.jsonl'):
+            journal = _journals[journal_dir] = CrawlJournal(journal_dir, config['fsync'])
+        return journal
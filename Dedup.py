@@ -0,0 +1,104 @@
+'''
+Duplicate works detection:
+    UrlDeduplicator    - used by the message creator, drop urls that are the same after canonicalisation
+                         (dedupUrls execution param, enabled by default)
+    ContentHashIndex   - used by the worker, skip the flow of a page that is byte identical to a page that was
+                         already scraped by the process with the same flow and title
+                         (dedupContent execution param, disabled by default)
+'''
+
+import hashlib
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+DEDUP_PREFIX = "Dedup: "
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+# query params that never change the page content
+TRACKING_PARAMS_PREFIXES = ('utm_',)
+TRACKING_PARAMS = ('fbclid', 'gclid')
+DEFAULT_MAX_CONTENT_HASHES = 100000
+
+
+def canonicalize_url(url):
+    '''
+    Normalise the parts of the url that don't change the served page:
+    scheme / host case, default port, fragment, trailing slash, tracking query params and the query params order
+    '''
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or DEFAULT_PORTS.get(scheme) == port else f'{host}:{port}'
+    if parts.username:
+        netloc = f'{parts.username}:{parts.password}@{netloc}' if parts.password else f'{parts.username}@{netloc}'
+
+    path = parts.path or '/'
+    if len(path) > 1 and path.endswith('/'):
+        path = path.rstrip('/') or '/'
+
+    query = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+             if not name.startswith(TRACKING_PARAMS_PREFIXES) and name not in TRACKING_PARAMS]
+    return urlunsplit((scheme, netloc, path, urlencode(sorted(query)), ''))
+
+
+class UrlDeduplicator(object):
+    '''
+    Remember the canonical urls that were already seen - only a 16 bytes digest is kept per url
+    '''
+
+    def __init__(self):
+        self._seen = set()
+        self.num_of_duplicates = 0
+
+    def is_new(self, url):
+        digest = hashlib.blake2b(canonicalize_url(url).encode('utf-8'), digest_size=16).digest()
+        if digest in self._seen:
+            self.num_of_duplicates += 1
+            return False
+        self._seen.add(digest)
+        return True
+
+
+class ContentHashIndex(object):
+    '''
+    LRU of (page body hash, scrap key) of the scraped pages
+    :param max_size: max remembered pages
+    '''
+
+    def __init__(self, max_size=DEFAULT_MAX_CONTENT_HASHES):
+        self.max_size = max_size
+        self._hashes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def content_key(self, page, key):
+        body = page.encode('utf-8') if isinstance(page, str) else page
+        return hashlib.sha256(body).hexdigest(), key
+
+    def seen(self, content_key):
+        '''
+        :return: the url that was scraped with this content key or None
+        '''
+        with self._lock:
+            url = self._hashes.get(content_key)
+            if url is not None:
+                self._hashes.move_to_end(content_key)
+            return url
+
+    def add(self, content_key, url):
+        with self._lock:
+            self._hashes[content_key] = url
+            self._hashes.move_to_end(content_key)
+            while len(self._hashes) > self.max_size:
+                self._hashes.popitem(last=False)
+
+
+# The worker module is re-executed by WLO for every message, so the process wide index must live here
+_content_index = ContentHashIndex()
+
+
+def get_content_index():
+    return _content_index
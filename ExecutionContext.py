@@ -0,0 +1,33 @@
+'''
+Per work state of the flow execution.
+A new context is created for every scraped url and passed through execute_action to every action handler
+(handler.run(worker, target_value, ctx)), so the worker object keeps no work state and can be shared by threads and
+async tasks.
+'''
+
+
+class ExecutionContext(object):
+    '''
+    :param msg: the work message (one url)
+    :param URL: the scraped url
+    :param working_params: the work params
+    '''
+
+    __slots__ = ('msg', 'URL', 'working_params', 'execution_vars', 'sinks', 'metrics')
+
+    def __init__(self, msg=None, URL=None, working_params=None):
+        self.msg = msg
+        self.URL = URL
+        self.working_params = working_params if working_params is not None else {}
+        # variables of the createVar / addToVar / removeVar / getVar / cleanVar actions
+        self.execution_vars = {}
+        # OutputSinks of the saveToFile actions - open for the whole work
+        self.sinks = None
+        # ScrapMetrics of the process (metrics execution param) - None when the actions are not timed
+        self.metrics = None
+
+    @classmethod
+    def for_work(cls, msg):
+        ctx = cls(msg, msg['payload']['url_to_scrap'], msg['params'])
+        ctx.execution_vars['title'] = ctx.working_params['title'] if 'title' in ctx.working_params else None
+        return ctx
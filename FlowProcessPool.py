@@ -0,0 +1,289 @@
+'''
+Run the flows of the fetched pages on a pool of processes, enabled with the processPool execution param:
+
+    EXECUTION_PARAMS='{"urls": ..., "scarpFlowYAml": ..., "processPool": {"processes": 2}}'
+
+The worker process keeps only the network I/O (AsyncFetchEngine threads) and hands every fetched page to the pool -
+parsing and the flow actions (path / table2csv / buildConnectionTree ...) run on the pool processes.
+Every worker process has its own pool, so the total number of flow processes is workers x processes - keep the
+number of workers low (or processes at the default 1).
+
+WLO starts the workers as daemon processes, and daemon processes can't have multiprocessing children - the flow
+processes are started with subprocess (python FlowProcessPool.py <works fd> <results fd>). Every flow process reads
+its works from a pipe and exits once the pipe is closed, by the pool or by the exit of the worker process (also when
+it is killed), so no flow process outlives its worker.
+The flow processes import the modules of the registered actions (external actions too) with the worker sys.path.
+Big pages are handed over in shared memory (written once by the fetching process and mapped by the flow process)
+instead of being pickled through the pipe. The results are gathered back by the works order.
+'''
+
+import atexit
+import logging
+import os
+import queue as queue_lib
+import signal
+import subprocess
+import sys
+import threading
+from concurrent.futures import Future
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Connection
+
+POOL_PREFIX = "FlowProcessPool: "
+
+DEFAULT_PROCESS_POOL_CONFIG = {
+    # flow processes per worker process
+    'processes': 1,
+    # pages from this size (bytes) are handed over in shared memory
+    'sharedMemoryThreshold': 64 * 1024,
+}
+
+
+class FlowProcessPoolError(Exception):
+    pass
+
+
+class SharedPage(object):
+    '''
+    Reference to a page in shared memory - pickled instead of the page itself
+    '''
+    __slots__ = ('name', 'size')
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+    def __getstate__(self):
+        return self.name, self.size
+
+    def __setstate__(self, state):
+        self.name, self.size = state
+
+    def read(self):
+        shm = shared_memory.SharedMemory(name=self.name)
+        # the segment is owned (unlinked) by the worker process - not by the tracker of the flow process
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        try:
+            return bytes(shm.buf[:self.size])
+        finally:
+            shm.close()
+
+
+_process_worker = None
+
+
+def _scrap_in_process(msg, page, execution_vars):
+    '''
+    Flow process side - scrap the page with the process worker
+    '''
+    global _process_worker
+    if isinstance(page, SharedPage):
+        page = page.read()
+    if _process_worker is None:
+        from WebSitesScrapingWorker import WebSiteScarperWorker
+        _process_worker = WebSiteScarperWorker()
+    from ExecutionContext import ExecutionContext
+    scrap_flow = _process_worker.load_flow(msg['payload'])
+    ctx = ExecutionContext.for_work(msg)
+    ctx.execution_vars.update(execution_vars or {})
+    return _process_worker.scrap_page(msg, page, scrap_flow, ctx)
+
+
+def _action_modules():
+    '''
+    :return: the modules of the registered actions that the flow processes have to import
+    '''
+    from ScrapActions import ACTION_REGISTRY
+    modules = set()
+    for handler_class in ACTION_REGISTRY.values():
+        if handler_class.__module__ == '__main__':
+            logging.warning(f"{POOL_PREFIX}Action {handler_class.action_name} is defined in __main__ - it can't be "
+                            f"imported by the flow processes")
+        elif handler_class.__module__ != 'ScrapActions':
+            modules.add(handler_class.__module__)
+    return sorted(modules)
+
+
+class FlowProcess(object):
+    '''
+    One flow process - the works are sent through the works pipe and the results are read from the results pipe
+    '''
+
+    def __init__(self, init_msg):
+        works_read, works_write = os.pipe()
+        results_read, results_write = os.pipe()
+        self.process = subprocess.Popen([sys.executable, os.path.abspath(__file__), str(works_read),
+                                         str(results_write)],
+                                        pass_fds=(works_read, results_write), stdin=subprocess.DEVNULL)
+        os.close(works_read)
+        os.close(results_write)
+        self.works = Connection(works_write, readable=False)
+        self.results = Connection(results_read, writable=False)
+        self.works.send(init_msg)
+
+    def run(self, work):
+        '''
+        :return: the scrap_page result of the work - raise the exception of the flow
+        '''
+        try:
+            self.works.send(work)
+            status, result = self.results.recv()
+        except (EOFError, OSError) as e:
+            raise FlowProcessPoolError(f"{POOL_PREFIX}Flow process {self.process.pid} exited - {e}")
+        if status == 'error':
+            raise result
+        return result
+
+    def close(self, timeout=10):
+        self.works.close()
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.results.close()
+
+
+class FlowProcessPool(object):
+    '''
+    :param processes: number of flow processes
+    :param shared_memory_threshold: min page size (bytes) that is handed over in shared memory
+    '''
+
+    def __init__(self, processes=1, shared_memory_threshold=64 * 1024):
+        self.processes = max(1, processes)
+        self.shared_memory_threshold = shared_memory_threshold
+        logging.info(f"{POOL_PREFIX}Starting {self.processes} flow processes")
+        self._init_msg = ('init', list(sys.path), _action_modules(), logging.getLogger().getEffectiveLevel())
+        self._works = queue_lib.Queue()
+        self._threads = []
+        for idx in range(self.processes):
+            thread = threading.Thread(target=self._feed, args=(FlowProcess(self._init_msg),), daemon=True,
+                                      name=f'FlowProcess-{idx}')
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, msg, page, execution_vars=None):
+        '''
+        :param execution_vars: execution vars of the work (set by the preProcess actions)
+        :return: concurrent future of the scrap_page result
+        '''
+        if isinstance(page, str):
+            page = page.encode('utf-8')
+        future = Future()
+        if len(page) >= self.shared_memory_threshold:
+            shm = shared_memory.SharedMemory(create=True, size=len(page))
+            shm.buf[:len(page)] = page
+            future.add_done_callback(lambda _: self._release(shm))
+            page = SharedPage(shm.name, len(page))
+        self._works.put((future, (msg, page, execution_vars)))
+        return future
+
+    def close(self):
+        # not started works are cancelled, every feeding thread stop on its own None
+        while True:
+            try:
+                item = self._works.get_nowait()
+            except queue_lib.Empty:
+                break
+            if item:
+                item[0].cancel()
+        for _ in self._threads:
+            self._works.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _feed(self, flow_process):
+        while True:
+            item = self._works.get()
+            if item is None:
+                break
+            future, work = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(flow_process.run(work))
+            except FlowProcessPoolError as e:
+                future.set_exception(e)
+                logging.error(f"{POOL_PREFIX}{e} - starting a new flow process")
+                flow_process.close(timeout=0)
+                flow_process = FlowProcess(self._init_msg)
+            except Exception as e:
+                future.set_exception(e)
+        flow_process.close()
+
+    def _release(self, shm):
+        shm.close()
+        shm.unlink()
+
+
+_flow_pool = None
+_flow_pool_lock = threading.Lock()
+
+
+def get_flow_process_pool(process_pool_config=None):
+    '''
+    :return: the flow process pool of this worker process (created on the first call)
+    '''
+    global _flow_pool
+    config = dict(DEFAULT_PROCESS_POOL_CONFIG)
+    config.update(process_pool_config or {})
+    with _flow_pool_lock:
+        if _flow_pool is None:
+            _flow_pool = FlowProcessPool(config['processes'], config['sharedMemoryThreshold'])
+            _register_teardown(_flow_pool)
+        return _flow_pool
+
+
+def _register_teardown(pool):
+    atexit.register(pool.close)
+
+    # WLO workers are terminated (SIGTERM) by the manager - atexit is not called then
+    if threading.current_thread() is not threading.main_thread():
+        return
+    previous_handler = signal.getsignal(signal.SIGTERM)
+
+    def on_sigterm(signum, frame):
+        pool.close()
+        if callable(previous_handler):
+            previous_handler(signum, frame)
+        elif previous_handler != signal.SIG_IGN:
+            os._exit(128 + signum)
+
+    signal.signal(signal.SIGTERM, on_sigterm)
+
+
+def flow_process_main(works_fd, results_fd):
+    '''
+    Flow process - scrap the works of the pipe till it is closed
+    '''
+    # ctrl+c is handled by the worker process (it closes the pipes)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    works = Connection(works_fd, writable=False)
+    results = Connection(results_fd, readable=False)
+    _, worker_sys_path, action_modules, log_level = works.recv()
+    sys.path[:] = worker_sys_path
+    logging.basicConfig(level=log_level, format='[%(asctime)s -%(levelname)s] (FlowProcess-%(process)d) %(message)s')
+    for module in action_modules:
+        __import__(module)
+
+    while True:
+        try:
+            msg, page, execution_vars = works.recv()
+        except EOFError:
+            break
+        try:
+            result = ('ok', _scrap_in_process(msg, page, execution_vars))
+        except Exception as e:
+            result = ('error', e)
+        try:
+            results.send(result)
+        except Exception as e:
+            # result / exception that can't be pickled
+            results.send(('error', FlowProcessPoolError(f"{POOL_PREFIX}Can't send the flow result back - {e!r}")))
+
+
+if __name__ == '__main__':
+    # the works are unpickled against the FlowProcessPool module (SharedPage), not against __main__
+    from FlowProcessPool import flow_process_main as main
+    main(int(sys.argv[1]), int(sys.argv[2]))
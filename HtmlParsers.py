@@ -0,0 +1,430 @@
+'''
+Html parser backends, selected per flow with the top level parser key of the scrap flow:
+
+    parser: selectolax
+    flow:
+      - actionName: path
+        ...
+
+html.parser - BeautifulSoup with the python html parser (default)
+lxml        - BeautifulSoup with the lxml (C) parser - same tree as html.parser, faster parsing
+selectolax  - selectolax (lexbor C engine) wrapped by SelectolaxNode - the fastest, implements the part of the
+              BeautifulSoup api that the flow actions use (find / find_all / get / text / get_text / has_attr / name)
+lxml.html   - native lxml tree wrapped by LxmlNode (same api as SelectolaxNode) - the only backend that support xpath
+              in the path action, all the path lookups are evaluated as compiled xpath
+'''
+
+PARSER_PREFIX = "HtmlParsers: "
+DEFAULT_PARSER = 'html.parser'
+POTENTIAL_DYNAMIC_JS_CONTENT = 'Please enable Javascript to use this application'
+_POTENTIAL_DYNAMIC_JS_CONTENT_BYTES = POTENTIAL_DYNAMIC_JS_CONTENT.encode('utf-8')
+
+PARSER_BACKENDS = {}
+# attributes that BeautifulSoup return as list
+MULTI_VALUED_ATTRIBUTES = ('class', 'rel', 'rev', 'accept-charset', 'headers', 'accesskey', 'dropzone')
+
+
+def register_parser(parser_name):
+    def decorator(parse_func):
+        PARSER_BACKENDS[parser_name] = parse_func
+        return parse_func
+    return decorator
+
+
+def parse_html(page, parser=None):
+    '''
+    :param page: html as bytes or string
+    :param parser: backend name (see PARSER_BACKENDS)
+    :return: the root of the parsed document
+    '''
+    parser = parser or DEFAULT_PARSER
+    if parser not in PARSER_BACKENDS:
+        raise ValueError(f"{PARSER_PREFIX}Unknown parser - {parser}")
+    return PARSER_BACKENDS[parser](page)
+
+
+def is_dynamic_js_page(page):
+    '''
+    Check on the raw page (before parsing) if the page content is rendered by javascript
+    '''
+    if isinstance(page, bytes):
+        return _POTENTIAL_DYNAMIC_JS_CONTENT_BYTES in page
+    return POTENTIAL_DYNAMIC_JS_CONTENT in page
+
+
+@register_parser('html.parser')
+def parse_with_html_parser(page):
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(page, 'html.parser')
+
+
+@register_parser('lxml')
+def parse_with_lxml(page):
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(page, 'lxml')
+
+
+@register_parser('selectolax')
+def parse_with_selectolax(page):
+    from selectolax.lexbor import LexborHTMLParser
+    return SelectolaxNode(LexborHTMLParser(page).root, is_document=True)
+
+
+@register_parser('lxml.html')
+def parse_with_lxml_html(page):
+    from lxml import html
+    return LxmlNode(html.document_fromstring(page), is_document=True)
+
+
+def _quote_css_value(value):
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def build_css_selector(name=None, id=None, class_=None, attrs=None):
+    '''
+    Lower BeautifulSoup find arguments into a css selector
+    :return: (css selector, attrs that can't be expressed in css and should be filtered in python)
+    '''
+    selector = name if name else '*'
+    if id:
+        selector += f'[id={_quote_css_value(id)}]'
+    if class_:
+        # BeautifulSoup match single class or the full class attribute value
+        if len(class_.split()) > 1:
+            selector += f'[class={_quote_css_value(class_)}]'
+        else:
+            selector += f'[class~={_quote_css_value(class_)}]'
+
+    python_attrs = {}
+    for attr_name, attr_val in (attrs or {}).items():
+        if attr_name in MULTI_VALUED_ATTRIBUTES and isinstance(attr_val, str) and len(attr_val.split()) == 1:
+            selector += f'[{attr_name}~={_quote_css_value(attr_val)}]'
+        elif isinstance(attr_val, str):
+            selector += f'[{attr_name}={_quote_css_value(attr_val)}]'
+        elif attr_val is True:
+            selector += f'[{attr_name}]'
+        else:
+            python_attrs[attr_name] = attr_val
+    return selector, python_attrs
+
+
+def xpath_literal(value):
+    value = str(value)
+    if "'" not in value:
+        return f"'{value}'"
+    if '"' not in value:
+        return f'"{value}"'
+    return "concat('" + "', \"'\", '".join(value.split("'")) + "')"
+
+
+def _xpath_has_token(attr_name, token):
+    return f"contains(concat(' ', normalize-space(@{attr_name}), ' '), {xpath_literal(' ' + token + ' ')})"
+
+
+def build_xpath(name=None, id=None, class_=None, attrs=None, axis='descendant::'):
+    '''
+    Lower BeautifulSoup find arguments into a xpath expression
+    :return: (xpath, attrs that can't be expressed in xpath and should be filtered in python)
+    '''
+    predicates = []
+    if id:
+        predicates.append(f'@id={xpath_literal(id)}')
+    if class_:
+        # BeautifulSoup match single class or the full class attribute value
+        if len(class_.split()) > 1:
+            predicates.append(f"normalize-space(@class)={xpath_literal(' '.join(class_.split()))}")
+        else:
+            predicates.append(_xpath_has_token('class', class_))
+
+    python_attrs = {}
+    for attr_name, attr_val in (attrs or {}).items():
+        if attr_name in MULTI_VALUED_ATTRIBUTES and isinstance(attr_val, str) and len(attr_val.split()) == 1:
+            predicates.append(_xpath_has_token(attr_name, attr_val))
+        elif isinstance(attr_val, str):
+            predicates.append(f'@{attr_name}={xpath_literal(attr_val)}')
+        elif attr_val is True:
+            predicates.append(f'@{attr_name}')
+        else:
+            python_attrs[attr_name] = attr_val
+    return axis + (name if name else '*') + ''.join(f'[{predicate}]' for predicate in predicates), python_attrs
+
+
+def match_python_attrs(element, python_attrs):
+    for attr_name, attr_val in python_attrs.items():
+        value = element.get(attr_name)
+        if callable(attr_val):
+            if not attr_val(value):
+                return False
+        elif hasattr(attr_val, 'search'):
+            if value is None or not attr_val.search(' '.join(value) if isinstance(value, list) else value):
+                return False
+        elif isinstance(attr_val, (list, tuple)):
+            if value not in attr_val:
+                return False
+        elif attr_val is None or attr_val is False:
+            if value is not None:
+                return False
+    return True
+
+
+class SelectolaxNode(object):
+    '''
+    BeautifulSoup like wrapper of selectolax node
+    :param node: selectolax node
+    :param is_document: the node is the document root - find/find_all include the node itself (like BeautifulSoup
+            object that contain the html tag)
+    '''
+
+    __slots__ = ('node', 'is_document')
+
+    def __init__(self, node, is_document=False):
+        self.node = node
+        self.is_document = is_document
+
+    @property
+    def name(self):
+        tag = self.node.tag
+        return None if tag == '-text' else tag
+
+    @property
+    def text(self):
+        return self.node.text(deep=True)
+
+    @property
+    def attrs(self):
+        return {key: self.get(key) for key in self.node.attributes}
+
+    def get_text(self, separator='', strip=False):
+        return self.node.text(deep=True, separator=separator, strip=strip)
+
+    def get(self, key, default=None):
+        attributes = self.node.attributes
+        if key not in attributes:
+            return default
+        value = attributes[key]
+        if key in MULTI_VALUED_ATTRIBUTES:
+            return (value or '').split()
+        return value if value is not None else ''
+
+    def has_attr(self, key):
+        return key in self.node.attributes
+
+    def find(self, name=None, id=None, class_=None, attrs=None):
+        elements = self.find_all(name, id=id, class_=class_, attrs=attrs, limit=1)
+        return elements[0] if elements else None
+
+    def find_all(self, name=None, id=None, class_=None, attrs=None, limit=None):
+        selector, python_attrs = build_css_selector(name, id, class_, attrs)
+        elements = []
+        for node in self.node.css(selector):
+            if not self.is_document and node.mem_id == self.node.mem_id:
+                continue
+            element = SelectolaxNode(node)
+            if python_attrs and not match_python_attrs(element, python_attrs):
+                continue
+            elements.append(element)
+            if limit and len(elements) == limit:
+                break
+        return elements
+
+    findAll = find_all
+
+    def find_all_next(self):
+        '''
+        All the elements after this element in the document order (descendants and then the following elements)
+        '''
+        return [element for element in self.next_elements if element.name]
+
+    @property
+    def next_elements(self):
+        '''
+        Generator of the nodes after this element in the document order (like BeautifulSoup next_elements)
+        '''
+        for node in self.node.traverse():
+            if node.mem_id != self.node.mem_id:
+                yield SelectolaxNode(node)
+        node = self.node
+        while node is not None:
+            sibling = node.next
+            while sibling is not None:
+                for sub_node in sibling.traverse():
+                    yield SelectolaxNode(sub_node)
+                sibling = sibling.next
+            node = node.parent
+
+    @property
+    def children(self):
+        if self.is_document:
+            return iter([SelectolaxNode(self.node)])
+        return (SelectolaxNode(node) for node in self.node.iter(include_text=True))
+
+    def __iter__(self):
+        return self.children
+
+    def __eq__(self, other):
+        return isinstance(other, SelectolaxNode) and self.node.mem_id == other.node.mem_id
+
+    def __hash__(self):
+        return hash(self.node.mem_id)
+
+    def __str__(self):
+        return self.node.html
+
+    def __repr__(self):
+        return self.node.html
+
+
+class LxmlNode(object):
+    '''
+    BeautifulSoup like wrapper of lxml.html element
+    :param element: lxml element (or text / comment of the tree - see LxmlText)
+    :param is_document: the element is the document root - find/find_all include the element itself
+    '''
+
+    __slots__ = ('element', 'is_document')
+
+    # compiled xpath of find / find_all calls - shared by all the nodes of the process
+    _compiled_xpaths = {}
+
+    def __init__(self, element, is_document=False):
+        self.element = element
+        self.is_document = is_document
+
+    @property
+    def name(self):
+        tag = self.element.tag
+        return tag if isinstance(tag, str) else None
+
+    @property
+    def text(self):
+        return self.element.text_content()
+
+    @property
+    def attrs(self):
+        return {key: self.get(key) for key in self.element.attrib}
+
+    def get_text(self, separator='', strip=False):
+        if not separator and not strip:
+            return self.element.text_content()
+        texts = [text.strip() if strip else text for text in self.element.itertext()]
+        return separator.join(text for text in texts if text or not strip)
+
+    def get(self, key, default=None):
+        value = self.element.get(key)
+        if value is None:
+            return default
+        if key in MULTI_VALUED_ATTRIBUTES:
+            return value.split()
+        return value
+
+    def has_attr(self, key):
+        return key in self.element.attrib
+
+    def xpath(self, compiled_xpath):
+        '''
+        :return: the elements of the xpath result as LxmlNode - attribute / text results (@href, text()) as strings
+        '''
+        result = compiled_xpath(self.element)
+        # string(...) / count(...) expressions
+        if not isinstance(result, list):
+            return [result]
+        values = []
+        for value in result:
+            if isinstance(value, (str, bytes)):
+                values.append(value)
+            # skip comments and processing instructions (their tag is not a string)
+            elif isinstance(value.tag, str):
+                values.append(LxmlNode(value))
+        return values
+
+    def find(self, name=None, id=None, class_=None, attrs=None):
+        elements = self.find_all(name, id=id, class_=class_, attrs=attrs, limit=1)
+        return elements[0] if elements else None
+
+    def find_all(self, name=None, id=None, class_=None, attrs=None, limit=None):
+        axis = 'descendant-or-self::' if self.is_document else 'descendant::'
+        xpath, python_attrs = build_xpath(name, id, class_, attrs, axis=axis)
+        compiled_xpath = self._compiled_xpaths.get(xpath)
+        if compiled_xpath is None:
+            from lxml import etree
+            compiled_xpath = self._compiled_xpaths[xpath] = etree.XPath(xpath)
+
+        elements = []
+        for element in self.xpath(compiled_xpath):
+            if python_attrs and not match_python_attrs(element, python_attrs):
+                continue
+            elements.append(element)
+            if limit and len(elements) == limit:
+                break
+        return elements
+
+    findAll = find_all
+
+    def find_all_next(self):
+        '''
+        All the elements after this element in the document order (descendants and then the following elements)
+        '''
+        return [LxmlNode(element) for element in self.element.xpath('descendant::* | following::*')]
+
+    @property
+    def next_elements(self):
+        '''
+        Generator of the elements after this element in the document order (like BeautifulSoup next_elements)
+        '''
+        from lxml import etree
+        for element in self.element.iterdescendants(etree.Element):
+            yield LxmlNode(element)
+        element = self.element
+        while element is not None:
+            for sibling in element.itersiblings():
+                for sub_element in sibling.iter(etree.Element):
+                    yield LxmlNode(sub_element)
+            element = element.getparent()
+
+    @property
+    def children(self):
+        if self.is_document:
+            yield LxmlNode(self.element)
+            return
+        if self.element.text:
+            yield LxmlText(self.element.text)
+        for child in self.element:
+            yield LxmlNode(child) if isinstance(child.tag, str) else LxmlText('')
+            if child.tail:
+                yield LxmlText(child.tail)
+
+    def __iter__(self):
+        return self.children
+
+    def __eq__(self, other):
+        return isinstance(other, LxmlNode) and self.element is other.element
+
+    def __hash__(self):
+        return hash(self.element)
+
+    def __str__(self):
+        from lxml import html
+        return html.tostring(self.element, encoding='unicode', with_tail=False)
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class LxmlText(str):
+    '''
+    Text child of LxmlNode (like BeautifulSoup NavigableString)
+    '''
+    name = None
+
+    @property
+    def text(self):
+        return str(self)
+
+    def get_text(self, separator='', strip=False):
+        return self.strip() if strip else str(self)
+
+    def has_attr(self, key):
+        return False
+
+    def get(self, key, default=None):
+        return default
@@ -0,0 +1,101 @@
+import json
+import logging
+import threading
+
+HTTP_PREFIX = "HttpSessionPool: "
+
+# Default http settings - can be overridden per execution with the httpSession execution param, for example:
+# EXECUTION_PARAMS='{"urls": ..., "scarpFlowYAml": ..., "httpSession": {"poolMaxSize": 4, "timeout": [3, 20]}}'
+DEFAULT_HTTP_CONFIG = {
+    # number of hosts to keep a connection pool for
+    'poolConnections': 16,
+    # max open connections per host - requests wait for a free connection once the cap is reached
+    'poolMaxSize': 8,
+    # (connect timeout, read timeout) in seconds
+    'timeout': [5, 30],
+    'retries': 3,
+    'backoffFactor': 0.5,
+    'retryStatuses': [429, 500, 502, 503, 504],
+    'headers': {},
+}
+
+
+def _accept_encoding():
+    # urllib3 decodes br only when a brotli package is installed
+    try:
+        import brotli
+        return 'gzip, deflate, br'
+    except ImportError:
+        try:
+            import brotlicffi
+            return 'gzip, deflate, br'
+        except ImportError:
+            return 'gzip, deflate'
+
+
+class HttpSessionPool(object):
+    '''
+    Per process pool of keep alive http sessions.
+    One requests.Session is kept per http config so all the works of the process that use the same config reuse the
+    same tcp/tls connections.
+    '''
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def build_config(self, http_config=None):
+        config = dict(DEFAULT_HTTP_CONFIG)
+        if http_config:
+            config.update(http_config)
+        return config
+
+    def get_session(self, http_config=None):
+        config = self.build_config(http_config)
+        key = json.dumps(config, sort_keys=True)
+        with self._lock:
+            if key not in self._sessions:
+                logging.debug(f"{HTTP_PREFIX}Creating http session - {key}")
+                self._sessions[key] = self._create_session(config)
+            return self._sessions[key], config
+
+    def fetch(self, URL, http_config=None, headers=None):
+        session, config = self.get_session(http_config)
+        return session.get(URL, timeout=tuple(config['timeout']), headers=headers)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+    def _create_session(self, config):
+        # requests is imported with the first session - a worker that never fetches (flow process) doesn't load it
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(total=config['retries'],
+                      backoff_factor=config['backoffFactor'],
+                      status_forcelist=config['retryStatuses'],
+                      allowed_methods=['GET', 'HEAD'],
+                      respect_retry_after_header=True,
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=config['poolConnections'],
+                              pool_maxsize=config['poolMaxSize'],
+                              pool_block=True,
+                              max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({'Accept-Encoding': _accept_encoding(), 'Connection': 'keep-alive'})
+        session.headers.update(config['headers'])
+        return session
+
+
+# The worker module is re-executed by WLO for every message, so the process wide pool must live here
+_session_pool = HttpSessionPool()
+
+
+def get_session_pool():
+    return _session_pool
@@ -0,0 +1,268 @@
+'''
+Output sinks of the saveToFile action.
+Every output target (file) get one long lived writer for the whole work - the file is opened on the first write,
+the writes are buffered and the file is closed once at the end of the work (OutputSinks.close).
+At most MAX_OPEN_WRITERS files are kept open - the least recently written one is closed and reopened (appended) on
+its next write.
+
+Supported file types:
+    csv     - DataFrame / streamed table (table2csv stream), header is written once per file.
+              compression: gzip write csv.gz
+    json    - json.dump of the value appended to the file (the original saveToFile format)
+    jsonl   - json lines - one json per value (tables - one json object per row)
+    parquet - tables only, rows are buffered and written as row groups of batchRows rows (require pyarrow)
+'''
+
+import gzip
+import json
+import logging
+from collections import OrderedDict
+
+from TableExtraction import TableRowStream, write_csv_rows, write_jsonl_rows
+
+SINK_PREFIX = "OutputSinks: "
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+DEFAULT_BATCH_ROWS = 10000
+# open files per work (loop of saveToFile with longName / $var name prefix write a file per item)
+MAX_OPEN_WRITERS = 64
+
+
+class SinkWriter(object):
+    '''
+    :param file_name: output file name without extension
+    :param options: saveToFile sink options (compression / bufferSize / batchRows)
+    '''
+    extension = ''
+    # can be closed and reopened in the middle of the work
+    reopenable = True
+
+    def __init__(self, file_name, options):
+        self.options = options
+        self.path = file_name + '.' + self.extension
+        self.num_of_writes = 0
+        # table rows written (data frames and streamed tables)
+        self.num_of_rows = 0
+
+    def write(self, value):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class TextSinkWriter(SinkWriter):
+    mode = 'w'
+
+    def __init__(self, file_name, options):
+        super().__init__(file_name, options)
+        if options.get('compression') == 'gzip':
+            self.path += '.gz'
+        self.file = None
+        self.opened = False
+
+    def open(self):
+        if self.file is None:
+            buffer_size = self.options.get('bufferSize') or DEFAULT_BUFFER_SIZE
+            # reopened file (closed by OutputSinks to free its handle) is appended
+            mode = 'a' if self.opened else self.mode
+            if self.path.endswith('.gz'):
+                self.file = gzip.open(self.path, mode + 't', encoding='utf-8', newline='')
+            else:
+                self.file = open(self.path, mode, buffering=buffer_size, encoding='utf-8', newline='')
+            self.opened = True
+        return self.file
+
+    def flush(self):
+        if self.file:
+            self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class CsvSinkWriter(TextSinkWriter):
+    extension = 'csv'
+
+    def write(self, value):
+        file = self.open()
+        write_header = self.num_of_writes == 0
+        if isinstance(value, TableRowStream):
+            self.num_of_rows += write_csv_rows(file, value, write_header=write_header)
+        else:
+            # assuming that the value is data frame
+            value.to_csv(file, index=False, sep=',', header=write_header)
+            self.num_of_rows += len(value)
+        self.num_of_writes += 1
+
+
+class JsonSinkWriter(TextSinkWriter):
+    extension = 'json'
+    mode = 'a'
+
+    def write(self, value):
+        file = self.open()
+        if isinstance(value, TableRowStream):
+            self.num_of_rows += write_jsonl_rows(file, value)
+        else:
+            json.dump(value, file, indent=4)
+        self.num_of_writes += 1
+
+
+class JsonLinesSinkWriter(TextSinkWriter):
+    extension = 'jsonl'
+    mode = 'a'
+
+    def write(self, value):
+        file = self.open()
+        if isinstance(value, TableRowStream):
+            self.num_of_rows += write_jsonl_rows(file, value)
+        elif hasattr(value, 'to_json'):
+            # data frame - one line per row
+            lines = value.to_json(orient='records', lines=True, force_ascii=False).rstrip('\n')
+            if lines:
+                file.write(lines + '\n')
+            self.num_of_rows += len(value)
+        else:
+            file.write(json.dumps(value, ensure_ascii=False, default=str))
+            file.write('\n')
+        self.num_of_writes += 1
+
+
+class ParquetSinkWriter(SinkWriter):
+    extension = 'parquet'
+    # a closed parquet file can't be appended
+    reopenable = False
+
+    def __init__(self, file_name, options):
+        super().__init__(file_name, options)
+        self.batch_rows = options.get('batchRows') or DEFAULT_BATCH_ROWS
+        self.columns = None
+        self.buffer = []
+        self.writer = None
+
+    def write(self, value):
+        if isinstance(value, TableRowStream):
+            header, rows = value.header, value
+        else:
+            # assuming that the value is data frame
+            header, rows = list(value.columns), value.itertuples(index=False, name=None)
+
+        if self.columns is None:
+            self.columns = self._unique_columns(header)
+        num_of_columns = len(self.columns)
+        for row in rows:
+            row = list(row[:num_of_columns])
+            row.extend([None] * (num_of_columns - len(row)))
+            self.buffer.append(row)
+            self.num_of_rows += 1
+            if len(self.buffer) >= self.batch_rows:
+                self.flush()
+        self.num_of_writes += 1
+
+    def flush(self):
+        if not self.buffer:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # scraped values are written as strings
+        columns = list(zip(*self.buffer))
+        table = pa.table({name: [None if val is None else str(val) for val in columns[idx]]
+                          for idx, name in enumerate(self.columns)})
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema, compression=self.options.get('compression') or 'snappy')
+        self.writer.write_table(table)
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+
+    def _unique_columns(self, header):
+        columns = []
+        for name in header:
+            unique_name = name or 'column'
+            idx = 1
+            while unique_name in columns:
+                unique_name = f'{name or "column"}_{idx}'
+                idx += 1
+            columns.append(unique_name)
+        return columns
+
+
+SINK_WRITERS = {
+    'csv': CsvSinkWriter,
+    'json': JsonSinkWriter,
+    'jsonl': JsonLinesSinkWriter,
+    'parquet': ParquetSinkWriter,
+}
+
+
+class OutputSinks(object):
+    '''
+    The writers of a work - keyed by the output file name and type
+    :param max_open_writers: max writers with an open file - the least recently written one is closed on eviction
+    '''
+
+    def __init__(self, max_open_writers=MAX_OPEN_WRITERS):
+        self.writers = {}
+        self.max_open_writers = max_open_writers
+        # keys of the reopenable writers that may have an open file, by the last write
+        self._open_writers = OrderedDict()
+
+    def write(self, file_name, file_type, value, options=None):
+        '''
+        :return: the path of the output file (None for unknown file type - nothing is written)
+        '''
+        if file_type not in SINK_WRITERS:
+            logging.warning(f"{SINK_PREFIX}Unknown file type - {file_type}")
+            return None
+        key = (file_name, file_type)
+        if key not in self.writers:
+            self.writers[key] = SINK_WRITERS[file_type](file_name, options or {})
+        writer = self.writers[key]
+        writer.write(value)
+        if writer.reopenable:
+            self._touch(key)
+        return writer.path
+
+    def _touch(self, key):
+        self._open_writers[key] = None
+        self._open_writers.move_to_end(key)
+        while len(self._open_writers) > self.max_open_writers:
+            evicted_key, _ = self._open_writers.popitem(last=False)
+            self.writers[evicted_key].close()
+
+    @property
+    def paths(self):
+        '''
+        :return: the paths of the files that were written
+        '''
+        return [writer.path for writer in self.writers.values()]
+
+    @property
+    def num_of_rows(self):
+        '''
+        :return: number of table rows written to all the files
+        '''
+        return sum(writer.num_of_rows for writer in self.writers.values())
+
+    def flush(self):
+        for writer in self.writers.values():
+            writer.flush()
+
+    def close(self):
+        writers, self.writers = self.writers, {}
+        self._open_writers = OrderedDict()
+        for writer in writers.values():
+            try:
+                writer.close()
+            except Exception:
+                logging.exception(f"{SINK_PREFIX}Failed to close - {writer.path}")
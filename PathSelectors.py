@@ -0,0 +1,189 @@
+'''
+Compiled selectors of the path action.
+The path action can select elements with the BeautifulSoup like params (HTMLtype / id / class / attr), with a css
+selector (css param) or with a xpath expression (xpath param).
+The selector is compiled once per flow into the form of every tree engine (the xpath form on the first lxml.html use):
+    BeautifulSoup (html.parser / lxml parsers) - find / find_all kwargs, css is compiled by soupsieve
+    selectolax - css selector
+    lxml.html - compiled xpath (the HTMLtype / id / class / attr params and css are lowered to xpath as well)
+Nested single path chains can be fused into one xpath query (see FusedPathSelector).
+'''
+
+from HtmlParsers import LxmlNode, SelectolaxNode, build_css_selector, build_xpath, match_python_attrs
+
+SELECTOR_PREFIX = "PathSelectors: "
+
+
+class PathSelectorError(Exception):
+    pass
+
+
+def _compile_xpath(xpath):
+    from lxml import etree
+    try:
+        return etree.XPath(xpath)
+    except etree.XPathSyntaxError as e:
+        raise PathSelectorError(f"{SELECTOR_PREFIX}Invalid xpath {xpath} - {e}")
+
+
+def _css_to_xpath(css, axis):
+    from cssselect import HTMLTranslator, SelectorError
+    try:
+        return HTMLTranslator().css_to_xpath(css, prefix=axis)
+    except SelectorError as e:
+        # soupsieve only selectors (:-soup-contains ...) - supported by the BeautifulSoup parsers only
+        raise PathSelectorError(f"{SELECTOR_PREFIX}css {css} is not supported by the lxml.html parser - {e}")
+
+
+class PathSelector(object):
+    '''
+    :param html_type / id_ / class_ / attr: BeautifulSoup find params
+    :param css: css selector
+    :param xpath: xpath expression, evaluated with the selected element as the context node
+    '''
+
+    def __init__(self, html_type=None, id_=None, class_=None, attr=None, css=None, xpath=None):
+        if css and xpath:
+            raise PathSelectorError(f"{SELECTOR_PREFIX}path action can't have both css and xpath")
+        self.css = css
+        self.xpath = xpath
+        self.find_kwargs = {}
+        self.python_attrs = {}
+
+        # same precedence as the original find calls - id, class and then attr
+        if id_:
+            self.find_kwargs = {'id': id_}
+        elif class_:
+            self.find_kwargs = {'class_': class_}
+        elif attr:
+            self.find_kwargs = {'attrs': dict(attr)}
+        self.html_type = html_type
+
+        self._soupsieve = None
+        self._xpaths = {}
+        self._selectolax_css = None
+
+        if css:
+            self._selectolax_css = css
+            try:
+                import soupsieve
+                self._soupsieve = soupsieve.compile(css)
+            except ImportError:
+                pass
+        elif not xpath:
+            self._selectolax_css, self.python_attrs = build_css_selector(self.html_type, **self.find_kwargs)
+
+        # the xpath forms are compiled on the first lxml.html select - only the user xpath is validated now
+        if xpath:
+            for is_document in (True, False):
+                self.get_xpath(is_document)
+
+    def xpath_expression(self, is_document):
+        '''
+        :return: the xpath of this selector relative to the context element
+        '''
+        axis = 'descendant-or-self::' if is_document else 'descendant::'
+        if self.xpath:
+            return self.xpath
+        if self.css:
+            return _css_to_xpath(self.css, axis)
+        xpath, python_attrs = build_xpath(self.html_type, axis=axis, **self.find_kwargs)
+        if python_attrs:
+            return None
+        return xpath
+
+    def is_fusible(self):
+        # user xpath can be absolute (//div) and union (a | b) can't be a middle step - fuse only simple expressions
+        if self.xpath:
+            return self.xpath.startswith('.') and '|' not in self.xpath
+        if self.css:
+            return ',' not in self.css
+        return not self.python_attrs
+
+    def get_xpath(self, is_document):
+        if is_document not in self._xpaths:
+            xpath = self.xpath_expression(is_document)
+            self._xpaths[is_document] = _compile_xpath(xpath) if xpath else None
+        return self._xpaths[is_document]
+
+    def select(self, node, single):
+        '''
+        :param node: the element (or document) to select from
+        :param single: return only the first element (or None)
+        '''
+        if isinstance(node, LxmlNode):
+            compiled_xpath = self.get_xpath(node.is_document)
+            if compiled_xpath is None:
+                return self._find(node, single)
+            elements = node.xpath(compiled_xpath)
+            if single:
+                return elements[0] if elements else None
+            return elements
+
+        if self.xpath:
+            raise PathSelectorError(f"{SELECTOR_PREFIX}xpath path require the lxml.html parser")
+
+        if isinstance(node, SelectolaxNode):
+            elements = []
+            for element in node.node.css(self._selectolax_css):
+                if not node.is_document and element.mem_id == node.node.mem_id:
+                    continue
+                element = SelectolaxNode(element)
+                if self.python_attrs and not match_python_attrs(element, self.python_attrs):
+                    continue
+                if single:
+                    return element
+                elements.append(element)
+            return None if single else elements
+
+        if self.css:
+            if not self._soupsieve:
+                raise PathSelectorError(f"{SELECTOR_PREFIX}css path require the soupsieve package")
+            if single:
+                return self._soupsieve.select_one(node)
+            return self._soupsieve.select(node)
+
+        return self._find(node, single)
+
+    def _find(self, node, single):
+        if single:
+            return node.find(self.html_type, **self.find_kwargs)
+        return node.findAll(self.html_type, **self.find_kwargs)
+
+
+class FusedPathSelector(object):
+    '''
+    Chain of path selectors executed one on the result of the other (path -> rec/single path -> ...).
+    On lxml.html tree the whole chain is evaluated as one xpath query:
+        single a -> all b      =>  (descendant::a)[1]/descendant::b
+        single a -> single b   =>  ((descendant::a)[1]/descendant::b)[1]
+    On the other engines the selectors are executed one after the other.
+    :param steps: list of (PathSelector, single)
+    '''
+
+    def __init__(self, steps):
+        self.steps = steps
+        # compiled on the first lxml.html select
+        self._xpaths = {}
+
+    def get_xpath(self, is_document):
+        if is_document not in self._xpaths:
+            xpath = None
+            for idx, (selector, single) in enumerate(self.steps):
+                step_xpath = selector.xpath_expression(is_document and idx == 0)
+                if xpath is not None:
+                    step_xpath = f'{xpath}/{step_xpath}'
+                xpath = f'({step_xpath})[1]' if single else step_xpath
+            self._xpaths[is_document] = _compile_xpath(xpath)
+        return self._xpaths[is_document]
+
+    def select(self, node, single=None):
+        if isinstance(node, LxmlNode):
+            elements = node.xpath(self.get_xpath(node.is_document))
+            if self.steps[-1][1]:
+                return elements[0] if elements else None
+            return elements
+
+        for selector, step_single in self.steps:
+            node = selector.select(node, step_single)
+        return node
@@ -0,0 +1,328 @@
+'''
+Per host politeness, enabled with the politeness execution param:
+
+    EXECUTION_PARAMS='{"urls": ..., "scarpFlowYAml": ..., "politeness": {"qps": 2, "perHostConcurrency": 2}}'
+
+Message creator side - interleave_by_host send the urls round robin across hosts (inside a window of buffered urls)
+instead of the file order, so the workers don't burst on one host.
+Worker side - HostThrottle wraps the http session pool fetch:
+    * the requests to every host are spaced by the host delay - shared by all the worker processes (sqlite state)
+    * max perHostConcurrency requests in flight per host - shared by all the worker processes too
+    * robots.txt Crawl-delay is the minimal delay of the host
+    * Retry-After of 429 / 503 responses postpone the next request to the host
+    * the delay adapts (AIMD) - doubled on throttling / server errors, and decreased by delayStep on success
+'''
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+POLITENESS_PREFIX = "PolitenessScheduler: "
+
+DEFAULT_POLITENESS_CONFIG = {
+    'dir': 'scraper_politeness',
+    # max requests per second per host (the minimal delay between two requests is 1 / qps)
+    'qps': 1.0,
+    # max requests in flight per host (all the worker processes)
+    'perHostConcurrency': 2,
+    # seconds after which a request is no longer counted in flight (its process hang)
+    'inFlightTimeout': 600,
+    'maxDelay': 60.0,
+    # delay decrease (seconds) after a successful response
+    'delayStep': 0.05,
+    'respectRobots': True,
+    'userAgent': '*',
+    # max buffered urls of the message creator interleaving
+    'interleaveWindow': 10000,
+}
+THROTTLE_STATUSES = (429, 503)
+BACKOFF_STATUSES = (429, 500, 502, 503, 504)
+# seconds between two tries to take an in flight slot of a busy host
+SLOT_POLL_INTERVAL = 0.05
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS hosts (
+    host TEXT PRIMARY KEY,
+    next_time REAL NOT NULL,
+    delay REAL NOT NULL,
+    crawl_delay REAL
+)
+'''
+_IN_FLIGHT_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS in_flight (
+    id INTEGER PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    started REAL NOT NULL
+)
+'''
+_IN_FLIGHT_INDEX = 'CREATE INDEX IF NOT EXISTS in_flight_host ON in_flight (host)'
+
+
+def build_politeness_config(politeness_config=None):
+    config = dict(DEFAULT_POLITENESS_CONFIG)
+    if politeness_config:
+        config.update(politeness_config)
+    return config
+
+
+def url_host(url):
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc.lower()}'
+
+
+def interleave_by_host(items, window, url_of=lambda item: item[1]):
+    '''
+    Reorder a stream so consecutive items belong to different hosts.
+    Up to `window` items are buffered - once the window is full a round (one item of every buffered host) is emitted.
+    :param items: iterable of items (by default (title, url) tuples)
+    :param window: max buffered items
+    :param url_of: return the url of an item
+    '''
+    queues = OrderedDict()
+    buffered = 0
+    for item in items:
+        queues.setdefault(url_host(url_of(item)), deque()).append(item)
+        buffered += 1
+        if buffered >= window:
+            for host in list(queues):
+                yield queues[host].popleft()
+                buffered -= 1
+                if not queues[host]:
+                    del queues[host]
+    while queues:
+        for host in list(queues):
+            yield queues[host].popleft()
+            if not queues[host]:
+                del queues[host]
+
+
+def _is_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def parse_retry_after(value):
+    '''
+    :return: seconds to wait from a Retry-After header (seconds or http date) or None
+    '''
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_crawl_delay(robots_txt, user_agent='*'):
+    '''
+    :return: the Crawl-delay (seconds) of the user agent group (or of the * group) in robots.txt, or None
+    (urllib.robotparser accept only integer delays)
+    '''
+    delays = {}
+    group_agents = []
+    in_rules = False
+    for line in robots_txt.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if ':' not in line:
+            continue
+        field, value = (part.strip() for part in line.split(':', 1))
+        field = field.lower()
+        if field == 'user-agent':
+            if in_rules:
+                group_agents = []
+                in_rules = False
+            group_agents.append(value.lower())
+        else:
+            in_rules = True
+            if field == 'crawl-delay':
+                try:
+                    for agent in group_agents:
+                        delays.setdefault(agent, float(value))
+                except ValueError:
+                    pass
+
+    user_agent = user_agent.lower()
+    for agent, delay in delays.items():
+        if agent != '*' and agent in user_agent:
+            return delay
+    return delays.get('*')
+
+
+class HostThrottle(object):
+    '''
+    :param session_pool: HttpSessionPool - the requests are sent with it (same fetch signature)
+    :param config: politeness config (see DEFAULT_POLITENESS_CONFIG)
+    '''
+
+    def __init__(self, session_pool, config):
+        self.session_pool = session_pool
+        self.config = config
+        self.min_delay = 1.0 / config['qps'] if config['qps'] else 0.0
+        os.makedirs(config['dir'], exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(config['dir'], 'hosts.db'), timeout=30, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(_SCHEMA)
+        self._db.execute(_IN_FLIGHT_SCHEMA)
+        self._db.execute(_IN_FLIGHT_INDEX)
+        self._lock = threading.Lock()
+        self._robots_checked = set()
+
+    def fetch(self, URL, http_config=None, headers=None):
+        host = url_host(URL)
+        if self.config['respectRobots']:
+            with self._lock:
+                check_robots = host not in self._robots_checked
+                self._robots_checked.add(host)
+            if check_robots:
+                self._load_crawl_delay(host, http_config)
+
+        with self._in_flight_slot(host):
+            self._wait_for_slot(host)
+            try:
+                response = self.session_pool.fetch(URL, http_config, headers=headers)
+            except Exception:
+                self._adapt(host, failed=True)
+                raise
+        self._adapt(host, failed=response.status_code in BACKOFF_STATUSES,
+                    retry_after=parse_retry_after(response.headers.get('Retry-After'))
+                    if response.status_code in THROTTLE_STATUSES else None)
+        return response
+
+    def host_delay(self, host):
+        with self._lock:
+            row = self._db.execute('SELECT delay FROM hosts WHERE host = ?', (host,)).fetchone()
+        return row[0] if row else self.min_delay
+
+    @contextmanager
+    def _in_flight_slot(self, host):
+        '''
+        Hold one of the perHostConcurrency in flight slots of the host (shared by all the processes)
+        '''
+        slot_id = self._take_in_flight_slot(host)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._db.execute('DELETE FROM in_flight WHERE id = ?', (slot_id,))
+
+    def _take_in_flight_slot(self, host):
+        while True:
+            with self._lock:
+                self._db.execute('BEGIN IMMEDIATE')
+                try:
+                    now = time.time()
+                    rows = self._db.execute('SELECT id, pid, started FROM in_flight WHERE host = ?',
+                                            (host,)).fetchall()
+                    # slots of killed or hanging processes
+                    stale = [(row[0],) for row in rows
+                             if row[2] < now - self.config['inFlightTimeout'] or not _is_alive(row[1])]
+                    if stale:
+                        self._db.executemany('DELETE FROM in_flight WHERE id = ?', stale)
+                    slot_id = None
+                    if len(rows) - len(stale) < self.config['perHostConcurrency']:
+                        slot_id = self._db.execute('INSERT INTO in_flight (host, pid, started) VALUES (?, ?, ?)',
+                                                   (host, os.getpid(), now)).lastrowid
+                    self._db.execute('COMMIT')
+                except Exception:
+                    self._db.execute('ROLLBACK')
+                    raise
+            if slot_id is not None:
+                return slot_id
+            time.sleep(SLOT_POLL_INTERVAL)
+
+    def _wait_for_slot(self, host):
+        '''
+        Reserve the next free request time of the host (shared by all the processes) and sleep till then
+        '''
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                row = self._db.execute('SELECT next_time, delay, crawl_delay FROM hosts WHERE host = ?',
+                                       (host,)).fetchone()
+                if row:
+                    next_time, delay, crawl_delay = row
+                else:
+                    next_time, delay, crawl_delay = now, self.min_delay, None
+                delay = max(delay, self.min_delay, crawl_delay or 0.0)
+                slot = max(now, next_time)
+                self._db.execute('INSERT OR REPLACE INTO hosts (host, next_time, delay, crawl_delay) '
+                                 'VALUES (?, ?, ?, ?)', (host, slot + delay, delay, crawl_delay))
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+        wait = slot - now
+        if wait > 0:
+            logging.debug(f"{POLITENESS_PREFIX}Waiting {wait:.2f}s for {host}")
+            time.sleep(wait)
+
+    def _adapt(self, host, failed, retry_after=None):
+        with self._lock:
+            row = self._db.execute('SELECT next_time, delay, crawl_delay FROM hosts WHERE host = ?',
+                                   (host,)).fetchone()
+            if not row:
+                return
+            next_time, delay, crawl_delay = row
+            min_delay = max(self.min_delay, crawl_delay or 0.0)
+            if failed:
+                delay = min(self.config['maxDelay'], max(delay * 2, min_delay, 0.1))
+                logging.info(f"{POLITENESS_PREFIX}Slowing down {host} - {delay:.2f}s between requests")
+            else:
+                delay = max(min_delay, delay - self.config['delayStep'])
+            if retry_after is not None:
+                next_time = max(next_time, time.time() + min(retry_after, self.config['maxDelay']))
+                logging.info(f"{POLITENESS_PREFIX}Retry-After {retry_after:.0f}s from {host}")
+            self._db.execute('UPDATE hosts SET next_time = ?, delay = ? WHERE host = ?', (next_time, delay, host))
+
+    def _load_crawl_delay(self, host, http_config):
+        crawl_delay = None
+        try:
+            response = self.session_pool.fetch(host + '/robots.txt', http_config)
+            if response.status_code == 200:
+                crawl_delay = parse_crawl_delay(response.text, self.config['userAgent'])
+        except Exception:
+            logging.debug(f"{POLITENESS_PREFIX}Failed to read robots.txt of {host}")
+        if crawl_delay is None:
+            return
+
+        logging.info(f"{POLITENESS_PREFIX}Crawl-delay of {host} - {crawl_delay}s")
+        with self._lock:
+            self._db.execute('INSERT OR IGNORE INTO hosts (host, next_time, delay, crawl_delay) VALUES (?, ?, ?, ?)',
+                             (host, time.time(), self.min_delay, float(crawl_delay)))
+            self._db.execute('UPDATE hosts SET crawl_delay = ? WHERE host = ?', (float(crawl_delay), host))
+
+
+_host_throttles = {}
+_throttles_lock = threading.Lock()
+
+
+def get_host_throttle(session_pool, politeness_config):
+    '''
+    :return: the process wide throttle of the politeness config
+    '''
+    config = build_politeness_config(politeness_config)
+    key = (os.path.abspath(config['dir']), config['qps'], config['perHostConcurrency'])
+    with _throttles_lock:
+        if key not in _host_throttles:
+            _host_throttles[key] = HostThrottle(session_pool, config)
+        return _host_throttles[key]
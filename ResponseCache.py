@@ -0,0 +1,232 @@
+'''
+On disk http response cache for re-crawls, enabled with the responseCache execution param:
+
+    EXECUTION_PARAMS='{"urls": ..., "scarpFlowYAml": ..., "responseCache": {"dir": "/var/cache/scraper"}}'
+
+The body and the validators (ETag / Last-Modified) of every fetched page are kept per URL. The next fetch of the URL
+is a conditional request (If-None-Match / If-Modified-Since) - on 304 the cached body is used, and if the page was
+already scraped with the same flow the whole flow is skipped.
+The cache is shared by all the worker processes (sqlite index + one body file per URL) and limited to maxBytes of
+bodies - the least recently used entries are evicted.
+'''
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+CACHE_PREFIX = "ResponseCache: "
+
+DEFAULT_CACHE_CONFIG = {
+    'dir': 'scraper_response_cache',
+    # max total size of the cached bodies
+    'maxBytes': 512 * 1024 * 1024,
+}
+
+# returned by fetch when the page and the flow did not change since the last scrap
+PAGE_NOT_MODIFIED = object()
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    body_file TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    scrap_key TEXT,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+-- running total of the bodies size (one row) - kept by store / evict in the same transaction as the responses rows
+CREATE TABLE IF NOT EXISTS cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    total_size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_size (id, total_size) SELECT 0, COALESCE(SUM(size), 0) FROM responses;
+'''
+# rows read per eviction query
+EVICTION_BATCH = 64
+
+
+def scrap_key(flow_fingerprint, title=None):
+    '''
+    Identify what was produced from the page - the same page scraped by another flow (or for another title) is
+    not skipped
+    '''
+    return f'{flow_fingerprint}:{title}'
+
+
+class CacheEntry(object):
+    '''
+    :param body: the cached body - read with the row (None if the page was already scraped with the work key)
+    '''
+    __slots__ = ('url', 'body_file', 'size', 'etag', 'last_modified', 'scrap_key', 'body')
+
+    def __init__(self, url, body_file, size, etag, last_modified, scrap_key, body=None):
+        self.url = url
+        self.body_file = body_file
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.scrap_key = scrap_key
+        self.body = body
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache(object):
+    '''
+    :param cache_dir: directory of the index and the bodies
+    :param max_bytes: max total size of the cached bodies
+    '''
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.bodies_dir = os.path.join(cache_dir, 'bodies')
+        os.makedirs(self.bodies_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, 'index.db'), timeout=30, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _transaction(self, begin='BEGIN'):
+        with self._lock:
+            self._db.execute(begin)
+            try:
+                yield
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    def lookup(self, url, key=None):
+        '''
+        :param key: scrap_key of the current work - the body is not read if the page was already scraped with it
+        :return: the entry with its body, None if the url is not cached
+        '''
+        # the body is read with the row - an eviction after the lookup can't leave a validated entry without body
+        with self._transaction():
+            row = self._db.execute('SELECT url, body_file, size, etag, last_modified, scrap_key FROM responses '
+                                   'WHERE url = ?', (url,)).fetchone()
+            if not row:
+                return None
+            entry = CacheEntry(*row)
+            if key is not None and entry.scrap_key == key:
+                return entry
+            try:
+                with open(os.path.join(self.bodies_dir, entry.body_file), 'rb') as file:
+                    entry.body = file.read()
+            except FileNotFoundError:
+                # evicted by another process
+                return None
+        return entry
+
+    def store(self, url, body, etag, last_modified):
+        body_file = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        path = os.path.join(self.bodies_dir, body_file)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(body)
+        os.replace(tmp_path, path)
+
+        with self._transaction('BEGIN IMMEDIATE'):
+            row = self._db.execute('SELECT size FROM responses WHERE url = ?', (url,)).fetchone()
+            # new body - the page must be scraped again
+            self._db.execute('INSERT OR REPLACE INTO responses (url, body_file, size, etag, last_modified, scrap_key, '
+                             'last_access) VALUES (?, ?, ?, ?, ?, NULL, ?)',
+                             (url, body_file, len(body), etag, last_modified, time.time()))
+            self._add_size(len(body) - (row[0] if row else 0))
+            self._evict()
+
+    def mark_scraped(self, url, key):
+        with self._lock:
+            self._db.execute('UPDATE responses SET scrap_key = ? WHERE url = ?', (key, url))
+
+    def fetch(self, session_pool, URL, http_config=None, key=None):
+        '''
+        Conditional fetch of the URL
+        :param session_pool: HttpSessionPool
+        :param key: scrap_key of the current work
+        :return: the page body, or PAGE_NOT_MODIFIED if the page was already scraped with the same key
+        '''
+        entry = self.lookup(URL, key)
+        headers = entry.conditional_headers() if entry else None
+        response = session_pool.fetch(URL, http_config, headers=headers)
+
+        if response.status_code == 304 and entry:
+            if key is not None and entry.scrap_key == key:
+                logging.info(f"{CACHE_PREFIX}Not modified, already scraped - {URL}")
+                with self._lock:
+                    self._db.execute('UPDATE responses SET last_access = ? WHERE url = ?', (time.time(), URL))
+                return PAGE_NOT_MODIFIED
+            logging.debug(f"{CACHE_PREFIX}Not modified - {URL}")
+            with self._lock:
+                self._db.execute('UPDATE responses SET last_access = ? WHERE url = ?', (time.time(), URL))
+            return entry.body
+
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        no_store = 'no-store' in response.headers.get('Cache-Control', '')
+        if response.status_code == 200 and (etag or last_modified) and not no_store:
+            self.store(URL, response.content, etag, last_modified)
+        return response.content
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _add_size(self, size):
+        self._db.execute('UPDATE cache_size SET total_size = total_size + ? WHERE id = 0', (size,))
+
+    def _evict(self):
+        '''
+        Evict the least recently used entries - called inside the store transaction
+        '''
+        total_size = self._db.execute('SELECT total_size FROM cache_size WHERE id = 0').fetchone()[0]
+        while total_size > self.max_bytes:
+            rows = self._db.execute('SELECT url, body_file, size FROM responses ORDER BY last_access LIMIT ?',
+                                    (EVICTION_BATCH,)).fetchall()
+            if not rows:
+                break
+            for url, body_file, size in rows:
+                if total_size <= self.max_bytes:
+                    break
+                self._db.execute('DELETE FROM responses WHERE url = ?', (url,))
+                try:
+                    os.remove(os.path.join(self.bodies_dir, body_file))
+                except FileNotFoundError:
+                    pass
+                self._add_size(-size)
+                total_size -= size
+                logging.debug(f"{CACHE_PREFIX}Evicted - {url}")
+
+
+_response_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(cache_config):
+    '''
+    :param cache_config: the responseCache execution param (dir / maxBytes)
+    :return: the process wide cache of the directory
+    '''
+    config = dict(DEFAULT_CACHE_CONFIG)
+    config.update(cache_config or {})
+    cache_dir = os.path.abspath(config['dir'])
+    with _caches_lock:
+        if cache_dir not in _response_caches:
+            logging.info(f"{CACHE_PREFIX}Using response cache - {cache_dir}")
+            _response_caches[cache_dir] = ResponseCache(cache_dir, config['maxBytes'])
+        return _response_caches[cache_dir]
@@ -0,0 +1,451 @@
+'''
+Registry of the scrap flow actions.
+Each action name is mapped to an ActionHandler class. The handler parse its actionParams once - when the flow is
+loaded - and the worker only call handler.run(worker, target_value, ctx) while executing the flow (ctx is the
+ExecutionContext of the work).
+
+External actions can be added to the same table:
+
+    from ScrapActions import ActionHandler, register_action
+
+    @register_action('upper')
+    class UpperAction(ActionHandler):
+        def run(self, worker, target_value, ctx):
+            return target_value.upper()
+'''
+
+import logging
+
+from PathSelectors import PathSelector, FusedPathSelector
+
+SERVICE = "Scraper - "
+
+ACTION_REGISTRY = {}
+
+
+class UnknownActionError(Exception):
+    pass
+
+
+def register_action(action_name):
+    def decorator(handler_class):
+        handler_class.action_name = action_name
+        ACTION_REGISTRY[action_name] = handler_class
+        return handler_class
+    return decorator
+
+
+def get_action_handler(action_name):
+    if action_name not in ACTION_REGISTRY:
+        raise UnknownActionError(f"{SERVICE}Unknown action - {action_name}")
+    return ACTION_REGISTRY[action_name]
+
+
+class ActionHandler(object):
+    '''
+    Base class for all the flow actions
+    :param action_params: the actionParams of the action as defined in the scrap flow
+    '''
+    action_name = None
+
+    def __init__(self, action_params):
+        self.action_params = action_params
+
+    def run(self, worker, target_value, ctx):
+        raise NotImplementedError
+
+
+class BoundAction(object):
+    '''
+    Node of the pre bound execution plan.
+    mode - how the parent action execute this node:
+        'root'     - top level flow / preProcess action
+        'loop'     - run on every element of the parent result
+        'rec'      - run on the parent result
+        'tree_dfs' - run on every branch of the parent tree result
+        'single'   - run only the handler on the parent result (sub actions are ignored)
+        'skip'     - 'Atomic' sub action or a block that is not a loop - nothing to execute
+    '''
+    __slots__ = ('action_name', 'handler', 'mode', 'sub_actions')
+
+    def __init__(self, action_name, handler, mode, sub_actions):
+        self.action_name = action_name
+        self.handler = handler
+        self.mode = mode
+        self.sub_actions = sub_actions
+
+
+class LoopBlock(object):
+    '''
+    {type: loop, actions: [...]} sub action - run all the actions on every element of the parent result
+    '''
+    __slots__ = ('actions', 'mode')
+
+    def __init__(self, actions):
+        self.actions = actions
+        self.mode = 'block_loop'
+
+
+def bind_action(execution_plan, mode='root'):
+    action_name = execution_plan['actionName']
+    action_params = execution_plan['actionParams'] if 'actionParams' in execution_plan else {}
+    handler = get_action_handler(action_name)(action_params)
+    sub_actions = execution_plan['subActions'] if 'subActions' in execution_plan else []
+    return _fuse_path_chain(BoundAction(action_name, handler, mode, tuple(_bind_sub_action(action) for action in sub_actions)))
+
+
+def _fuse_path_chain(bound_action):
+    '''
+    single path with one path sub action (rec / plain) is fused into one path action - the sub path run directly
+    on the parent path result so on lxml.html tree both of them can be evaluated as one xpath query
+    '''
+    if len(bound_action.sub_actions) != 1:
+        return bound_action
+    sub_action = bound_action.sub_actions[0]
+    if sub_action.mode not in ('rec', 'single'):
+        return bound_action
+    handler, sub_handler = bound_action.handler, sub_action.handler
+    if not isinstance(handler, PathAction) or not isinstance(sub_handler, PathAction):
+        return bound_action
+    if not handler.is_fusible() or handler.steps[-1][1] is False or not sub_handler.is_fusible():
+        return bound_action
+
+    fused_handler = FusedPathAction(handler.steps + sub_handler.steps)
+    sub_actions = sub_action.sub_actions if sub_action.mode == 'rec' else ()
+    return BoundAction(bound_action.action_name, fused_handler, bound_action.mode, sub_actions)
+
+
+def _bind_sub_action(action):
+    if 'actionType' in action:
+        if action['actionType'] in ('loop', 'rec', 'tree_dfs'):
+            return bind_action(action, mode=action['actionType'])
+        return BoundAction(action.get('actionName'), None, 'skip', ())
+
+    if 'type' in action:
+        if action['type'] == 'loop':
+            return LoopBlock(tuple(bind_action(sub_action) for sub_action in action['actions']))
+        return BoundAction(action.get('actionName'), None, 'skip', ())
+
+    handler = get_action_handler(action['actionName'])(action['actionParams'])
+    return BoundAction(action['actionName'], handler, 'single', ())
+
+
+def bind_actions(actions):
+    return tuple(bind_action(action) for action in actions)
+
+
+@register_action('expendDynamicHTML')
+class ExpendDynamicHTMLAction(ActionHandler):
+
+    def __init__(self, action_params):
+        super().__init__(action_params)
+        self.type = action_params['type']
+        self.element = action_params['Element']
+        self.contain_element = action_params['containElement'] if 'containElement' in action_params else None
+        self.wait_for = action_params['waitFor'] if 'waitFor' in action_params else None
+
+    def run(self, worker, target_value, ctx):
+        logging.info(f"{SERVICE}Start expand dynamic HTML")
+        return worker.expend_dynamic_HTML(URL=target_value, action_type=self.type, element=self.element,
+                                          contain_element=self.contain_element, wait_for=self.wait_for)
+
+
+# in this case target_value should be BeautifulSoup
+# todo - add asChild condition to path - to get the path that has specific child
+@register_action('path')
+class PathAction(ActionHandler):
+
+    def __init__(self, action_params):
+        super().__init__(action_params)
+        self.type = action_params['type']
+        self.html_type = action_params['HTMLtype'] if 'HTMLtype' in action_params else None
+        self.id_ = action_params['id'] if 'id' in action_params else None
+        self.class_ = action_params['class'] if 'class' in action_params else None
+        self.exclude = action_params['exclude'] if 'exclude' in action_params else None
+        self.attr = dict(action_params['attr']) if 'attr' in action_params else None
+        self.css = action_params['css'] if 'css' in action_params else None
+        self.xpath = action_params['xpath'] if 'xpath' in action_params else None
+        # compiled once per flow - see PathSelectors
+        self.selector = PathSelector(self.html_type, self.id_, self.class_, self.attr, css=self.css, xpath=self.xpath)
+        self.steps = [(self.selector, self.type == 'single')]
+
+    def is_fusible(self):
+        return not self.exclude and self.selector.is_fusible()
+
+    def run(self, worker, target_value, ctx):
+        logging.debug(f"{SERVICE}path action")
+        return worker.HTMLpath(target_value, self.type, self.html_type, self.id_, self.class_, self.attr, self.exclude,
+                               selector=self.selector)
+
+
+class FusedPathAction(PathAction):
+    '''
+    Chain of path actions without exclude - see _fuse_path_chain
+    '''
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.exclude = None
+        self.selector = FusedPathSelector(steps)
+
+    def is_fusible(self):
+        return all(selector.is_fusible() for selector, single in self.steps)
+
+    def run(self, worker, target_value, ctx):
+        logging.debug(f"{SERVICE}path action")
+        return self.selector.select(target_value)
+
+
+@register_action('table2csv')
+class Table2CsvAction(ActionHandler):
+
+    def __init__(self, action_params):
+        super().__init__(action_params)
+        self.id_ = action_params['id'] if 'id' in action_params else None
+        self.class_ = action_params['class'] if 'class' in action_params else None
+        self.pre_defined_columns = action_params['preDefinedColumns'] if 'preDefinedColumns' in action_params else {}
+        self.num_of_column_to_enforce = action_params['numOfColumnToEnforce'] if 'numOfColumnToEnforce' in action_params else -1
+        self.stream = action_params['stream'] if 'stream' in action_params else False
+
+    def run(self, worker, target_value, ctx):
+        logging.debug(f"{SERVICE}table2csv action")
+        return worker.table2csv(target_value, self.id_, self.class_, self.pre_defined_columns, self.num_of_column_to_enforce,
+                                stream=self.stream, ctx=ctx)
+
+
+# all the matching tables in one data frame
+@register_action('tables2csv')
+class Tables2CsvAction(Table2CsvAction):
+
+    def run(self, worker, target_value, ctx):
+        logging.debug(f"{SERVICE}tables2csv action")
+        return worker.tables2csv(target_value, self.id_, self.class_, self.pre_defined_columns,
+                                 self.num_of_column_to_enforce, ctx=ctx)
+
+
+@register_action('buildConnectionTree')
+class BuildConnectionTreeAction(ActionHandler):
+
+    def __init__(self, action_params):
+        super().__init__(action_params)
+        self.starting_point = action_params['StartintPoint'] if 'StartintPoint' in action_params else None
+        self.ending_point = action_params['EndingPoint'] if 'EndingPoint' in action_params else None
+        self.tree_relations = action_params['treeRelations']
+        self.save_to_var = action_params['saveToVar'] if 'saveToVar' in action_params else None
+
+    def run(self, worker, target_value, ctx):
+        logging.debug(f"{SERVICE}buildConnectionTree action")
+        tree = worker.build_connection_tree(target_value=target_value,
+                                            starting_point=self.starting_point,
+                                            ending_point=self.ending_point,
+                                            tree_relations=self.tree_relations,
+                                            save_to_var=self.save_to_var)
+        return tree[1]
+
+
+# tree to csv
+@register_action('treeBranch2csv')
+class TreeBranch2CsvAction(ActionHandler):
+
+    def __init__(self, action_params):
+        super().__init__(action_params)
+        self.html_table_idx = action_params['idxOfHtmlTable'] if 'idxOfHtmlTable' in action_params else None
+        self.pre_defined_columns = action_params['preDefinedColumns'] if 'preDefinedColumns' in action_params else None
+        self.stream = action_params['stream'] if 'stream' in action_params else False
+
+    def run(self, worker, target_value, ctx):
+        logging.debug(f"{SERVICE}treeBranch2csv action")
+        return worker.tree_branch_to_csv(branch=target_value, html_table_idx=self.html_table_idx,
+                                         pre_defined_columns=self.pre_defined_columns, stream=self.stream)
+
+
+# all the branches of the tree in one data frame
+@register_action('treeBranches2csv')
+class TreeBranches2CsvAction(TreeBranch2CsvAction):
+
+    def run(self, worker, target_value, ctx):
+        logging.debug(f"{SERVICE}treeBranches2csv action")
+        return worker.tree_branches_to_csv(tree=target_value, html_table_idx=self.html_table_idx,
+                                           pre_defined_columns=self.pre_defined_columns)
+
+
+# in this case target_value should be BeautifulSoup
+@register_action('get')
+class GetAction(ActionHandler):
+
+    def __init__(self, action_params):
+        super().__init__(action_params)
+        self.value = action_params['value']
+        self.fix_text = action_params['fixText'] if 'fixText' in action_params else None
+
+    def run(self, worker, target_value, ctx):
+        logging.debug(f"{SERVICE}get action")
+        if self.value == 'text':
+            val = target_value.text
+        else:
+            val = target_value.get(self.value)
+        if self.fix_text:
+            return worker.fix_text(val)
+        return val
+
+
+# in this case target_value should be string
+@register_action('substring')
+class SubstringAction(ActionHandler):
+
+    def __init__(self, action_params):
+        super().__init__(action_params)
+        self.start = action_params['start'] if 'start' in action_params else 0
+        self.end = action_params['end'] if 'end' in action_params else None
+
+    def run(self, worker, target_value, ctx):
+        logging.debug(f"{SERVICE}substring action")
+        end = self.end if self.end is not None else len(target_value)
+        return target_value[self.start:end]
+
+
+@register_action('concat')
+class ConcatAction(ActionHandler):
+
+    def __init__(self, action_params):
+        super().__init__(action_params)
+        self.prefix = action_params['prefix'] if 'prefix' in action_params else ''
+        self.suffix = action_params['suffix'] if 'suffix' in action_params else ''
+
+    def run(self, worker, target_value, ctx):
+        logging.debug(f"{SERVICE}concat action")
+        return self.prefix + target_value + self.suffix
+
+
+@register_action('createVar')
+class CreateVarAction(ActionHandler):
+
+    def run(self, worker, target_value, ctx):
+        logging.debug(f"{SERVICE}createVar action")
+        var = worker.create_execution_var(self.action_params)
+        ctx.execution_vars[var[0]] = var[1]
+        return var
+
+
+@register_action('saveToFile')
+class SaveToFileAction(ActionHandler):
+
+    def __init__(self, action_params):
+        super().__init__(action_params)
+        self.to = action_params['to']
+        self.long_name = action_params['longName']
+        self.file_type = action_params['fileType']
+        self.name_prefix = action_params['name_prefix'] if 'name_prefix' in action_params else None
+        self.dir_name = action_params['dir'] if 'dir' in action_params else None
+        self.sink_options = {name: action_params[name] for name in ('compression', 'bufferSize', 'batchRows')
+                             if name in action_params}
+
+    def run(self, worker, target_value, ctx):
+        logging.debug(f"{SERVICE}saveToFile action")
+        worker.save_to_file(target_value, to=self.to, long_name=self.long_name, file_type=self.file_type,
+                            name_prefix=self.name_prefix, dir_name=self.dir_name, sink_options=self.sink_options,
+                            ctx=ctx)
+
+
+@register_action('enqueueUrls')
+class EnqueueUrlsAction(ActionHandler):
+
+    def __init__(self, action_params):
+        super().__init__(action_params)
+        self.attr = action_params['attr'] if 'attr' in action_params else 'href'
+        self.flow = action_params['flow'] if 'flow' in action_params else None
+        self.title = action_params['title'] if 'title' in action_params else None
+
+    def run(self, worker, target_value, ctx):
+        logging.debug(f"{SERVICE}enqueueUrls action")
+        return worker.enqueue_urls(target_value, attr=self.attr, flow=self.flow, title=self.title, ctx=ctx)
+
+
+@register_action('addToVar')
+class AddToVarAction(ActionHandler):
+
+    def __init__(self, action_params):
+        super().__init__(action_params)
+        self.var_name = action_params['varName']
+        self.var_type = action_params['varType']
+        self.var_key = action_params['varKey'] if 'varKey' in action_params else None
+        self.has_var_value = 'varValue' in action_params
+        self.var_value = action_params['varValue'] if self.has_var_value else None
+
+    def run(self, worker, target_value, ctx):
+        logging.debug(f"{SERVICE}addToVar action")
+        execution_vars = ctx.execution_vars
+        var_key = self.var_key
+        if var_key and '$' in var_key:
+            if var_key == '$.':
+                var_key = target_value
+            else:
+                var_key = execution_vars[var_key[1:]]
+
+        var_value = self.var_value if self.has_var_value else target_value
+        if '$' in var_value:
+            var_value = execution_vars[var_value[1:]]
+        if self.var_type == 'list':
+            execution_vars[self.var_name].append(var_value)
+        if self.var_type == 'dict':
+            execution_vars[self.var_name][var_key] = var_value
+        if self.var_type == 'str':
+            execution_vars[self.var_name] = var_value
+        return target_value
+
+
+@register_action('removeVar')
+class RemoveVarAction(ActionHandler):
+
+    def __init__(self, action_params):
+        super().__init__(action_params)
+        self.var_name = action_params['varName']
+        self.var_type = action_params['varType']
+        self.var_key = action_params['varKey'] if 'varKey' in action_params else None
+        self.has_var_value = 'varValue' in action_params
+        self.var_value = action_params['varValue'] if self.has_var_value else None
+
+    def run(self, worker, target_value, ctx):
+        logging.debug(f"{SERVICE}removeVar action")
+        execution_vars = ctx.execution_vars
+        var_value = self.var_value if self.has_var_value else target_value
+        if '$' in var_value:
+            var_value = execution_vars[var_value[1:]]
+
+        var_key = self.var_key
+        if var_key and '$' in var_key:
+            var_key = execution_vars[var_key[1:]]
+        if self.var_type == 'list':
+            execution_vars[self.var_name].remove(var_value)
+        if self.var_type == 'dict':
+            execution_vars[self.var_name].pop(var_key)
+
+
+@register_action('getVar')
+class GetVarAction(ActionHandler):
+
+    def __init__(self, action_params):
+        super().__init__(action_params)
+        self.var_name = action_params['varName']
+
+    def run(self, worker, target_value, ctx):
+        logging.debug(f"{SERVICE}getVar action")
+        return ctx.execution_vars[self.var_name]
+
+
+@register_action('cleanVar')
+class CleanVarAction(ActionHandler):
+
+    def __init__(self, action_params):
+        super().__init__(action_params)
+        self.var_name = action_params['varName']
+
+    def run(self, worker, target_value, ctx):
+        logging.debug(f"{SERVICE}cleanVar action")
+        execution_vars = ctx.execution_vars
+        if type(execution_vars[self.var_name]) == list:
+            execution_vars[self.var_name] = []
+        elif type(execution_vars[self.var_name]) == dict:
+            execution_vars[self.var_name] = {}
+        else:
+            execution_vars[self.var_name] = ""
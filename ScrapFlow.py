@@ -0,0 +1,213 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+
+from ScrapActions import bind_actions, UnknownActionError
+from HtmlParsers import PARSER_BACKENDS
+
+FLOW_PREFIX = "ScrapFlow: "
+# Max number of compiled flows kept per process (file flows + inline flows)
+MAX_CACHED_FLOWS = 128
+SUB_ACTION_TYPES = ('loop', 'rec', 'tree_dfs')
+
+
+class ScrapFlowError(Exception):
+    pass
+
+
+class CompiledScrapFlow(object):
+    '''
+    Validated and immutable representation of a scrap flow yaml.
+    All the dicts of the yaml are frozen into MappingProxyType and all the lists into tuples so the same compiled
+    flow can be shared between all the works of the process.
+
+    :param key: the cache key the flow was compiled under
+    :param fingerprint: sha256 of the flow source - stay the same as long as the flow content is the same
+    :param pre_process: tuple of the preProcess actions (can be empty)
+    :param flow: tuple of the flow actions
+    :param pre_process_plan / flow_plan: the same actions bound to their handlers (see ScrapActions)
+    '''
+
+    __slots__ = ('key', 'fingerprint', 'source', 'settings', 'pre_process', 'flow', 'pre_process_plan', 'flow_plan')
+
+    def __init__(self, key, fingerprint, source, raw_flow):
+        object.__setattr__(self, 'key', key)
+        object.__setattr__(self, 'fingerprint', fingerprint)
+        object.__setattr__(self, 'source', source)
+        settings = {name: val for name, val in raw_flow.items() if name not in ('preProcess', 'flow')}
+        object.__setattr__(self, 'settings', freeze(settings))
+        object.__setattr__(self, 'pre_process', freeze(raw_flow.get('preProcess') or []))
+        object.__setattr__(self, 'flow', freeze(raw_flow['flow']))
+        try:
+            object.__setattr__(self, 'pre_process_plan', bind_actions(self.pre_process))
+            object.__setattr__(self, 'flow_plan', bind_actions(self.flow))
+        except UnknownActionError as e:
+            raise ScrapFlowError(f"{FLOW_PREFIX}{source} - {e}")
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{FLOW_PREFIX}compiled scrap flow is immutable")
+
+    def __repr__(self):
+        return f"CompiledScrapFlow(source={self.source}, fingerprint={self.fingerprint[:12]})"
+
+
+def freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(val) for key, val in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(val) for val in value)
+    return value
+
+
+def validate_scrap_flow(raw_flow, source):
+    if not isinstance(raw_flow, dict):
+        raise ScrapFlowError(f"{FLOW_PREFIX}{source} - scrap flow must be a mapping")
+    if 'flow' not in raw_flow or not isinstance(raw_flow['flow'], list):
+        raise ScrapFlowError(f"{FLOW_PREFIX}{source} - scrap flow must contain a 'flow' list")
+
+    if 'parser' in raw_flow and raw_flow['parser'] not in PARSER_BACKENDS:
+        raise ScrapFlowError(f"{FLOW_PREFIX}{source} - unknown parser {raw_flow['parser']}, "
+                             f"available parsers - {list(PARSER_BACKENDS.keys())}")
+
+    if 'preProcess' in raw_flow:
+        if not isinstance(raw_flow['preProcess'], list) or len(raw_flow['preProcess']) == 0:
+            raise ScrapFlowError(f"{FLOW_PREFIX}{source} - 'preProcess' must be a non empty list")
+        for idx, action in enumerate(raw_flow['preProcess']):
+            _validate_action(action, f"{source}:preProcess[{idx}]")
+
+    for idx, action in enumerate(raw_flow['flow']):
+        _validate_action(action, f"{source}:flow[{idx}]")
+
+    if raw_flow.get('parser') != 'lxml.html' and _has_xpath_path(raw_flow['flow']):
+        raise ScrapFlowError(f"{FLOW_PREFIX}{source} - xpath path action require 'parser: lxml.html'")
+
+
+def _load_yaml(content):
+    # yaml is imported with the first compiled flow - the flows are cached, so it is parsed once per flow
+    import yaml
+    return yaml.load(content, Loader=yaml.FullLoader)
+
+
+def _has_xpath_path(actions):
+    for action in actions:
+        if action.get('actionName') == 'path' and 'xpath' in (action.get('actionParams') or {}):
+            return True
+        if _has_xpath_path(action.get('subActions', [])) or _has_xpath_path(action.get('actions', [])):
+            return True
+    return False
+
+
+def _validate_action(action, where):
+    if not isinstance(action, dict):
+        raise ScrapFlowError(f"{FLOW_PREFIX}{where} - action must be a mapping")
+
+    # loop block - {type: loop, actions: [...]}
+    if 'actionType' not in action and 'type' in action:
+        if action['type'] != 'loop':
+            return
+        if not isinstance(action.get('actions'), list):
+            raise ScrapFlowError(f"{FLOW_PREFIX}{where} - loop block must contain an 'actions' list")
+        for idx, sub_action in enumerate(action['actions']):
+            _validate_action(sub_action, f"{where}.actions[{idx}]")
+        return
+
+    if not isinstance(action.get('actionName'), str):
+        raise ScrapFlowError(f"{FLOW_PREFIX}{where} - missing 'actionName'")
+    if 'actionParams' in action and not isinstance(action['actionParams'], (dict, list)):
+        raise ScrapFlowError(f"{FLOW_PREFIX}{where} - 'actionParams' must be a mapping")
+    # unknown sub action types used to be skipped silently - a typo dropped the whole sub tree of the flow
+    if 'actionType' in action and action['actionType'] not in SUB_ACTION_TYPES + ('Atomic',):
+        raise ScrapFlowError(f"{FLOW_PREFIX}{where} - unknown actionType {action['actionType']}")
+
+    sub_actions = action.get('subActions', [])
+    if not isinstance(sub_actions, list):
+        raise ScrapFlowError(f"{FLOW_PREFIX}{where} - 'subActions' must be a list")
+    for idx, sub_action in enumerate(sub_actions):
+        _validate_action(sub_action, f"{where}.subActions[{idx}]")
+
+
+class ScrapFlowCache(object):
+    '''
+    Per process cache of compiled scrap flows.
+    File flows are keyed by their absolute path + mtime + size so an edited flow file is picked up on the next work,
+    inline flows are keyed by the hash of their content.
+    '''
+
+    def __init__(self, max_size=MAX_CACHED_FLOWS):
+        self.max_size = max_size
+        self._flows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, scrap_path):
+        full_path = os.path.abspath(scrap_path)
+        stat = os.stat(full_path)
+        key = ('file', full_path, stat.st_mtime_ns, stat.st_size)
+
+        compiled_flow = self._get(key)
+        if compiled_flow:
+            return compiled_flow
+
+        logging.debug(f"{FLOW_PREFIX}Compiling scrap flow - {full_path}")
+        with open(full_path, 'rb') as file:
+            content = file.read()
+        raw_flow = _load_yaml(content)
+        validate_scrap_flow(raw_flow, full_path)
+        compiled_flow = CompiledScrapFlow(key, hashlib.sha256(content).hexdigest(), full_path, raw_flow)
+        return self._put(key, compiled_flow)
+
+    def load_inline(self, inline_flow):
+        # inline flow can be sent as yaml/json string or as an already parsed dict
+        if isinstance(inline_flow, str):
+            content = inline_flow.encode('utf-8')
+        else:
+            content = json.dumps(inline_flow, sort_keys=True, default=str).encode('utf-8')
+        fingerprint = hashlib.sha256(content).hexdigest()
+        key = ('inline', fingerprint)
+
+        compiled_flow = self._get(key)
+        if compiled_flow:
+            return compiled_flow
+
+        logging.debug(f"{FLOW_PREFIX}Compiling inline scrap flow - {fingerprint[:12]}")
+        raw_flow = _load_yaml(inline_flow) if isinstance(inline_flow, str) else inline_flow
+        validate_scrap_flow(raw_flow, 'inline_scrap_flow')
+        compiled_flow = CompiledScrapFlow(key, fingerprint, 'inline_scrap_flow', raw_flow)
+        return self._put(key, compiled_flow)
+
+    def clear(self):
+        with self._lock:
+            self._flows.clear()
+
+    def _get(self, key):
+        with self._lock:
+            compiled_flow = self._flows.get(key)
+            if compiled_flow:
+                self._flows.move_to_end(key)
+            return compiled_flow
+
+    def _put(self, key, compiled_flow):
+        with self._lock:
+            self._flows[key] = compiled_flow
+            while len(self._flows) > self.max_size:
+                self._flows.popitem(last=False)
+        return compiled_flow
+
+
+# The worker module is re-executed by WLO for every message, so the process wide cache must live here
+_flow_cache = ScrapFlowCache()
+
+
+def get_flow_cache():
+    return _flow_cache
+
+
+def load_scrap_flow(scrap_path):
+    return _flow_cache.load(scrap_path)
+
+
+def load_inline_scrap_flow(inline_flow):
+    return _flow_cache.load_inline(inline_flow)
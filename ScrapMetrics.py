@@ -0,0 +1,341 @@
+'''
+Timing instrumentation of the scrap works, enabled with the metrics execution param:
+
+    EXECUTION_PARAMS='{"urls": ..., "scarpFlowYAml": ..., "metrics": {"dir": "scraper_metrics", "port": 9464}}'
+
+Every worker process records latency histograms per stage and name:
+    fetch  - http / cache / preProcess (selenium) fetch of the page
+    js     - selenium render of a dynamic page
+    parse  - html parsing (by parser backend)
+    action - every flow action (by action name - the action itself, without its sub actions)
+    save   - closing the output files of the work
+    scrap  - the whole scrap of a fetched page (js render, parse, flow and save)
+and counters - pages (scraped / skipped / failed), fetched bytes and written table rows.
+
+Every process write a snapshot of its metrics to <dir>/metrics-<pid>.json (at most every flushInterval seconds).
+The JSON report of the run merge all the snapshots:
+
+    python ScrapMetrics.py --dir scraper_metrics > report.json
+
+With port, one of the worker processes serves the merged metrics on http://127.0.0.1:<port>/metrics (Prometheus
+text format) and /report.json.
+'''
+
+import argparse
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+METRICS_PREFIX = "ScrapMetrics: "
+
+DEFAULT_METRICS_CONFIG = {
+    'dir': 'scraper_metrics',
+    # local Prometheus endpoint port (None - no endpoint)
+    'port': None,
+    'host': '127.0.0.1',
+    # seconds between two snapshots of a process
+    'flushInterval': 10,
+}
+
+# histogram buckets upper bounds (seconds)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNTERS = ('pages_scraped', 'pages_skipped', 'pages_failed', 'fetched_bytes', 'rows')
+
+
+def build_metrics_config(metrics_config=None):
+    config = dict(DEFAULT_METRICS_CONFIG)
+    if metrics_config:
+        config.update(metrics_config)
+    return config
+
+
+class Histogram(object):
+    '''
+    Latency histogram - counts per bucket (the last one is +Inf), sum and count
+    '''
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, counts=None, sum=0.0, count=0):
+        self.counts = list(counts) if counts else [0] * (len(BUCKETS) + 1)
+        self.sum = sum
+        self.count = count
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def merge(self, other):
+        self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+        self.sum += other.sum
+        self.count += other.count
+
+    def quantile(self, q):
+        '''
+        :return: estimate of the q quantile (linear inside the bucket)
+        '''
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for idx, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = BUCKETS[idx - 1] if idx > 0 else 0.0
+                upper = BUCKETS[idx] if idx < len(BUCKETS) else BUCKETS[-1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return BUCKETS[-1]
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.sum, 'counts': self.counts}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['counts'], data['sum'], data['count'])
+
+
+class ScrapMetrics(object):
+    '''
+    Metrics of a worker process
+    :param config: metrics config (see DEFAULT_METRICS_CONFIG)
+    '''
+
+    def __init__(self, config):
+        self.config = config
+        self.histograms = {}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        os.makedirs(config['dir'], exist_ok=True)
+        self.pid = os.getpid()
+        self.path = os.path.join(config['dir'], f'metrics-{self.pid}.json')
+
+    def observe(self, stage, name, seconds):
+        key = (stage, name)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, name, time.perf_counter() - start)
+
+    def count(self, counter, value=1):
+        with self._lock:
+            self.counters[counter] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {'histograms': [[stage, name, histogram.to_dict()]
+                                   for (stage, name), histogram in self.histograms.items()],
+                    'counters': dict(self.counters)}
+
+    def flush(self):
+        '''
+        Write the snapshot of this process to the metrics directory
+        '''
+        # a forked process must not overwrite the snapshot of its parent
+        if os.getpid() != self.pid:
+            return
+        snapshot = self.snapshot()
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(snapshot, file)
+        os.replace(tmp_path, self.path)
+        self._last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self.config['flushInterval']:
+            self.flush()
+
+
+def merge_snapshots(metrics_dir):
+    '''
+    :return: (histograms {(stage, name): Histogram}, counters) of all the process snapshots in the directory
+    '''
+    histograms = {}
+    counters = dict.fromkeys(COUNTERS, 0)
+    for path in glob.glob(os.path.join(metrics_dir, 'metrics-*.json')):
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError):
+            continue
+        for stage, name, data in snapshot['histograms']:
+            histogram = histograms.setdefault((stage, name), Histogram())
+            histogram.merge(Histogram.from_dict(data))
+        for counter, value in snapshot['counters'].items():
+            counters[counter] = counters.get(counter, 0) + value
+    return histograms, counters
+
+
+def _histogram_order(item):
+    (stage, name), histogram = item
+    return stage, str(name)
+
+
+def build_report(metrics_dir):
+    '''
+    :return: JSON report of the run - per stage and name: count, total / mean seconds and p50 / p95 / p99 estimates
+    '''
+    histograms, counters = merge_snapshots(metrics_dir)
+    stages = {}
+    for (stage, name), histogram in sorted(histograms.items(), key=_histogram_order):
+        stages.setdefault(stage, {})[name] = {
+            'count': histogram.count,
+            'totalSeconds': round(histogram.sum, 6),
+            'meanSeconds': round(histogram.sum / histogram.count, 6) if histogram.count else 0.0,
+            'p50Seconds': round(histogram.quantile(0.5), 6),
+            'p95Seconds': round(histogram.quantile(0.95), 6),
+            'p99Seconds': round(histogram.quantile(0.99), 6),
+        }
+    return {'stages': stages, 'counters': counters}
+
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text(metrics_dir):
+    '''
+    :return: the merged metrics in Prometheus text exposition format
+    '''
+    histograms, counters = merge_snapshots(metrics_dir)
+    lines = ['# HELP scraper_stage_seconds Latency of the scrap stages',
+             '# TYPE scraper_stage_seconds histogram']
+    for (stage, name), histogram in sorted(histograms.items(), key=_histogram_order):
+        labels = f'stage="{_label_value(stage)}",name="{_label_value(name)}"'
+        cumulative = 0
+        for idx, count in enumerate(histogram.counts):
+            cumulative += count
+            bound = repr(BUCKETS[idx]) if idx < len(BUCKETS) else '+Inf'
+            lines.append(f'scraper_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'scraper_stage_seconds_sum{{{labels}}} {histogram.sum}')
+        lines.append(f'scraper_stage_seconds_count{{{labels}}} {histogram.count}')
+
+    lines += ['# HELP scraper_pages_total Scraped pages by result', '# TYPE scraper_pages_total counter']
+    for result in ('scraped', 'skipped', 'failed'):
+        lines.append(f'scraper_pages_total{{result="{result}"}} {counters.get("pages_" + result, 0)}')
+    lines += ['# HELP scraper_fetched_bytes_total Bytes of the fetched pages',
+              '# TYPE scraper_fetched_bytes_total counter',
+              f'scraper_fetched_bytes_total {counters.get("fetched_bytes", 0)}',
+              '# HELP scraper_rows_total Table rows written to the output files',
+              '# TYPE scraper_rows_total counter',
+              f'scraper_rows_total {counters.get("rows", 0)}']
+    return '\n'.join(lines) + '\n'
+
+
+def _metrics_request_handler(metrics):
+    # http.server is imported only by the process that serves the metrics
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsRequestHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            # the serving process publish its own metrics before merging
+            metrics.flush()
+            if self.path == '/metrics':
+                body = prometheus_text(metrics.config['dir']).encode('utf-8')
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            elif self.path == '/report.json':
+                body = json.dumps(build_report(metrics.config['dir']), indent=2).encode('utf-8')
+                content_type = 'application/json'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsRequestHandler
+
+
+def start_metrics_server(metrics):
+    '''
+    Serve the metrics directory on the config port - only one of the worker processes can bind it
+    :return: the http server, None if the port is already taken
+    '''
+    from http.server import ThreadingHTTPServer
+    try:
+        server = ThreadingHTTPServer((metrics.config['host'], metrics.config['port']),
+                                     _metrics_request_handler(metrics))
+    except OSError:
+        logging.debug(f"{METRICS_PREFIX}Port {metrics.config['port']} is served by another process")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"{METRICS_PREFIX}Serving metrics on http://{metrics.config['host']}:{metrics.config['port']}/metrics")
+    return server
+
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def get_scrap_metrics(metrics_config):
+    '''
+    :return: the metrics of this process for the metrics directory
+    '''
+    config = build_metrics_config(metrics_config)
+    # forked processes (flow process pool) have their own metrics
+    key = (os.path.abspath(config['dir']), os.getpid())
+    with _metrics_lock:
+        if key not in _metrics:
+            import multiprocessing.util
+            metrics = _metrics[key] = ScrapMetrics(config)
+            atexit.register(metrics.flush)
+            # the flow pool processes exit without atexit
+            multiprocessing.util.Finalize(metrics, metrics.flush, exitpriority=10)
+            if config['port']:
+                start_metrics_server(metrics)
+        return _metrics[key]
+
+
+def metrics_of(working_params):
+    '''
+    :return: the process metrics if the work params enable them, else None
+    '''
+    if 'metrics' not in working_params:
+        return None
+    return get_scrap_metrics(working_params['metrics'])
+
+
+def reset_metrics_dir(metrics_config):
+    '''
+    Remove the snapshots of the previous run (called by the message creator before the works are sent)
+    '''
+    config = build_metrics_config(metrics_config)
+    for path in glob.glob(os.path.join(config['dir'], 'metrics-*.json')):
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON report of the scraper metrics')
+    parser.add_argument('--dir', default=DEFAULT_METRICS_CONFIG['dir'])
+    parser.add_argument('--prometheus', action='store_true', help='Prometheus text format instead of JSON')
+    args = parser.parse_args()
+    if args.prometheus:
+        print(prometheus_text(args.dir), end='')
+    else:
+        print(json.dumps(build_report(args.dir), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,9 +3,26 @@ import logging
 import json
 from datetime import datetime
 import os
+import sys
+import time
 from WLO.src.Utils.Utils import *
 
+# WLO loads this module by its file path, make sure the sibling modules are importable
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+if MODULE_DIR not in sys.path:
+    sys.path.insert(0, MODULE_DIR)
+from Dedup import UrlDeduplicator
+from UrlSources import iter_url_source
+from PolitenessScheduler import interleave_by_host, build_politeness_config
+from CrawlJournal import load_completed, journal_key, build_journal_config
+from ResponseCache import scrap_key
+from ScrapFlow import load_scrap_flow
+from CrawlFrontier import get_crawl_frontier, build_frontier_config, flow_reference
+from ScrapMetrics import reset_metrics_dir
+
 DRIVER_PREFIX = "MessageCreator-Driver-WebScraping: "
+# execution params that are passed as is to the workers (inside the work params)
+WORKER_PARAMS = ['httpSession', 'asyncFetch', 'browserPool', 'responseCache', 'dedupContent', 'politeness', 'journal', 'frontier', 'processPool', 'metrics']
 #SCRAP_WORKER_FULL_PATH = os.path.dirname(os.path.abspath(__file__))
 
 class MessageCreator(MessageCreatorAbstract):
@@ -18,35 +35,148 @@ class MessageCreator(MessageCreatorAbstract):
         self.urls_file_path = params['urls']
         self.is_inline_urls = params['isUrlsInline'] if 'isUrlsInline' in params else False
         self.scraping_flow = params['scarpFlowYAml']
+        # json / jsonl / csv / txt - by default by the urls file extension (see UrlSources)
+        self.urls_format = params['urlsFormat'] if 'urlsFormat' in params else None
+        self.worker_params = {name: params[name] for name in WORKER_PARAMS if name in params}
+        self.dedup_urls = params['dedupUrls'] if 'dedupUrls' in params else True
+        # number of urls per work message (1 - the original one url message)
+        self.batch_size = max(1, int(params['batchSize'])) if 'batchSize' in params else 1
+        # skip the works that the crawl journal already has
+        self.resume = params['resume'] if 'resume' in params else False
+        self.frontier = None
+        self.start_time = None
 
     def create_messages(self, queue):
         dateTimeObj = datetime.now()
-        urls = []
-
+        self.start_time = time.time()
+        # metrics snapshots of the previous run (a resumed run keep counting)
+        if 'metrics' in self.worker_params and not self.resume:
+            reset_metrics_dir(self.worker_params['metrics'])
+        # urls discovered by the flows (enqueueUrls action) are sent in the same run
+        if 'frontier' in self.worker_params:
+            self.frontier = get_crawl_frontier(self.worker_params['frontier'])
+            if self.resume:
+                self.frontier.requeue_in_flight()
+            else:
+                self.frontier.reset()
+        urls = self.iter_urls()
+        # the same url (after canonicalisation) is sent only once - with the first title it appears under
+        deduplicator = UrlDeduplicator() if self.dedup_urls else None
+        if deduplicator:
+            urls = self.skip_duplicates(urls, deduplicator)
+        if self.resume and 'journal' in self.worker_params:
+            urls = self.skip_completed(urls)
+        # round robin across the hosts instead of the file order
+        if 'politeness' in self.worker_params:
+            window = build_politeness_config(self.worker_params['politeness'])['interleaveWindow']
+            urls = interleave_by_host(urls, window)
+
+        # works are batched per title - one message carry the flow and up to batchSize urls
+        batches = {}
+        for title, url in urls:
+            batch = batches.setdefault(title, [])
+            batch.append(url)
+            if len(batch) >= self.batch_size:
+                self.send_work(queue, title, batch)
+                del batches[title]
+        for title, batch in batches.items():
+            self.send_work(queue, title, batch)
+
+        if deduplicator and deduplicator.num_of_duplicates:
+            logging.info(f"{DRIVER_PREFIX} Skipped {deduplicator.num_of_duplicates} duplicate urls")
+
+        if self.frontier:
+            self.send_frontier_works(queue)
+
+    def send_frontier_works(self, queue):
+        '''
+        Send the urls that the flows discover till nothing is pending or in flight
+        '''
+        config = build_frontier_config(self.worker_params['frontier'])
+        num_of_works = 0
+        poll_start = time.time()
+        while True:
+            if config['maxSeconds'] is not None and time.time() - poll_start > config['maxSeconds']:
+                logging.warning(f"{DRIVER_PREFIX} Crawl frontier reached maxSeconds - the discovered urls are kept "
+                                f"for a resume run")
+                break
+            frontier_urls = self.frontier.take_pending(max(self.batch_size, 100))
+            if not frontier_urls and self.frontier.requeue_lost():
+                continue
+            if not frontier_urls:
+                if not self.frontier.num_of_in_flight():
+                    break
+                # the workers are started after the message creator - nothing would take the works now
+                if (self.frontier.last_taken() < self.start_time
+                        and time.time() - poll_start > config['workerStartTimeout']):
+                    logging.warning(f"{DRIVER_PREFIX} No work was taken by a worker for {config['workerStartTimeout']}"
+                                    f"s - the crawl frontier require the workers to be started first")
+                    break
+                time.sleep(config['pollInterval'])
+                continue
+
+            batches = {}
+            for frontier_url in frontier_urls:
+                batches.setdefault((frontier_url.title, frontier_url.flow, frontier_url.depth), []).append(frontier_url.url)
+            for (title, flow, depth), urls in batches.items():
+                for idx in range(0, len(urls), self.batch_size):
+                    self.send_work(queue, title, urls[idx:idx + self.batch_size], flow=json.loads(flow), depth=depth)
+            num_of_works += len(frontier_urls)
+        logging.info(f"{DRIVER_PREFIX} Crawl frontier is done - sent {num_of_works} discovered urls")
+
+    def skip_duplicates(self, urls, deduplicator):
+        for title, url in urls:
+            if not deduplicator.is_new(url):
+                logging.debug(f"{DRIVER_PREFIX} Skipping duplicate url - {url}")
+                continue
+            yield title, url
+
+    def skip_completed(self, urls):
+        completed = load_completed(build_journal_config(self.worker_params['journal'])['dir'])
+        fingerprint = load_scrap_flow(self.scraping_flow).fingerprint
+        num_of_completed = 0
+        for title, url in urls:
+            if journal_key(url, scrap_key(fingerprint, title)) in completed:
+                num_of_completed += 1
+                continue
+            yield title, url
+        logging.info(f"{DRIVER_PREFIX} Resume - skipped {num_of_completed} completed urls")
+
+    def iter_urls(self):
+        '''
+        :return: generator of (title, url) - title is None for inline urls
+        '''
         if self.is_inline_urls:
-            urls = self.urls_file_path.split(',')
-            for url in urls:
-                work = dict(
-                    params=dict(worker_driver='WebSitesScrapingWorker'),
-                    payload=dict(scrap_flow=self.scraping_flow, url_to_scrap=url)
-                )
-                logging.debug(f"{DRIVER_PREFIX} Going to send the work - {work}")
-                queue.put(work)
+            for url in self.urls_file_path.split(','):
+                yield None, url
 
         else:
-            with open(self.urls_file_path, 'r') as file:
-                content = json.load(file)
+            # streamed - the works are sent while the file is read
+            yield from iter_url_source(self.urls_file_path, self.urls_format)
+
+    def send_work(self, queue, title, urls, flow=None, depth=0):
+        '''
+        :param flow: flow part of the payload (default - the scarpFlowYAml flow)
+        :param depth: crawl depth of the urls (the urls file is depth 0)
+        '''
+        if title is None:
+            params = dict(worker_driver='WebSitesScrapingWorker', **self.worker_params)
+        else:
+            params = dict(worker_driver='WebSitesScrapingWorker', title=title, **self.worker_params)
 
-            for title, urls in content.items():
+        flow = flow or dict(scrap_flow=self.scraping_flow)
+        if self.batch_size == 1:
+            payload = dict(flow, url_to_scrap=urls[0])
+        else:
+            payload = dict(flow, urls_to_scrap=list(urls))
+        if self.frontier:
+            payload['depth'] = depth
+            if depth == 0:
                 for url in urls:
-                    work = dict(
-                        params=dict(worker_driver='WebSitesScrapingWorker',title=title),
-                        payload=dict(scrap_flow=self.scraping_flow, url_to_scrap=url)
-                    )
-                    logging.debug(f"{DRIVER_PREFIX} Going to send the work - {work}")
-                    queue.put(work)
-
-
+                    self.frontier.add_seed(url, flow_reference(flow), title)
+        work = dict(params=params, payload=payload)
+        logging.debug(f"{DRIVER_PREFIX} Going to send the work - {work}")
+        queue.put(work)
 
 
 def init(params):
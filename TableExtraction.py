@@ -0,0 +1,150 @@
+'''
+Streaming table extraction - table rows are produced lazily and written straight to the output file so the whole
+table is never materialised (and pandas is not needed at all).
+
+Batched table extraction - TableBatch collect many tables of a page (tables2csv / treeBranches2csv) into columnar
+buffers and build one DataFrame with a table id column, the cells text is cleaned per column with the pandas string
+methods instead of fix_text per cell.
+'''
+
+import csv
+import json
+
+TABLE_ID_COLUMN = 'table_id'
+# the characters of str.isspace (str.split separators) - \\s of the pyarrow regex engine is ascii only
+WHITESPACE_PATTERN = '[\t\n\x0b\x0c\r\x1c-\x1f \x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]+'
+
+
+class TableRowStream(object):
+    '''
+    Lazy table - header + generator of rows
+    The rows can be consumed only once (by the first saveToFile that get the stream)
+    :param header: list of columns names
+    :param rows: iterable of rows (list of values by the header order)
+    '''
+
+    def __init__(self, header, rows):
+        self.header = header
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def to_data_frame(self):
+        import pandas as pd
+        return pd.DataFrame(data=list(self.rows), columns=self.header)
+
+
+def write_csv_rows(file, table_stream, write_header=True):
+    '''
+    Write the stream in the same csv dialect as DataFrame.to_csv(index=False)
+    :return: number of written rows
+    '''
+    writer = csv.writer(file, lineterminator='\n')
+    if write_header:
+        writer.writerow(table_stream.header)
+    num_of_columns = len(table_stream.header)
+    num_of_rows = 0
+    for row in table_stream:
+        # short rows get empty values, as the NaN of the DataFrame
+        if len(row) < num_of_columns:
+            row = list(row) + [''] * (num_of_columns - len(row))
+        writer.writerow(row)
+        num_of_rows += 1
+    return num_of_rows
+
+
+def write_jsonl_rows(file, table_stream):
+    '''
+    Write every row as json object {column: value} in its own line
+    :return: number of written rows
+    '''
+    header = table_stream.header
+    num_of_rows = 0
+    for row in table_stream:
+        if len(row) < len(header):
+            row = list(row) + [None] * (len(header) - len(row))
+        file.write(json.dumps(dict(zip(header, row)), ensure_ascii=False))
+        file.write('\n')
+        num_of_rows += 1
+    return num_of_rows
+
+
+class TableBatch(object):
+    '''
+    Columnar buffers of many tables - one DataFrame for all of them.
+    The columns are aligned by name - the n-th column with the same name in every table is the same column, and the
+    rows of a table without this column get an empty value.
+    :param table_id_column: name of the table id column (the first column)
+    '''
+
+    def __init__(self, table_id_column=TABLE_ID_COLUMN):
+        self.table_id_column = table_id_column
+        # column key -> list of values, by the order the columns were found
+        self._id_key = ('id', table_id_column, 0)
+        self._columns = {self._id_key: []}
+        self.num_of_rows = 0
+
+    def add_table(self, table_id, pre_defined_values, header, rows):
+        '''
+        :param table_id: value of the table id column
+        :param pre_defined_values: list of (column name, value) - the same value in all the rows of the table
+        :param header: names of the cells columns
+        :param rows: iterable of rows - list of the raw text of the cells (cleaned by to_data_frame)
+        '''
+        rows = list(rows)
+        num_of_rows = len(rows)
+        num_of_cells = max([len(header)] + [len(row) for row in rows])
+        # cells without header are unnamed columns
+        cell_keys = self._keys('cell', list(header) + [''] * (num_of_cells - len(header)))
+        pre_defined_keys = self._keys('pre', [name for name, value in pre_defined_values])
+
+        table_columns = {self._id_key: [table_id] * num_of_rows}
+        for key, (name, value) in zip(pre_defined_keys, pre_defined_values):
+            table_columns[key] = [value] * num_of_rows
+        for idx, key in enumerate(cell_keys):
+            table_columns[key] = [row[idx] if idx < len(row) else None for row in rows]
+
+        for key, values in table_columns.items():
+            if key not in self._columns:
+                self._columns[key] = [None] * self.num_of_rows
+            self._columns[key].extend(values)
+        self.num_of_rows += num_of_rows
+        for values in self._columns.values():
+            if len(values) < self.num_of_rows:
+                values.extend([None] * (self.num_of_rows - len(values)))
+
+    def to_data_frame(self):
+        '''
+        :return: DataFrame - table id column, and the pre defined and cells columns by the order they were found.
+        The cells text is cleaned like WebSiteScarperWorker.fix_text (no quotes, single spaces, stripped)
+        '''
+        import pandas as pd
+        names = []
+        data = {}
+        for idx, (key, values) in enumerate(self._columns.items()):
+            kind, name, occurrence = key
+            if kind == 'cell':
+                data[idx] = clean_text_column(pd.Series(values, dtype='str'))
+            else:
+                data[idx] = pd.Series(values, dtype=object)
+            names.append(name)
+        data_frame = pd.DataFrame(data)
+        data_frame.columns = names
+        return data_frame
+
+    @staticmethod
+    def _keys(kind, names):
+        counts = {}
+        keys = []
+        for name in names:
+            keys.append((kind, name, counts.get(name, 0)))
+            counts[name] = counts.get(name, 0) + 1
+        return keys
+
+
+def clean_text_column(column):
+    '''
+    Vectorised fix_text on a pandas string Series (missing values are kept)
+    '''
+    return column.str.replace('"', '', regex=False).str.replace(WHITESPACE_PATTERN, ' ', regex=True).str.strip(' ')
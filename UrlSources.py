@@ -0,0 +1,183 @@
+'''
+Streaming readers of the message creator urls file.
+The urls are read one by one (constant memory) so the works are sent while the file is still being read.
+
+Formats - chosen by the urlsFormat execution param or by the file extension (a .gz file is decompressed on the fly):
+    json  - the original {title: [urls]} object, parsed incrementally
+    jsonl - one json per line - {"url": ..., "title": ...} or a url string
+    csv   - url and title columns (by header), or url in the first column and title in the second
+    txt   - one url per line, empty lines and # comments are skipped
+'''
+
+import csv
+import gzip
+import json
+
+SOURCES_PREFIX = "UrlSources: "
+READ_CHUNK_SIZE = 64 * 1024
+
+URL_SOURCES = {}
+
+
+class UrlSourceError(Exception):
+    pass
+
+
+def register_url_source(format_name):
+    def decorator(reader):
+        URL_SOURCES[format_name] = reader
+        return reader
+    return decorator
+
+
+def open_urls_file(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    extension = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+    return extension if extension in URL_SOURCES else 'json'
+
+
+def iter_url_source(path, urls_format=None):
+    '''
+    :param path: urls file path
+    :param urls_format: one of URL_SOURCES (default - by the file extension)
+    :return: generator of (title, url) - title is None when the source has no title
+    '''
+    urls_format = urls_format or detect_format(path)
+    if urls_format not in URL_SOURCES:
+        raise UrlSourceError(f"{SOURCES_PREFIX}Unknown urls format - {urls_format}")
+    with open_urls_file(path) as file:
+        yield from URL_SOURCES[urls_format](file)
+
+
+@register_url_source('txt')
+def read_txt_urls(file):
+    for line in file:
+        url = line.strip()
+        if url and not url.startswith('#'):
+            yield None, url
+
+
+@register_url_source('jsonl')
+def read_jsonl_urls(file):
+    for line_num, line in enumerate(file, 1):
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        if isinstance(record, str):
+            yield None, record
+        elif isinstance(record, dict) and 'url' in record:
+            yield record.get('title'), record['url']
+        else:
+            raise UrlSourceError(f"{SOURCES_PREFIX}Line {line_num} is not a url or an object with url")
+
+
+@register_url_source('csv')
+def read_csv_urls(file):
+    reader = csv.reader(file)
+    url_idx, title_idx = 0, 1
+    first_row = next(reader, None)
+    if first_row is None:
+        return
+    header = [column.strip().lower() for column in first_row]
+    if 'url' in header:
+        url_idx = header.index('url')
+        title_idx = header.index('title') if 'title' in header else None
+        rows = reader
+    else:
+        rows = _chain_first(first_row, reader)
+
+    for row in rows:
+        if len(row) <= url_idx or not row[url_idx].strip():
+            continue
+        title = row[title_idx] if title_idx is not None and len(row) > title_idx and row[title_idx] else None
+        yield title, row[url_idx].strip()
+
+
+def _chain_first(first, rest):
+    yield first
+    yield from rest
+
+
+@register_url_source('json')
+def read_json_urls(file):
+    '''
+    Incremental parser of {title: [urls]} - only the current chunk of the file is in memory
+    '''
+    tokens = _JsonTokens(file)
+    tokens.expect('{')
+    if tokens.peek() == '}':
+        return
+    while True:
+        title = tokens.value()
+        tokens.expect(':')
+        tokens.expect('[')
+        if tokens.peek() == ']':
+            tokens.expect(']')
+        else:
+            while True:
+                yield title, tokens.value()
+                if tokens.expect(',', ']') == ']':
+                    break
+        if tokens.expect(',', '}') == '}':
+            return
+
+
+class _JsonTokens(object):
+    '''
+    Read json structural chars and values from a text file, chunk by chunk
+    '''
+
+    def __init__(self, file):
+        self.file = file
+        self.buffer = ''
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.file.read(READ_CHUNK_SIZE)
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return bool(chunk)
+
+    def _skip_spaces(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return
+
+    def peek(self):
+        self._skip_spaces()
+        return self.buffer[self.pos] if self.pos < len(self.buffer) else None
+
+    def expect(self, *chars):
+        char = self.peek()
+        if char not in chars:
+            raise UrlSourceError(f"{SOURCES_PREFIX}Invalid urls json - expected {' or '.join(chars)}, got {char}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        self._skip_spaces()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                # the value may continue in the next chunk
+                if not self._fill():
+                    raise UrlSourceError(f"{SOURCES_PREFIX}Invalid urls json - {e}")
+                continue
+            if end == len(self.buffer) and self._fill():
+                # a number / literal may continue in the next chunk - decode again with more data
+                continue
+            self.pos = end
+            if not isinstance(value, str):
+                raise UrlSourceError(f"{SOURCES_PREFIX}Invalid urls json - expected string, got {value!r}")
+            return value
@@ -1,27 +1,41 @@
 #!/usr/bin/env python3
 
 import argparse
-from bs4 import BeautifulSoup
-import requests
 import logging
 from datetime import datetime
 import json
-import pandas as pd
 import os
-import yaml
+import sys
 import re
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium import webdriver
 import time
+from collections import deque
 from colorama import Fore
 from colorama import Style
 
 from WLO.src.WorkerAbs import *
 from WLO.src.Utils.Utils import *
 
+# WLO loads this module by its file path, make sure the sibling modules are importable
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+if MODULE_DIR not in sys.path:
+    sys.path.insert(0, MODULE_DIR)
+from ScrapFlow import load_scrap_flow, load_inline_scrap_flow
+from ScrapActions import bind_action, get_action_handler, BoundAction
+from HttpSessionPool import get_session_pool
+from BrowserPool import get_browser_pool, configure_browser_pool, wait_for_page
+from HtmlParsers import parse_html, is_dynamic_js_page, POTENTIAL_DYNAMIC_JS_CONTENT, DEFAULT_PARSER
+from TableExtraction import TableRowStream, TableBatch
+from OutputSinks import OutputSinks
+from ExecutionContext import ExecutionContext
+from ResponseCache import get_response_cache, scrap_key, PAGE_NOT_MODIFIED
+from Dedup import get_content_index
+from PolitenessScheduler import get_host_throttle
+from CrawlJournal import get_crawl_journal
+from CrawlFrontier import get_crawl_frontier, flow_reference
+from ScrapMetrics import metrics_of
+
 #from setup import VERSION
 VERSION = '0.0.1'
-POTENTIAL_DYNAMIC_JS_CONTENT = 'Please enable Javascript to use this application'
 SERVICE="Scraper - "
 
 
@@ -39,63 +53,312 @@ def prep_title(txt):
 DRIVER_PREFIX = "Worker-Driver-WebScraping: "
 
 
+class _ElementStream(object):
+    '''
+    Index access to the elements after an element (document order) that are read only once - only the last elements
+    are kept, the tree builder only move forward (or one step back)
+    :param next_elements: iterator of the nodes after the element (texts are skipped)
+    :param is_ending_point: function that check if an element is the ending point (None - the end of the document)
+    '''
 
-class WebSiteScarperWorker(WorkerAbstract):
-
-    def __init__(self):
-        logging.info(f"{DRIVER_PREFIX}Creating scraper worker")
-        self.file_name = ''
-        self.execution_vars = {}
-
-    def work(self, msg):
+    __slots__ = ('_elements', '_window', '_num_of_read', '_is_ending_point', '_ending_point_idx')
 
-            logging.info(f"{DRIVER_PREFIX}Start!!")
+    def __init__(self, next_elements, is_ending_point=None):
+        self._elements = (element for element in next_elements if element.name)
+        self._window = deque(maxlen=2)
+        self._num_of_read = 0
+        self._is_ending_point = is_ending_point
+        self._ending_point_idx = None
 
-            working_params = msg['params']
-            self.execution_vars['title'] = working_params['title'] if 'title' in working_params else None
-            payload = msg['payload']
+    def get(self, index):
+        '''
+        :return: the element at index, None after the last element
+        '''
+        while self._num_of_read <= index:
+            element = next(self._elements, None)
+            if element is None:
+                return None
+            if self._ending_point_idx is None and self._is_ending_point and self._is_ending_point(element):
+                self._ending_point_idx = self._num_of_read
+            self._window.append(element)
+            self._num_of_read = self._num_of_read + 1
+        return self._window[index - self._num_of_read]
 
-            URL = payload['url_to_scrap']
-            self.file_name = URL.split('/')[len(URL.split('/'))-1]
-            scrap_flow = None
+    def at_end(self, index):
+        return self.get(index) is None or index == self._ending_point_idx
 
 
-            if 'scrap_flow' in payload:
-                scrap_path = payload['scrap_flow']
-                with open(f'{scrap_path}') as file:
-                    scrap_flow = yaml.load(file, Loader=yaml.FullLoader)
 
-            if 'inline_scrap_flow' in payload:
-                scrap_flow = payload['inline_scrap_flow']
+class WebSiteScarperWorker(WorkerAbstract):
 
+    def __init__(self):
+        logging.info(f"{DRIVER_PREFIX}Creating scraper worker")
 
+    def work(self, msg):
 
-            # pre process steps - mostly for prettify the html or get dynamic contents
-            if 'preProcess' in scrap_flow:
-                action = scrap_flow['preProcess'][0]
-                page = self.execute_action(URL, action)
-                soup = BeautifulSoup(page, 'html.parser')
+            logging.info(f"{DRIVER_PREFIX}Start!!")
 
-            else:
-                page = requests.get(URL)
-                soup = BeautifulSoup(page.content, 'html.parser')
+            working_params = msg['params']
+            configure_browser_pool(working_params.get('browserPool'))
+            self.frontier_taken(msg)
 
-                if POTENTIAL_DYNAMIC_JS_CONTENT in soup.text:
-                    soup = BeautifulSoup(self.get_html_from_js(URL), 'html.parser')
+            try:
+                # async mode - pull more works from the queue and overlap their network I/O
+                # (with processPool the flows run on a pool of processes)
+                if 'asyncFetch' in working_params or 'processPool' in working_params:
+                    return self.work_async(msg)
+
+                # batched work - many urls with the same flow
+                if 'urls_to_scrap' in msg['payload']:
+                    return self.work_batch(msg)
+
+                scrap_flow = self.load_flow(msg['payload'])
+                # the preProcess actions and the flow share the work context (execution vars)
+                ctx = ExecutionContext.for_work(msg)
+                page = self.fetch_page(msg['payload']['url_to_scrap'], scrap_flow, working_params, ctx)
+                return self.scrap_page(msg, page, scrap_flow, ctx)
+            finally:
+                self.frontier_done(msg)
+
+    def frontier_taken(self, msg):
+        '''
+        Mark the urls of the work as taken in the crawl frontier (dequeued by this worker)
+        '''
+        if 'frontier' not in msg['params']:
+            return
+        get_crawl_frontier(msg['params']['frontier']).mark_taken(
+            [url_msg['payload']['url_to_scrap'] for url_msg in self.split_work(msg)], flow_reference(msg['payload']))
 
-            # Scrap the web page according to the yaml flow
-            for link in scrap_flow['flow']:
-                self.execute_action(soup, link)
+    def frontier_done(self, msg):
+        '''
+        Mark the urls of the work as done in the crawl frontier (succeeded or failed)
+        '''
+        if 'frontier' not in msg['params']:
             return
+        frontier = get_crawl_frontier(msg['params']['frontier'])
+        flow = flow_reference(msg['payload'])
+        for url_msg in self.split_work(msg):
+            frontier.mark_done(url_msg['payload']['url_to_scrap'], flow)
 
-    def expend_dynamic_HTML(self, URL, action_type, element, contain_element):
-        from selenium import webdriver
-        import time
+    def split_work(self, msg):
+        '''
+        :return: list of one url works - a batched work (urls_to_scrap) is split to a work per url
+        '''
+        payload = msg['payload']
+        if 'urls_to_scrap' not in payload:
+            return [msg]
+        payload = {key: value for key, value in payload.items() if key != 'urls_to_scrap'}
+        return [dict(params=msg['params'], payload=dict(payload, url_to_scrap=url))
+                for url in msg['payload']['urls_to_scrap']]
+
+    def work_batch(self, msg):
+        '''
+        Scrap all the urls of a batched work one after the other - the flow is loaded once and the http session
+        and the browser are shared by all of them
+        :return: list of the urls results (by the urls order) - failed url result is the raised exception
+        '''
+        msgs = self.split_work(msg)
+        scrap_flow = self.load_flow(msg['payload'])
+        results = []
+        for url_msg in msgs:
+            URL = url_msg['payload']['url_to_scrap']
+            try:
+                ctx = ExecutionContext.for_work(url_msg)
+                page = self.fetch_page(URL, scrap_flow, url_msg['params'], ctx)
+                results.append(self.scrap_page(url_msg, page, scrap_flow, ctx))
+            except Exception as e:
+                logging.exception(f"{DRIVER_PREFIX}Failed to scrap - {URL}")
+                results.append(e)
+        num_of_failures = len([result for result in results if isinstance(result, Exception)])
+        logging.info(f"{DRIVER_PREFIX}Batch done - {len(msgs) - num_of_failures} scraped, {num_of_failures} failed")
+        return results
+
+    def work_async(self, msg):
+        from AsyncFetchEngine import AsyncFetchEngine, drain_queue
+
+        async_config = msg['params'].get('asyncFetch') or {}
+        flow_pool = None
+        if 'processPool' in msg['params']:
+            from FlowProcessPool import get_flow_process_pool
+            flow_pool = get_flow_process_pool(msg['params']['processPool'])
+        engine = AsyncFetchEngine(self,
+                                  concurrency=async_config.get('concurrency', 16),
+                                  per_host=async_config.get('perHost', 4),
+                                  flow_pool=flow_pool)
+        queue = get_syncro_queue()
+        msgs = drain_queue(queue, msg, async_config.get('batchSize', 64))
+        for drained_msg in msgs[1:]:
+            self.frontier_taken(drained_msg)
+        try:
+            return engine.run([url_msg for work_msg in msgs for url_msg in self.split_work(work_msg)])
+        finally:
+            # WLO mark only the original message as done
+            for drained_msg in msgs[1:]:
+                self.frontier_done(drained_msg)
+                queue.task_done()
+
+    def load_flow(self, payload):
+        scrap_flow = None
+
+        # compiled flows are cached per process - the yaml is parsed only once per flow file
+        if 'scrap_flow' in payload:
+            scrap_flow = load_scrap_flow(payload['scrap_flow'])
+
+        if 'inline_scrap_flow' in payload:
+            scrap_flow = load_inline_scrap_flow(payload['inline_scrap_flow'])
+
+        return scrap_flow
+
+    def fetch_page(self, URL, scrap_flow, working_params, ctx=None):
+        '''
+        Network part of the work - return the raw page (html string or bytes)
+        :param ctx: ExecutionContext of the work - the preProcess actions run with it (new context if not given)
+        '''
+        metrics = metrics_of(working_params)
+        if metrics is None:
+            return self._fetch_page(URL, scrap_flow, working_params, None, ctx)
+
+        if scrap_flow.pre_process_plan:
+            fetch_type = 'preProcess'
+        elif 'responseCache' in working_params:
+            fetch_type = 'cache'
+        else:
+            fetch_type = 'http'
+        start = time.perf_counter()
+        try:
+            page = self._fetch_page(URL, scrap_flow, working_params, metrics, ctx)
+        except Exception:
+            metrics.count('pages_failed')
+            metrics.maybe_flush()
+            raise
+        metrics.observe('fetch', fetch_type, time.perf_counter() - start)
+        if isinstance(page, (bytes, str)):
+            metrics.count('fetched_bytes', len(page))
+        return page
+
+    def _fetch_page(self, URL, scrap_flow, working_params, metrics, ctx):
+
+        # pre process steps - mostly for prettify the html or get dynamic contents
+        if scrap_flow.pre_process_plan:
+            action = scrap_flow.pre_process_plan[0]
+            if ctx is None:
+                ctx = ExecutionContext(URL=URL, working_params=working_params)
+            ctx.metrics = metrics
+            return self.execute_action(URL, action, ctx)
+
+        # keep alive session shared by all the works of the process
+        session_pool = get_session_pool()
+        # per host rate limit shared by all the worker processes
+        if 'politeness' in working_params:
+            session_pool = get_host_throttle(session_pool, working_params['politeness'])
+
+        # conditional request against the on disk response cache (re-crawls of unchanged pages)
+        if 'responseCache' in working_params:
+            key = scrap_key(scrap_flow.fingerprint, working_params.get('title'))
+            return get_response_cache(working_params['responseCache']).fetch(
+                session_pool, URL, working_params.get('httpSession'), key=key)
+
+        return session_pool.fetch(URL, working_params.get('httpSession')).content
+
+    def scrap_page(self, msg, page, scrap_flow, ctx=None):
+        '''
+        Scrap the fetched page according to the yaml flow
+        :param ctx: ExecutionContext of the work (the one of fetch_page) - new context if not given
+        '''
+        metrics = metrics_of(msg['params'])
+        if metrics is None:
+            return self._scrap_page(msg, page, scrap_flow, None, ctx)
+
+        start = time.perf_counter()
+        try:
+            return self._scrap_page(msg, page, scrap_flow, metrics, ctx)
+        except Exception:
+            metrics.count('pages_failed')
+            raise
+        finally:
+            metrics.observe('scrap', 'page', time.perf_counter() - start)
+            metrics.maybe_flush()
+
+    def _scrap_page(self, msg, page, scrap_flow, metrics, ctx):
+        working_params = msg['params']
+        URL = msg['payload']['url_to_scrap']
+        if page is PAGE_NOT_MODIFIED:
+            logging.info(f"{DRIVER_PREFIX}Page and flow did not change since the last scrap - skipping {URL}")
+            self.record_done(working_params, URL, scrap_flow)
+            if metrics:
+                metrics.count('pages_skipped')
+            return
+        # all the state of the work is in the context - the worker itself is shared by the works
+        if ctx is None:
+            ctx = ExecutionContext.for_work(msg)
+        ctx.metrics = metrics
+
+        # the js check run on the raw page - no need to parse the page twice
+        parser = scrap_flow.settings.get('parser')
+        if not scrap_flow.pre_process_plan and is_dynamic_js_page(page):
+            start = time.perf_counter()
+            page = self.get_html_from_js(URL, scrap_flow.settings.get('waitFor'))
+            if metrics:
+                metrics.observe('js', 'render', time.perf_counter() - start)
+
+        # byte identical page that was already scraped with the same flow and title - the output is already there
+        content_key = None
+        if working_params.get('dedupContent', False):
+            content_key = get_content_index().content_key(page, scrap_key(scrap_flow.fingerprint,
+                                                                          working_params.get('title')))
+            scraped_url = get_content_index().seen(content_key)
+            if scraped_url:
+                logging.info(f"{DRIVER_PREFIX}Same content as {scraped_url} - skipping {URL}")
+                self.record_done(working_params, URL, scrap_flow)
+                if metrics:
+                    metrics.count('pages_skipped')
+                return
+        start = time.perf_counter()
+        soup = parse_html(page, parser)
+        if metrics:
+            metrics.observe('parse', parser or DEFAULT_PARSER, time.perf_counter() - start)
+
+        # saveToFile writers stay open for the whole work and closed once at the end
+        ctx.sinks = OutputSinks()
+        try:
+            for link in scrap_flow.flow_plan:
+                self.execute_action(soup, link, ctx)
+        finally:
+            outputs = ctx.sinks.paths
+            num_of_rows = ctx.sinks.num_of_rows
+            start = time.perf_counter()
+            ctx.sinks.close()
+            ctx.sinks = None
+            if metrics:
+                metrics.observe('save', 'close', time.perf_counter() - start)
+                metrics.count('rows', num_of_rows)
+
+        if content_key:
+            get_content_index().add(content_key, URL)
+
+        if 'responseCache' in working_params:
+            get_response_cache(working_params['responseCache']).mark_scraped(
+                URL, scrap_key(scrap_flow.fingerprint, working_params.get('title')))
+        self.record_done(working_params, URL, scrap_flow, outputs)
+        if metrics:
+            metrics.count('pages_scraped')
+        return
+
+    def record_done(self, working_params, URL, scrap_flow, outputs=()):
+        '''
+        Write the completed work to the crawl journal (resume of the crawl skip it)
+        '''
+        if 'journal' in working_params:
+            get_crawl_journal(working_params['journal']).record(
+                URL, scrap_key(scrap_flow.fingerprint, working_params.get('title')), outputs)
 
-        driver = webdriver.Chrome(ChromeDriverManager().install())
-        driver.get(URL)
-        time.sleep(5)
+    def expend_dynamic_HTML(self, URL, action_type, element, contain_element, wait_for=None):
+        with get_browser_pool().lease() as driver:
+            driver.get(URL)
+            wait_for_page(driver, wait_for)
+            return self._expend_dynamic_elements(driver, element, contain_element)
 
+    def _expend_dynamic_elements(self, driver, element, contain_element):
 
         # get the container element
         if contain_element:
@@ -154,244 +417,154 @@ class WebSiteScarperWorker(WorkerAbstract):
 
         return elements
 
-    def get_html_from_js(self, URL):
+    def get_html_from_js(self, URL, wait_for=None):
 
+        with get_browser_pool().lease() as driver:
+            driver.get(URL)
+            wait_for_page(driver, wait_for)
+            return driver.page_source
 
-        driver = webdriver.Chrome()
-        driver.get(URL)
-        time.sleep(5)
-        htmlSource = driver.page_source
-        driver.close()
-        return htmlSource
+    def execute_action(self, target_value, execution_plan, ctx=None):
+        '''
+        Walk the pre bound execution plan (see ScrapActions.bind_action)
+        :param target_value: the value the action run on (URL, soup, element, tree, ...)
+        :param execution_plan: BoundAction - raw action dict is bound on the fly for backward compatibility
+        :param ctx: ExecutionContext of the work (new empty context if not given)
+        '''
+        if isinstance(execution_plan, dict):
+            execution_plan = bind_action(execution_plan)
+        if ctx is None:
+            ctx = ExecutionContext()
 
-    def execute_action(self, target_value ,execution_plan):
         result = None
-
-        action_name = execution_plan['actionName']
-        action_params = execution_plan['actionParams'] if 'actionParams' in execution_plan else []
-        sub_actions = execution_plan['subActions'] if 'subActions' in execution_plan else []
-        action_type = execution_plan['actionType'] if 'actionType' in execution_plan else 'Atomic'
-
-        single_action_result = self.run_single_action(target_value, action_name, action_params)
-
-        if len(sub_actions) > 0:
-            for action in sub_actions:
-                if 'actionType' in action:
-                    if action['actionType'] == 'loop':
-                        for elem in single_action_result:
-                            result = self.execute_action(elem, action)
-                    elif action['actionType'] == 'rec':
-                        result = self.execute_action(single_action_result, action)
-                    elif action['actionType'] == 'tree_dfs':
-                        for branch in self.get_dfs_branches(tree=single_action_result):
-                            result = self.execute_action(branch, action)
+        if ctx.metrics is None:
+            single_action_result = execution_plan.handler.run(self, target_value, ctx)
+        else:
+            single_action_result = self._timed_run(execution_plan, target_value, ctx)
+
+        if len(execution_plan.sub_actions) > 0:
+            for action in execution_plan.sub_actions:
+                mode = action.mode
+                if mode == 'loop':
+                    for elem in single_action_result:
+                        result = self.execute_action(elem, action, ctx)
+                elif mode == 'rec':
+                    result = self.execute_action(single_action_result, action, ctx)
+                elif mode == 'tree_dfs':
+                    for branch in self.get_dfs_branches(tree=single_action_result):
+                        result = self.execute_action(branch, action, ctx)
 
                 # loop over the current element and execute set of action per element in the loop
-                elif 'type' in action:
-                    if action['type'] == 'loop':
-                        actions = action['actions']
-                        for elem in single_action_result:
-                            for sub_action in actions:
-                                result = self.execute_action(elem, sub_action)
-
-                else:
-                    result = self.run_single_action(single_action_result, action['actionName'], action['actionParams'])
+                elif mode == 'block_loop':
+                    for elem in single_action_result:
+                        for sub_action in action.actions:
+                            result = self.execute_action(elem, sub_action, ctx)
+
+                elif mode == 'single':
+                    if ctx.metrics is None:
+                        result = action.handler.run(self, single_action_result, ctx)
+                    else:
+                        result = self._timed_run(action, single_action_result, ctx)
         else:
             result = single_action_result
 
         return result
 
+    def _timed_run(self, action, target_value, ctx):
+        '''
+        Run the action handler and record its time (only the handler - the sub actions are recorded by themselves)
+        '''
+        start = time.perf_counter()
+        try:
+            return action.handler.run(self, target_value, ctx)
+        finally:
+            ctx.metrics.observe('action', action.action_name, time.perf_counter() - start)
+
+    def run_single_action(self, target_value, action_name, action_params, ctx=None):
+        ctx = ctx or ExecutionContext()
+        handler = get_action_handler(action_name)(action_params)
+        if ctx.metrics is None:
+            return handler.run(self, target_value, ctx)
+        return self._timed_run(BoundAction(action_name, handler, 'single', ()), target_value, ctx)
+
+    def save_to_file(self, target_value, to, long_name, file_type, name_prefix=None, dir_name=None, sink_options=None,
+                     ctx=None):
+        '''
+        :param sink_options: compression / bufferSize / batchRows (see OutputSinks)
+        :param ctx: ExecutionContext of the work - the execution vars and the open sinks
+        '''
+        ctx = ctx or ExecutionContext()
+        dateTimeObj = datetime.now()
 
+        if long_name:
+            file_name = to+"-"+str(dateTimeObj)
+        else:
+            file_name = to
 
-    def run_single_action(self, target_value, action_name, action_params):
-
-        if action_name == 'expendDynamicHTML':
-            logging.info(f"{SERVICE}Start expand dynamic HTML")
-            action_type = action_params['type']
-            element = action_params['Element']
-            contain_element = action_params['containElement'] if 'containElement' in action_params else None
-            return self.expend_dynamic_HTML(URL=target_value, action_type=action_type, element=element, contain_element=contain_element)
-
-        # in this case target_value should be BeautifulSoup
-        # todo - add asChild condition to path - to get the path that has specific child
-        if action_name == 'path':
-            logging.info(f"{SERVICE}path action")
-            id_ = action_params['id'] if 'id' in action_params else None
-            class_ = action_params['class'] if 'class' in action_params else None
-            exclude = action_params['exclude'] if 'exclude' in action_params else None
-            attr = action_params['attr'] if 'attr' in action_params else None
-            elem_soup = self.HTMLpath(target_value, action_params['type'], action_params['HTMLtype'], id_, class_,attr, exclude)
-            return elem_soup
-        
-        if action_name == 'table2csv':
-            logging.info(f"{SERVICE}table2csv action")
-            id_ = action_params['id'] if 'id' in action_params else None
-            class_ = action_params['class'] if 'class' in action_params else None
-            pre_defined_columns = action_params['preDefinedColumns'] if 'preDefinedColumns' in action_params else {}
-            num_of_column_to_enforce = action_params['numOfColumnToEnforce'] if 'numOfColumnToEnforce' in action_params else -1
-            data_frame = self.table2csv(target_value, id_, class_, pre_defined_columns,num_of_column_to_enforce)
-            return data_frame
-        
-        if action_name == 'buildConnectionTree':
-            logging.info(f"{SERVICE}buildConnectionTree action")
-            starting_point = action_params['StartintPoint'] if 'StartintPoint' in action_params else None
-            ending_point = action_params['EndingPoint'] if 'EndingPoint' in action_params else None
-            tree_relations = action_params['treeRelations']
-            save_to_var = action_params['saveToVar'] if 'saveToVar' in action_params else None
-            tree = self.build_connection_tree(target_value=target_value,
-                                              starting_point=starting_point,
-                                              ending_point=ending_point,
-                                              tree_relations=tree_relations,
-                                              save_to_var=save_to_var)
-            return tree[1]
-
-
-
-        # tree to csv,
-        if action_name == 'treeBranch2csv':
-            logging.info(f"{SERVICE}treeBranch2csv action")
-            html_table_idx =  action_params['idxOfHtmlTable'] if 'idxOfHtmlTable' in action_params else  None
-            pre_defined_columns = action_params['preDefinedColumns'] if 'preDefinedColumns' in action_params else None
-            data_frame = self.tree_branch_to_csv(branch=target_value, html_table_idx = html_table_idx, pre_defined_columns=pre_defined_columns)
-            return data_frame
-
-
-
-        # in this case target_value should be BeautifulSoup
-        if action_name == 'get':
-            logging.info(f"{SERVICE}get action")
-            val = action_params['value']
-            fix_text_flag = action_params['fixText'] if 'fixText' in action_params else None
-
-            if val == 'text':
-                if fix_text_flag:
-                    return self.fix_text(target_value.text)
-                else:
-                    return target_value.text
-            else:
-                if fix_text_flag:
-                    return self.fix_text(target_value.get(val))
-                else:
-                    return target_value.get(val)
-
-        # in this case target_value should be string
-        if action_name == 'substring':
-            logging.info(f"{SERVICE}substring action")
-            start = action_params['start'] if 'start' in action_params else 0
-            end = action_params['end'] if 'end' in action_params else len(target_value)
-            return target_value[start:end]
-
-        if action_name == 'concat':
-            logging.info(f"{SERVICE}concat action")
-            prefix = action_params['prefix'] if 'prefix' in action_params else ''
-            suffix = action_params['suffix'] if 'suffix' in action_params else ''
-            return prefix+target_value+suffix
-
-        if action_name == 'createVar':
-            logging.info(f"{SERVICE}createVar action")
-            var = self.create_execution_var(action_params)
-            self.execution_vars[var[0]] = var[1]
-            return var
-
-        if action_name == 'saveToFile':
-            logging.info(f"{SERVICE}saveToFile action")
-            dateTimeObj = datetime.now()
-            file_name_prefix = action_params['name_prefix'] if 'name_prefix' in action_params else None
-
-            if action_params['longName']:
-                file_name = action_params['to']+"-"+str(dateTimeObj)
-            else:
-                file_name = action_params['to']
-
-            if file_name_prefix:
-                if '$' in file_name_prefix:
-                    file_name_prefix = self.execution_vars[file_name_prefix[1:]]
-                file_name = file_name_prefix+"_"+file_name
-
-
-            if 'dir' in action_params:
-                dir_name = action_params['dir']
-                if not os.path.exists(dir_name):
-                    os.mkdir(dir_name)
-                file_name = os.path.join(dir_name, file_name)
-
-
-            if action_params['fileType'] == 'json':
+        if name_prefix:
+            if '$' in name_prefix:
+                name_prefix = ctx.execution_vars[name_prefix[1:]]
+            file_name = name_prefix+"_"+file_name
 
-                file_name = file_name+".json"
-                with open(file_name, 'a') as file:
-                    json.dump(target_value, file, indent=4)
 
-            # in this case assuming that target_value is data_frame
-            if action_params['fileType'] == 'csv':
-                file_name = file_name + ".csv"
-                target_value.to_csv(file_name, index=False, sep=',', encoding='utf-8')
+        if dir_name:
+            if not os.path.exists(dir_name):
+                os.mkdir(dir_name)
+            file_name = os.path.join(dir_name, file_name)
 
-        if action_name == 'addToVar':
-            logging.info(f"{SERVICE}addToVar action")
-            var_name = action_params['varName']
-            var_type = action_params['varType']
-            var_key = action_params['varKey'] if 'varKey' in action_params else None
 
+        # in this case assuming that target_value is data_frame / streamed table for csv and parquet
+        if ctx.sinks:
+            ctx.sinks.write(file_name, file_type, target_value, sink_options)
+        else:
+            sinks = OutputSinks()
+            try:
+                sinks.write(file_name, file_type, target_value, sink_options)
+            finally:
+                sinks.close()
 
-            if var_key and '$' in var_key:
-                if var_key == '$.':
-                    var_key = target_value
-                else:
-                    var_key = self.execution_vars[var_key[1:]]
-
-            var_value = action_params['varValue'] if 'varValue' in action_params else target_value
-            if '$' in var_value:
-                var_value = self.execution_vars[var_value[1:]]
-            if var_type == 'list':
-                self.execution_vars[var_name].append(var_value)
-            if var_type == 'dict':
-                self.execution_vars[var_name][var_key] = var_value
-            if var_type == 'str':
-                self.execution_vars[var_name] = var_value
+    def enqueue_urls(self, target_value, attr='href', flow=None, title=None, ctx=None):
+        '''
+        Add the urls of target_value to the crawl frontier - they are scraped in the same run
+        :param target_value: url, element (the url is in attr) or list of them
+        :param flow: scrap flow (yaml path) of the new urls - default the flow of the current work
+        :param title: title of the new urls ($var for execution var) - default the title of the current work
+        '''
+        msg = ctx.msg if ctx else None
+        if not msg or 'frontier' not in msg['params']:
+            logging.warning(f"{DRIVER_PREFIX}enqueueUrls without the frontier execution param - ignored")
             return target_value
 
-        if action_name == 'removeVar':
-            logging.info(f"{SERVICE}removeVar action")
-            var_name = action_params['varName']
-            var_type = action_params['varType']
-            var_key = action_params['varKey'] if 'varKey' in action_params else None
-            var_value = action_params['varValue'] if 'varValue' in action_params else target_value
-            if '$' in var_value:
-                var_value = self.execution_vars[var_value[1:]]
-
-            if var_key and '$' in var_key:
-                var_key = self.execution_vars[var_key[1:]]
-            if var_type == 'list':
-                self.execution_vars[var_name].remove(var_value)
-            if var_type == 'dict':
-                self.execution_vars[var_name].pop(var_key)
-
-        if action_name == 'getVar':
-            logging.info(f"{SERVICE}getVar action")
-            var_name = action_params['varName']
-            return self.execution_vars[var_name]
-
-        if action_name == 'cleanVar':
-            logging.info(f"{SERVICE}cleanVar action")
-            var_name = action_params['varName']
-            if type(self.execution_vars[var_name]) == list:
-                self.execution_vars[var_name] = []
-            elif type(self.execution_vars[var_name]) == dict:
-                self.execution_vars[var_name] = {}
-            else:
-                self.execution_vars[var_name] = ""
-
-    def HTMLpath(self, soup , type, HTMLtype, id_, class_,attr,  exclude):
+        values = target_value if isinstance(target_value, list) else [target_value]
+        urls = []
+        for value in values:
+            url = value if isinstance(value, str) else value.get(attr)
+            if url:
+                urls.append(url.strip())
+
+        if title and '$' in title:
+            title = ctx.execution_vars[title[1:]]
+        title = title or msg['params'].get('title')
+        flow_ref = flow_reference({'scrap_flow': flow} if flow else msg['payload'])
+        depth = msg['payload'].get('depth', 0) + 1
+        num_of_new = get_crawl_frontier(msg['params']['frontier']).add(urls, flow_ref, title, depth,
+                                                                       source_url=msg['payload']['url_to_scrap'])
+        logging.debug(f"{DRIVER_PREFIX}Enqueued {num_of_new} new urls of {len(urls)}")
+        return urls
+
+    def HTMLpath(self, soup , type, HTMLtype, id_, class_,attr,  exclude, selector=None):
         logging.debug(f"{DRIVER_PREFIX}Going to scrap - {HTMLtype}, id - {id_}, class - {class_}")
         sub_soup = None
-        if type == 'single':
+        # pre compiled selector of the path action (see PathSelectors)
+        if selector:
+            sub_soup = selector.select(soup, single=type == 'single')
+        elif type == 'single':
             if id_:
                 sub_soup = soup.find(HTMLtype, id=id_)
             elif class_:
                 sub_soup = soup.find(HTMLtype, class_=class_)
             elif attr:
-                sub_soup = soup.find(HTMLtype, attrs=attr)
+                sub_soup = soup.find(HTMLtype, attrs=dict(attr))
             else:
                 sub_soup = soup.find(HTMLtype)
         else:
@@ -400,7 +573,7 @@ class WebSiteScarperWorker(WorkerAbstract):
             elif class_:
                 sub_soup = soup.findAll(HTMLtype, class_=class_)
             elif attr:
-                sub_soup = soup.findAll(HTMLtype, attrs=attr)
+                sub_soup = soup.findAll(HTMLtype, attrs=dict(attr))
             else:
                 sub_soup = soup.findAll(HTMLtype)
 
@@ -426,8 +599,13 @@ class WebSiteScarperWorker(WorkerAbstract):
             return name, {}
         return name, value
 
-    def table2csv(self, soup, id_=None, class_=None, pre_defined_columns={}, num_of_column_to_enforce=-1):
-        data = []
+    def table2csv(self, soup, id_=None, class_=None, pre_defined_columns={}, num_of_column_to_enforce=-1, stream=False,
+                  ctx=None):
+        '''
+        :param stream: return TableRowStream (rows are extracted lazily while they are written) instead of DataFrame
+        :param ctx: ExecutionContext of the work - values of the $var pre defined columns
+        '''
+        execution_vars = ctx.execution_vars if ctx else {}
 
         # getting the header and data from the HTML file
 
@@ -441,16 +619,54 @@ class WebSiteScarperWorker(WorkerAbstract):
             header = soup.findAll("table")[0].find("tr")
             HTML_data = soup.find_all("table")[0].find_all("tr")[1:]
 
-        list_header = []
-        for pre_def_col_header, pre_def_val in pre_defined_columns.items():
-            list_header.append(pre_def_col_header)
+        list_header = list(pre_defined_columns) + self._table_header(header)
+        pre_defined_sub_data = self._pre_defined_values(pre_defined_columns, execution_vars)
+
+        rows = self._table_rows(HTML_data, pre_defined_sub_data, num_of_column_to_enforce)
+        if stream:
+            return TableRowStream(list_header, rows)
+
+        # Storing the data into Pandas DataFrame
+        import pandas as pd
+        data_frame = pd.DataFrame(data=list(rows), columns=list_header)
+        return data_frame
+
+    def tables2csv(self, soup, id_=None, class_=None, pre_defined_columns={}, num_of_column_to_enforce=-1, ctx=None):
+        '''
+        Batched table2csv - all the matching tables in one DataFrame, with a table_id column (index of the table in
+        the matching tables). The columns of the tables are aligned by name (see TableBatch)
+        :param ctx: ExecutionContext of the work - values of the $var pre defined columns (resolved per table)
+        '''
+        execution_vars = ctx.execution_vars if ctx else {}
+
+        if id_:
+            tables = soup.find_all("table", id=id_)
+        elif class_:
+            tables = soup.find_all("table", class_=class_)
+        else:
+            tables = soup.find_all("table")
+
+        batch = TableBatch()
+        for table_id, table in enumerate(tables):
+            table_rows = table.find_all("tr")
+            if not table_rows:
+                continue
+            pre_defined_values = self._pre_defined_values(pre_defined_columns, execution_vars)
+            batch.add_table(table_id, list(zip(pre_defined_columns, pre_defined_values)),
+                            self._table_header(table_rows[0]),
+                            self._raw_table_rows(table_rows[1:], num_of_column_to_enforce))
+        return batch.to_data_frame()
 
+    def _table_header(self, header):
+        list_header = []
         for items in header:
             try:
                 list_header.append(self.fix_text(items.get_text()).replace(' ','_'))
             except:
                 continue
+        return list_header
 
+    def _pre_defined_values(self, pre_defined_columns, execution_vars):
         pre_defined_sub_data = []
         for pre_def_header, pre_def_val in pre_defined_columns.items():
             if '$' in pre_def_val:
@@ -460,41 +676,41 @@ class WebSiteScarperWorker(WorkerAbstract):
                 if '.' in value:
                     if 'pop' in value:
                         value = value[0:value.index('.')]
-                        pre_defined_val = self.execution_vars[value].pop(0)
+                        pre_defined_val = execution_vars[value].pop(0)
                     else:
 
                         value_idx = value[value.index('.'):]
                         value = value[0:value.index('.')]
-                        pre_defined_val = self.execution_vars[value][value_idx]
+                        pre_defined_val = execution_vars[value][value_idx]
                 # treating direct variable value
                 else:
-                    pre_defined_val = self.execution_vars[value]
+                    pre_defined_val = execution_vars[value]
             # use hard text as value
             else:
                 pre_defined_val = pre_def_val
             pre_defined_sub_data.append(pre_defined_val)
+        return pre_defined_sub_data
+
+    def _table_rows(self, HTML_data, pre_defined_sub_data, num_of_column_to_enforce):
+        for cells in self._raw_table_rows(HTML_data, num_of_column_to_enforce):
+            yield pre_defined_sub_data + [self.fix_text(cell) for cell in cells]
 
+    def _raw_table_rows(self, HTML_data, num_of_column_to_enforce):
+        '''
+        Rows of the table as lists of the cells text (not cleaned)
+        '''
         for element in HTML_data:
             # can get rid of unneeded row splits
             if num_of_column_to_enforce != -1:
                 if len(element.findAll('td')) != num_of_column_to_enforce:
                     continue
-            sub_data = []
-            for pre_data in pre_defined_sub_data:
-                sub_data.append(pre_data)
-
-
+            cells = []
             for sub_element in element:
                 try:
-                    sub_data.append(self.fix_text(sub_element.get_text()))
+                    cells.append(sub_element.get_text())
                 except:
                     continue
-            data.append(sub_data)
-
-            # Storing the data into Pandas
-        # DataFrame
-        data_frame = pd.DataFrame(data=data, columns=list_header)
-        return data_frame
+            yield cells
 
     def fix_text(self, text):
         final_val = text.lstrip().rstrip().replace('"', '')
@@ -527,27 +743,6 @@ class WebSiteScarperWorker(WorkerAbstract):
         :return: dic
         '''
 
-        tree = {}
-        starting_point_idx = 0
-        ending_point_idx = len(target_value.find_all_next())
-
-        if starting_point:
-            starting_point_elem_type = ""
-            starting_identifiers = {}
-            for elem_type, identifiers in starting_point.items():
-                starting_point_elem_type = elem_type
-                starting_identifiers = identifiers
-
-            starting_point_idx = self._find_position(target_value, starting_point_elem_type, starting_identifiers)
-
-        if ending_point:
-            ending_point_elem_type = ""
-            ending_identifiers = {}
-            for elem_type, identifiers in ending_point.items():
-                ending_point_elem_type = elem_type
-                ending_identifiers = identifiers
-            ending_point_idx = self._find_position(target_value, ending_point_elem_type, ending_identifiers)
-
         #build the hierarchy level
         hierarchy_level = tree_relations.split('.')
         hierarchy_level_dic ={}
@@ -558,26 +753,29 @@ class WebSiteScarperWorker(WorkerAbstract):
             if val > lower_hierarchy:
                 lower_hierarchy = val
 
-
-        # start build the tree
-        elements = target_value.find_all_next()
+        # one pass over the elements after target_value - the ending point is found while building the tree
+        elements = _ElementStream(target_value.next_elements, self._position_matcher(ending_point))
+        starting_point_idx = 0
+        if starting_point:
+            is_starting_point = self._position_matcher(starting_point)
+            while elements.get(starting_point_idx) is not None and \
+                    not is_starting_point(elements.get(starting_point_idx)):
+                starting_point_idx = starting_point_idx + 1
 
         tree = self._build_tree_recursive(current_level=0,
                                           elements=elements,
                                           index=starting_point_idx,
-                                          end_idx=ending_point_idx,
                                           hierarchy_level_dic=hierarchy_level_dic,
                                           lower_hierarchy=lower_hierarchy)
         return tree
 
 
-    def _build_tree_recursive(self, current_level, elements, index, end_idx, hierarchy_level_dic, lower_hierarchy):
+    def _build_tree_recursive(self, current_level, elements, index, hierarchy_level_dic, lower_hierarchy):
         '''
         Recursive method for building tree from flat array based on elements types and hierarchy level definitions
         :param current_level: The current level in the tree
-        :param elements: the array of elements
-        :param index: the current index to retrieve from the array
-        :param end_idx: the index that mark the end of the recursion
+        :param elements: the elements stream (_ElementStream)
+        :param index: the current index to retrieve from the stream
         :param hierarchy_level_dic: fix definition of how the hierarchy in the threshold looks like (based on elements types)
                 for example - {h2:0,h3:1,div:2} - in that case h2 is the highest level , h3 in the middle oif the tree and div is the leaf
         :param lower_hierarchy: the leaf level
@@ -586,23 +784,23 @@ class WebSiteScarperWorker(WorkerAbstract):
 
         res = {}
         leaf=[]
-        while index != end_idx:
-            elem = elements[index]
-            elem_type = elem.name
+        while not elements.at_end(index):
+            elem = elements.get(index)
             index = index+1
-            while elem_type not in hierarchy_level_dic:
-                elem = elements[index]
-                elem_type = elem.name
+            while elem.name not in hierarchy_level_dic:
+                elem = elements.get(index)
+                if elem is None:
+                    return index, res
                 index = index + 1
 
-            elem_level = hierarchy_level_dic[elem_type]
+            elem_level = hierarchy_level_dic[elem.name]
             if elem_level == lower_hierarchy:
                 current_level = elem_level
                 leaf.append(elem)
                 index = index+1
             elif elem_level >= current_level:
                 current_level = elem_level
-                index, res[elem] = self._build_tree_recursive(elem_level, elements, index, end_idx, hierarchy_level_dic, lower_hierarchy)
+                index, res[elem] = self._build_tree_recursive(elem_level, elements, index, hierarchy_level_dic, lower_hierarchy)
             else:
                 if current_level == lower_hierarchy:
                     res['leaf'] = leaf
@@ -610,23 +808,29 @@ class WebSiteScarperWorker(WorkerAbstract):
         return index, res
 
 
-    def _find_position(self, target_value, position_elem_type, identifiers):
-        for idx, elem in enumerate(target_value.find_all_next()):
-            if elem.name == position_elem_type:
-                all_match = True
-                for identifier, identifier_val in identifiers.items():
-                    if not elem.has_attr(identifier):
-                        all_match = False
-                        break
-                    if not elem.get(identifier) == identifier_val:
-                        all_match = False
-                        break
-
-                # found the starting point
-                if all_match:
-                    return idx
-
-    def tree_branch_to_csv(self, branch, html_table_idx,  pre_defined_columns):
+    def _position_matcher(self, position):
+        '''
+        :param position: {element type: {attribute: value}} (starting / ending point of buildConnectionTree)
+        :return: function that check if an element is the position element, None if there is no position
+        '''
+        if not position:
+            return None
+        position_elem_type = ""
+        identifiers = {}
+        for elem_type, elem_identifiers in position.items():
+            position_elem_type = elem_type
+            identifiers = elem_identifiers
+
+        def is_position(elem):
+            if elem.name != position_elem_type:
+                return False
+            for identifier, identifier_val in identifiers.items():
+                if not elem.has_attr(identifier) or not elem.get(identifier) == identifier_val:
+                    return False
+            return True
+        return is_position
+
+    def tree_branch_to_csv(self, branch, html_table_idx,  pre_defined_columns, stream=False):
         '''
         take branch of a tree (represented as array)
         convert it to csv (if the leaf is a html table the csv will be the table and the other branch layers as pre defined columns (static values in the csv)
@@ -638,52 +842,87 @@ class WebSiteScarperWorker(WorkerAbstract):
         {column name: <idx of the html element in the branch param> or static value  to use as pre defined column in the csv)
         :return: pandas data frame represnt csv table
         '''
-        pre_def_columns_completed = dict()
-        for key, val in pre_defined_columns.items():
-            regexp_res = re.search(r"\[([A-Za-z0-9_]+)\]", val)
-            pre_def_columns_completed[key] = branch[int(regexp_res.group(1))].text
+        pre_def_columns_completed = self._branch_pre_defined_columns(branch, pre_defined_columns)
 
         if html_table_idx:
-            return self.table2csv(soup=branch[html_table_idx], pre_defined_columns=pre_def_columns_completed)
+            return self.table2csv(soup=branch[html_table_idx], pre_defined_columns=pre_def_columns_completed, stream=stream)
         else:
             data=[]
             headers=[]
             for key,val in pre_def_columns_completed.items():
                 data.append(val)
                 headers.append(key)
+            if stream:
+                return TableRowStream(headers, iter([data]))
+            import pandas as pd
             data_frame = pd.DataFrame(data=[data], columns=headers)
             return data_frame
 
+    def tree_branches_to_csv(self, tree, html_table_idx, pre_defined_columns):
+        '''
+        Batched tree_branch_to_csv - all the branches of the tree (see get_dfs_branches) in one DataFrame, with a
+        table_id column (index of the branch)
+        :param tree: connection tree (buildConnectionTree)
+        :return: pandas data frame
+        '''
+        batch = TableBatch()
+        for branch_id, branch in enumerate(self.get_dfs_branches(tree)):
+            pre_defined_values = list(self._branch_pre_defined_columns(branch, pre_defined_columns or {}).items())
+            if html_table_idx:
+                table_rows = branch[html_table_idx].find_all("table")[0].find_all("tr")
+                if not table_rows:
+                    continue
+                batch.add_table(branch_id, pre_defined_values, self._table_header(table_rows[0]),
+                                self._raw_table_rows(table_rows[1:], -1))
+            else:
+                batch.add_table(branch_id, pre_defined_values, [], [[]])
+        return batch.to_data_frame()
 
+    def _branch_pre_defined_columns(self, branch, pre_defined_columns):
+        '''
+        :return: {column name: text of the branch element} - the values are the index of the element "[<idx>]"
+        '''
+        pre_def_columns_completed = dict()
+        for key, val in pre_defined_columns.items():
+            regexp_res = re.search(r"\[([A-Za-z0-9_]+)\]", val)
+            pre_def_columns_completed[key] = branch[int(regexp_res.group(1))].text
+        return pre_def_columns_completed
 
 
 
 
-    def get_dfs_branches(self, tree,level=0, branch=None):
-        branches = list()
 
-        #in case it's the leaf value
-        if type(tree) is not dict and type(tree) is not list:
-            branch.append(tree)
-            return branch
 
-        else:
-            for key,val in tree.items():
-                if level == 0:
-                    branch = list()
-                    branch.append(key)
-                    branches = branches + self.get_dfs_branches(tree=val, level=level+1, branch=branch)
-                elif key == 'leaf':
-                    for leaf in val:
-                        tmp_branch = branch.copy()
-                        branches.append(self.get_dfs_branches(tree=leaf, branch=tmp_branch))
-                        return branches
-                else:
-                    tmp_branch = branch.copy()
-                    tmp_branch.append(key)
-                    branches = branches + self.get_dfs_branches(tree=val, level=level+1, branch=tmp_branch)
+    def get_dfs_branches(self, tree):
+        '''
+        Generator of the branches of a connection tree (see build_connection_tree) in dfs order -
+        [<h2 element>, <h3 element>, ..., <leaf element>] for the first leaf of every leaf list (leafs without a parent
+        element are a branch of the leaf only).
+        The walk keeps one path of keys shared by all the branches and a stack of the dict iterators, a branch list is
+        created only when it's yielded - the tree_dfs sub actions run on a branch before the next one is found.
+        :param tree: connection tree (dict)
+        '''
+        path = []
+        stack = [iter(tree.items())]
+        while stack:
+            item = next(stack[-1], None)
+            if item is None:
+                stack.pop()
+                if stack:
+                    path.pop()
+                continue
 
-        return branches
+            key, val = item
+            if key == 'leaf':
+                if val:
+                    yield path + [val[0]]
+                    # only the first leaf of the list, and the rest of this sub tree is skipped
+                    stack.pop()
+                    if stack:
+                        path.pop()
+                continue
+            path.append(key)
+            stack.append(iter(val.items()))
 
 
 
@@ -0,0 +1,45 @@
+'''
+Generated html fixtures of the benchmarks - deterministic, no network needed
+'''
+
+
+def large_table_page(num_of_rows=2000, num_of_columns=8):
+    '''
+    :return: page with one big data table (class "data") and some text around it
+    '''
+    header = ''.join(f'<th>Column {col}</th>' for col in range(num_of_columns))
+    rows = ''.join('<tr>' + ''.join(f'<td> value "{row}" / {col} </td>' for col in range(num_of_columns)) + '</tr>'
+                   for row in range(num_of_rows))
+    return (f'<html><head><title>large table</title></head><body><h1 id="title">Large table</h1>'
+            f'<p>{"text " * 200}</p><table class="data"><tr>{header}</tr>{rows}</table></body></html>')
+
+
+def flat_sections_page(size_mb=1.0):
+    '''
+    :return: flat html of about size_mb MB - <h2> sections of <h3> sub sections of <div> leafs, with noise elements
+    between them and a footer ending point (buildConnectionTree)
+    '''
+    sections = []
+    size = 0
+    idx = 0
+    while size < size_mb * 1024 * 1024:
+        section = [f'<h2>section {idx}</h2>', '<p>noise</p>']
+        for sub_idx in range(4):
+            section.append(f'<h3>sub section {idx}.{sub_idx}</h3>')
+            for leaf_idx in range(6):
+                section.append(f'<div class="leaf">leaf {idx}.{sub_idx}.{leaf_idx}</div><span>noise</span>')
+        sections.append(''.join(section))
+        size += len(sections[-1])
+        idx += 1
+    return ('<html><body><main id="content"></main>' + ''.join(sections) +
+            '<h3>last</h3><footer id="end"></footer></body></html>')
+
+
+def index_page(num_of_links=5000):
+    '''
+    :return: index page with many links in a list (and some navigation links)
+    '''
+    navigation = ''.join(f'<a class="nav" href="/nav/{idx}">nav {idx}</a>' for idx in range(20))
+    links = ''.join(f'<li><a class="item" href="/items/{idx}.html">item {idx}</a> <span>{idx}</span></li>'
+                    for idx in range(num_of_links))
+    return f'<html><body><nav>{navigation}</nav><ul id="items">{links}</ul></body></html>'
@@ -0,0 +1,59 @@
+'''
+buildConnectionTree on a synthetic flat page (h2 / h3 / div sections) of a few MB:
+
+    PYTHONPATH=. python benchmarks/ConnectionTreeBenchmark.py --size-mb 8
+
+For every parser backend it prints the time and the peak python memory of build_connection_tree, next to the cost of
+one find_all_next() scan (the list of all the following elements that the previous implementation built four times).
+'''
+
+import argparse
+import time
+import tracemalloc
+
+from WebSitesScrapingWorker import WebSiteScarperWorker
+from HtmlParsers import parse_html, PARSER_BACKENDS
+from BenchmarkFixtures import flat_sections_page
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def count_leafs(tree):
+    return sum(len(val) if key == 'leaf' else count_leafs(val) for key, val in tree.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='buildConnectionTree benchmark')
+    parser.add_argument('--size-mb', type=float, default=4)
+    parser.add_argument('--parsers', nargs='*', default=list(PARSER_BACKENDS))
+    args = parser.parse_args()
+
+    page = flat_sections_page(args.size_mb)
+    print(f'page size {len(page) / 1024 / 1024:.1f} MB')
+    worker = WebSiteScarperWorker()
+    for parser_name in args.parsers:
+        try:
+            document = parse_html(page, parser_name)
+        except ImportError:
+            print(f'{parser_name:12} not installed')
+            continue
+        target = document.find('main', id='content')
+        tree, tree_time, tree_peak = measure(lambda: worker.build_connection_tree(
+            target, None, {'footer': {'id': 'end'}}, 'h2.h3.div', None)[1])
+        elements, scan_time, scan_peak = measure(target.find_all_next)
+        print(f'{parser_name:12} build_connection_tree {tree_time:7.2f}s peak {tree_peak / 1024 / 1024:7.1f} MB '
+              f'({len(tree)} sections, {count_leafs(tree)} leafs) | '
+              f'one find_all_next scan {scan_time:7.2f}s peak {scan_peak / 1024 / 1024:7.1f} MB '
+              f'({len(elements)} elements)')
+
+
+if __name__ == '__main__':
+    main()
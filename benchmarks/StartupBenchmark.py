@@ -0,0 +1,92 @@
+'''
+Startup benchmark of the worker - time and memory of a fresh process to import WebSitesScrapingWorker and create
+WebSiteScarperWorker (what every WLO worker process and flow process pays before its first work):
+
+    PYTHONPATH=. python benchmarks/StartupBenchmark.py --runs 10 --max-seconds 0.5 --output startup.json
+
+Every run is a new interpreter. Reported: median / max import seconds, the peak RSS after the import (MB) and the
+heavy modules that were loaded by the import. The heavy dependencies (pandas, selenium, bs4, lxml, requests,
+yaml ...) are imported on their first use only - the benchmark fails (exit code 1) when one of them is loaded on
+startup again or when the median import time is above --max-seconds.
+'''
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules that must be imported on first use only
+LAZY_MODULES = ('pandas', 'numpy', 'pyarrow', 'selenium', 'webdriver_manager', 'bs4', 'lxml', 'selectolax',
+                'cssselect', 'soupsieve', 'requests', 'urllib3', 'yaml', 'http.server')
+
+STARTUP_CODE = '''
+import json, resource, sys, time
+start = time.perf_counter()
+from WebSitesScrapingWorker import WebSiteScarperWorker
+WebSiteScarperWorker()
+seconds = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'importSeconds': seconds,
+                  'peakRssMb': peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024,
+                  'loadedModules': sorted(name for name in %r if name in sys.modules)}))
+''' % (LAZY_MODULES,)
+
+
+def measure_startup():
+    '''
+    Import the worker in a new interpreter
+    :return: dict - importSeconds, peakRssMb and loadedModules (the LAZY_MODULES loaded by the import)
+    '''
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [REPO_DIR, env.get('PYTHONPATH')]))
+    output = subprocess.run([sys.executable, '-c', STARTUP_CODE], check=True, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, text=True, env=env, cwd=REPO_DIR).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WebSiteScarperWorker startup benchmark')
+    parser.add_argument('--runs', type=int, default=10, help='number of fresh processes')
+    parser.add_argument('--max-seconds', type=float, help='fail when the median import time is above')
+    parser.add_argument('--output', help='write the results as json')
+    args = parser.parse_args()
+
+    # the first run compiles the .pyc files
+    measure_startup()
+    runs = [measure_startup() for _ in range(args.runs)]
+    import_seconds = [run['importSeconds'] for run in runs]
+    loaded_modules = sorted({name for run in runs for name in run['loadedModules']})
+    result = {'runs': args.runs,
+              'medianImportSeconds': statistics.median(import_seconds),
+              'maxImportSeconds': max(import_seconds),
+              'peakRssMb': max(run['peakRssMb'] for run in runs),
+              'loadedModules': loaded_modules}
+
+    print(f'{"median s":>10}{"max s":>10}{"peak RSS MB":>13}  loaded heavy modules')
+    print(f'{result["medianImportSeconds"]:>10.4f}{result["maxImportSeconds"]:>10.4f}{result["peakRssMb"]:>13.1f}  '
+          f'{", ".join(loaded_modules) or "-"}')
+
+    if args.output:
+        from WebSitesScrapingWorker import VERSION
+        with open(args.output, 'w') as file:
+            json.dump({'version': VERSION, 'time': datetime.now().isoformat(timespec='seconds'),
+                       'python': platform.python_version(), **result}, file, indent=2)
+
+    failures = []
+    if loaded_modules:
+        failures.append(f'heavy modules are imported on startup: {", ".join(loaded_modules)}')
+    if args.max_seconds is not None and result['medianImportSeconds'] > args.max_seconds:
+        failures.append(f'median import time {result["medianImportSeconds"]:.4f}s is above {args.max_seconds}s')
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
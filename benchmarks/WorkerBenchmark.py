@@ -0,0 +1,130 @@
+'''
+Throughput benchmark of WebSiteScarperWorker.work - offline, the pages are generated fixtures (BenchmarkFixtures)
+served by the stand-in http server of the tests (with optional latency) and scraped with the reference flows in
+benchmarks/flows:
+
+    PYTHONPATH=. python benchmarks/WorkerBenchmark.py --pages 20 --latency 0.05 --output results.json
+
+Every scenario runs in its own process (peak RSS is per process) - one warm up work (flow load, imports) and then
+--pages works one after the other. Reported per scenario: pages/sec, p50 / p99 latency per page (seconds) and the
+peak RSS of the process (MB, the served fixture pages included).
+Keep the --output json of every version to track the performance changes.
+'''
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+FLOWS_DIR = os.path.join(BENCHMARKS_DIR, 'flows')
+sys.path.insert(0, os.path.join(os.path.dirname(BENCHMARKS_DIR), 'tests'))
+
+from BenchmarkFixtures import large_table_page, flat_sections_page, index_page
+
+# scenario -> (flow file, page fixture (scale -> html))
+SCENARIOS = {
+    'large_tables': ('large_tables.yml', lambda scale: large_table_page(num_of_rows=int(2000 * scale))),
+    'connection_tree': ('connection_tree.yml', lambda scale: flat_sections_page(size_mb=1.0 * scale)),
+    'index_links': ('index_links.yml', lambda scale: index_page(num_of_links=int(5000 * scale))),
+}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_scenario(scenario, num_of_pages, latency, scale):
+    '''
+    Run the scenario in this process
+    :return: the scenario results (dict)
+    '''
+    from StandInHttpServer import start_stand_in_server
+    from WebSitesScrapingWorker import WebSiteScarperWorker
+
+    flow_file, fixture = SCENARIOS[scenario]
+    page = fixture(scale)
+    pages = {f'/page_{idx}.html': page for idx in range(num_of_pages + 1)}
+    server, base_url = start_stand_in_server(pages, latency=latency)
+    # the reference flows write to ./out
+    os.chdir(tempfile.mkdtemp())
+
+    worker = WebSiteScarperWorker()
+
+    def work(idx):
+        # the same page is served for every url - the content dedup would skip them
+        worker.work({'params': {'worker_driver': 'WebSitesScrapingWorker', 'title': f'page_{idx}',
+                                'dedupContent': False},
+                     'payload': {'scrap_flow': os.path.join(FLOWS_DIR, flow_file),
+                                 'url_to_scrap': f'{base_url}/page_{idx}.html'}})
+
+    work(num_of_pages)
+    latencies = []
+    start = time.perf_counter()
+    for idx in range(num_of_pages):
+        page_start = time.perf_counter()
+        work(idx)
+        latencies.append(time.perf_counter() - page_start)
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    return {'scenario': scenario, 'pages': num_of_pages, 'pageBytes': len(page.encode('utf-8')),
+            'pagesPerSec': round(num_of_pages / elapsed, 3),
+            'p50Seconds': round(percentile(latencies, 0.5), 6), 'p99Seconds': round(percentile(latencies, 0.99), 6),
+            'peakRssMb': round(peak_rss_mb(), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WebSiteScarperWorker.work benchmark')
+    parser.add_argument('--scenarios', nargs='*', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--pages', type=int, default=20, help='measured works per scenario')
+    parser.add_argument('--latency', type=float, default=0.0, help='stand-in server latency (seconds)')
+    parser.add_argument('--scale', type=float, default=1.0, help='fixtures size multiplier')
+    parser.add_argument('--output', help='write the results as json')
+    parser.add_argument('--run-scenario', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # scenario process
+    if args.run_scenario:
+        import logging
+        logging.disable(logging.INFO)
+        print(json.dumps(run_scenario(args.run_scenario, args.pages, args.latency, args.scale)))
+        return
+
+    results = []
+    print(f'{"scenario":18}{"page KB":>10}{"pages/sec":>12}{"p50 s":>10}{"p99 s":>10}{"peak RSS MB":>13}')
+    for scenario in args.scenarios:
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-scenario', scenario,
+                                 '--pages', str(args.pages), '--latency', str(args.latency),
+                                 '--scale', str(args.scale)],
+                                check=True, stdout=subprocess.PIPE, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results.append(result)
+        print(f'{scenario:18}{result["pageBytes"] / 1024:>10.0f}{result["pagesPerSec"]:>12.2f}'
+              f'{result["p50Seconds"]:>10.4f}{result["p99Seconds"]:>10.4f}{result["peakRssMb"]:>13.1f}')
+
+    if args.output:
+        from WebSitesScrapingWorker import VERSION
+        with open(args.output, 'w') as file:
+            json.dump({'version': VERSION, 'time': datetime.now().isoformat(timespec='seconds'),
+                       'python': platform.python_version(), 'pages': args.pages, 'latency': args.latency,
+                       'scale': args.scale, 'results': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,7 +7,7 @@ VERSION='0.0.20'
 setuptools.setup(
      name='WebGenericScraper',
      version=VERSION,
-     scripts=['WebSitesScrapingWorker.py', 'ScrapingMessageCreator.py', 'WebScarpingWork'],
+     scripts=['WebSitesScrapingWorker.py', 'ScrapingMessageCreator.py', 'WebScarpingWork', 'ScrapFlow.py', 'ScrapActions.py', 'HttpSessionPool.py', 'AsyncFetchEngine.py', 'BrowserPool.py', 'HtmlParsers.py', 'PathSelectors.py', 'TableExtraction.py', 'OutputSinks.py', 'ResponseCache.py', 'Dedup.py', 'UrlSources.py', 'PolitenessScheduler.py', 'CrawlJournal.py', 'CrawlFrontier.py', 'FlowProcessPool.py', 'ExecutionContext.py', 'ScrapMetrics.py'],
      author="Idan Perez",
      author_email="kimpatz@gmail.com",
      description="This is a generic web scraper fro scraping web page and execute some actions on top",
@@ -0,0 +1,123 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from StandInHttpServer import start_stand_in_server
+from WebSitesScrapingWorker import *
+from AsyncFetchEngine import AsyncFetchEngine
+
+NUM_OF_PAGES = 20
+LATENCY = 0.2
+
+
+def test():
+    logging.basicConfig(format='[%(asctime)s -%(levelname)s] (%(processName)-10s) %(message)s')
+    out_dir = tempfile.mkdtemp()
+    pages = {f'/page_{idx}.html': f'<html><body><h1 id="title">page {idx}</h1></body></html>' for idx in range(NUM_OF_PAGES)}
+    server, base_url = start_stand_in_server(pages, latency=LATENCY)
+
+    flow = {'flow': [{'actionName': 'path',
+                      'actionParams': {'type': 'single', 'HTMLtype': 'h1', 'id': 'title'},
+                      'subActions': [{'actionName': 'get', 'actionType': 'rec', 'actionParams': {'value': 'text'},
+                                      'subActions': [{'actionName': 'saveToFile',
+                                                      'actionParams': {'to': 'title', 'longName': False,
+                                                                       'fileType': 'json', 'dir': out_dir,
+                                                                       'name_prefix': '$title'}}]}]}]}
+    msgs = [{'params': {'worker_driver': 'WebSitesScrapingWorker', 'title': path.split('.')[0][1:]},
+             'payload': {'inline_scrap_flow': flow, 'url_to_scrap': base_url + path}} for path in pages]
+
+    start = time.time()
+    results = AsyncFetchEngine(WebSiteScarperWorker(), concurrency=10, per_host=10).run(msgs)
+    elapsed = time.time() - start
+    server.shutdown()
+
+    assert not [res for res in results if isinstance(res, Exception)]
+    assert len(os.listdir(out_dir)) == NUM_OF_PAGES
+    # sequential execution would take at least NUM_OF_PAGES * LATENCY
+    assert elapsed < NUM_OF_PAGES * LATENCY / 2, elapsed
+    print(f'{NUM_OF_PAGES} pages in {elapsed:.2f}s')
+
+
+def test_mixed_hosts():
+    # the works of a busy host must not starve the other hosts
+    busy_pages = {f'/busy_{idx}.html': f'<html><body><h1>busy {idx}</h1></body></html>' for idx in range(12)}
+    other_pages = {f'/other_{idx}.html': f'<html><body><h1>other {idx}</h1></body></html>' for idx in range(4)}
+    busy_server, busy_url = start_stand_in_server(busy_pages, latency=LATENCY)
+    other_server, other_url = start_stand_in_server(other_pages, latency=LATENCY)
+
+    flow = {'flow': [{'actionName': 'path', 'actionParams': {'type': 'single', 'HTMLtype': 'h1'}}]}
+    # the busy host works are first in the batch
+    msgs = [{'params': {'worker_driver': 'WebSitesScrapingWorker', 'dedupContent': False},
+             'payload': {'inline_scrap_flow': flow, 'url_to_scrap': base_url + path}}
+            for base_url, pages in ((busy_url, busy_pages), (other_url, other_pages)) for path in pages]
+
+    worker = WebSiteScarperWorker()
+    fetch_page = worker.fetch_page
+    fetched = {}
+    start = time.time()
+
+    def timed_fetch_page(URL, scrap_flow, working_params, ctx=None):
+        page = fetch_page(URL, scrap_flow, working_params, ctx)
+        fetched[URL] = time.time() - start
+        return page
+
+    worker.fetch_page = timed_fetch_page
+    results = AsyncFetchEngine(worker, concurrency=4, per_host=2).run(msgs)
+    busy_server.shutdown()
+    other_server.shutdown()
+
+    assert not [res for res in results if isinstance(res, Exception)]
+    busy_done = max(seconds for URL, seconds in fetched.items() if URL.startswith(busy_url))
+    other_done = max(seconds for URL, seconds in fetched.items() if URL.startswith(other_url))
+    # the other host is fetched next to the busy one (2 rounds), not after it (6 rounds)
+    assert other_done < busy_done / 2, (other_done, busy_done)
+    print(f'mixed hosts - other host done in {other_done:.2f}s, busy host in {busy_done:.2f}s')
+
+
+def test_limits_and_order():
+    # offline - the fetch of every work is counted, the results follow the works order
+    flow = {'flow': [{'actionName': 'path', 'actionParams': {'type': 'single', 'HTMLtype': 'h1'}}]}
+    hosts = ['a.example', 'b.example', 'c.example']
+    msgs = [{'params': {'worker_driver': 'WebSitesScrapingWorker'},
+             'payload': {'inline_scrap_flow': flow, 'url_to_scrap': f'http://{hosts[idx % 3]}/page_{idx}.html'}}
+            for idx in range(24)]
+    msgs[5]['payload']['url_to_scrap'] = 'http://a.example/fail.html'
+
+    worker = WebSiteScarperWorker()
+    lock = threading.Lock()
+    in_flight = {'all': 0}
+    max_in_flight = {'all': 0}
+
+    def counted_fetch_page(URL, scrap_flow, working_params, ctx=None):
+        host = URL.split('/')[2]
+        with lock:
+            for key in ('all', host):
+                in_flight[key] = in_flight.get(key, 0) + 1
+                max_in_flight[key] = max(max_in_flight.get(key, 0), in_flight[key])
+        # later works are fetched faster - they complete first
+        time.sleep(0.1 - int(URL.split('_')[-1].split('.')[0]) * 0.003 if '_' in URL else 0.01)
+        with lock:
+            for key in ('all', host):
+                in_flight[key] -= 1
+        if 'fail' in URL:
+            raise ValueError(URL)
+        return URL
+
+    worker.fetch_page = counted_fetch_page
+    worker.scrap_page = lambda msg, page, scrap_flow, ctx=None: page.split('/')[-1]
+    results = AsyncFetchEngine(worker, concurrency=5, per_host=2).run(msgs)
+
+    assert [str(res) if isinstance(res, ValueError) else res for res in results] == \
+        [msg['payload']['url_to_scrap'] if idx == 5 else msg['payload']['url_to_scrap'].split('/')[-1]
+         for idx, msg in enumerate(msgs)], results
+    assert max_in_flight['all'] <= 5 and all(max_in_flight[host] <= 2 for host in hosts), max_in_flight
+    # the limits are reached, not only respected
+    assert max_in_flight['all'] == 5 and max(max_in_flight[host] for host in hosts) == 2, max_in_flight
+    print(f'limits and order - ok (max in flight {max_in_flight})')
+
+
+test()
+test_mixed_hosts()
+test_limits_and_order()
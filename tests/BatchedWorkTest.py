@@ -0,0 +1,51 @@
+import logging
+import os
+import queue
+import tempfile
+
+from StandInHttpServer import start_stand_in_server
+from WebSitesScrapingWorker import *
+from ScrapingMessageCreator import MessageCreator
+
+
+def test_batched_messages():
+    urls_file = os.path.join(tempfile.mkdtemp(), 'urls.json')
+    with open(urls_file, 'w') as file:
+        json.dump({'docs': [f'https://example.com/{idx}' for idx in range(5)], 'more': ['https://example.com/more']},
+                  file)
+    works = queue.Queue()
+    MessageCreator({'urls': urls_file, 'scarpFlowYAml': 'flow.yml', 'batchSize': 2}).create_messages(works)
+    sent = [works.get() for _ in range(works.qsize())]
+    assert [(work['params']['title'], len(work['payload']['urls_to_scrap'])) for work in sent] == \
+           [('docs', 2), ('docs', 2), ('docs', 1), ('more', 1)]
+    assert all(work['payload']['scrap_flow'] == 'flow.yml' for work in sent)
+
+
+def test_batched_work():
+    out_dir = tempfile.mkdtemp()
+    pages = {f'/page_{idx}.html': f'<html><body><h1 id="title">page {idx}</h1></body></html>' for idx in range(3)}
+    server, base_url = start_stand_in_server(pages)
+
+    flow = {'flow': [{'actionName': 'path',
+                      'actionParams': {'type': 'single', 'HTMLtype': 'h1', 'id': 'title'},
+                      'subActions': [{'actionName': 'get', 'actionType': 'rec', 'actionParams': {'value': 'text'},
+                                      'subActions': [{'actionName': 'saveToFile',
+                                                      'actionParams': {'to': 'title', 'longName': False,
+                                                                       'fileType': 'jsonl', 'dir': out_dir}}]}]}]}
+    # the second url fail (nothing listen on port 9) - the other urls of the batch are still scraped
+    urls = [base_url + '/page_0.html', 'http://127.0.0.1:9/page.html', base_url + '/page_1.html',
+            base_url + '/page_2.html']
+    results = WebSiteScarperWorker().work({'params': {'worker_driver': 'WebSitesScrapingWorker',
+                                                      'httpSession': {'retries': 0}},
+                                           'payload': {'inline_scrap_flow': flow, 'urls_to_scrap': urls}})
+    server.shutdown()
+
+    assert [isinstance(result, Exception) for result in results] == [False, True, False, False]
+    with open(os.path.join(out_dir, 'title.jsonl')) as file:
+        assert [json.loads(line) for line in file] == ['page 0', 'page 1', 'page 2']
+
+
+logging.basicConfig(format='[%(asctime)s -%(levelname)s] (%(processName)-10s) %(message)s')
+test_batched_messages()
+test_batched_work()
+print('batched works - ok')
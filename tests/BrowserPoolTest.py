@@ -0,0 +1,123 @@
+import threading
+import time
+
+import BrowserPool as browser_pool_module
+from BrowserPool import BrowserPool, wait_for_page
+
+
+class FakeSwitchTo(object):
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.current_handle = handle
+
+
+class FakeDriver(object):
+    '''
+    Stand-in web driver - no browser is launched
+    :param ready_states: document.readyState by poll (the last one stay)
+    :param resources: number of loaded resources by poll (the last one stay)
+    '''
+    launched = []
+
+    def __init__(self, ready_states=('complete',), resources=(0,), selector_found=True):
+        self.ready_states = list(ready_states)
+        self.resources = list(resources)
+        self.selector_found = selector_found
+        self.window_handles = ['main', 'popup']
+        self.current_handle = 'main'
+        self.current_url = 'about:blank'
+        self.switch_to = FakeSwitchTo(self)
+        self.cookies_cleared = 0
+        self.quit_called = False
+        FakeDriver.launched.append(self)
+
+    def execute_script(self, script, *args):
+        if 'readyState' in script:
+            return self.ready_states.pop(0) if len(self.ready_states) > 1 else self.ready_states[0]
+        if 'querySelector' in script:
+            return self.selector_found
+        return self.resources.pop(0) if len(self.resources) > 1 else self.resources[0]
+
+    def close(self):
+        self.window_handles.remove(self.current_handle)
+
+    def delete_all_cookies(self):
+        self.cookies_cleared += 1
+
+    def get(self, URL):
+        self.current_url = URL
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_reuse():
+    browser_pool_module.create_driver = lambda headless=True: FakeDriver()
+    FakeDriver.launched = []
+    pool = BrowserPool(max_browsers=1, max_pages_per_browser=3)
+    for _ in range(5):
+        with pool.lease() as driver:
+            driver.get('http://example.com/page.html')
+    first, second = FakeDriver.launched
+    # the same browser for 3 leases - reset between them, recycled after them
+    assert first.quit_called and first.cookies_cleared == 2 and first.window_handles == ['main']
+    assert not second.quit_called and second.current_url == 'about:blank'
+
+    # max_browsers - the leases wait for a free browser
+    FakeDriver.launched = []
+    pool = BrowserPool(max_browsers=2, max_pages_per_browser=100)
+    lock = threading.Lock()
+    leased = set()
+    max_leased = [0]
+
+    def lease():
+        with pool.lease() as driver:
+            with lock:
+                assert driver not in leased
+                leased.add(driver)
+                max_leased[0] = max(max_leased[0], len(leased))
+            time.sleep(0.05)
+            with lock:
+                leased.remove(driver)
+
+    threads = [threading.Thread(target=lease) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(FakeDriver.launched) == 2 and max_leased[0] == 2, (len(FakeDriver.launched), max_leased)
+    pool.close()
+    assert all(driver.quit_called for driver in FakeDriver.launched)
+    try:
+        with pool.lease():
+            pass
+        assert False, 'expected RuntimeError'
+    except RuntimeError:
+        pass
+    print('browser pool reuse - ok')
+
+
+def test_wait_for_page():
+    # ready once the document is complete and no new resource was loaded for networkIdle ms
+    driver = FakeDriver(ready_states=('loading', 'interactive', 'complete'), resources=(1, 2, 3, 3))
+    start = time.monotonic()
+    assert wait_for_page(driver, {'networkIdle': 200, 'timeout': 5})
+    elapsed = time.monotonic() - start
+    assert 0.2 <= elapsed < 2, elapsed
+
+    # interactive is enough - no network idle wait
+    driver = FakeDriver(ready_states=('loading', 'interactive'))
+    assert wait_for_page(driver, {'readyState': 'interactive', 'networkIdle': 0, 'timeout': 5})
+
+    # the selector never shows up - timeout
+    driver = FakeDriver(selector_found=False)
+    start = time.monotonic()
+    assert not wait_for_page(driver, {'selector': '#content', 'networkIdle': 0, 'timeout': 0.3})
+    assert 0.3 <= time.monotonic() - start < 2
+    print('wait for page - ok')
+
+
+test_reuse()
+test_wait_for_page()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+
+from WebSitesScrapingWorker import *
+from HtmlParsers import parse_html
+
+PAGE = ('<html><body><main id="content"></main>'
+        '<h2>a</h2><p>noise</p><h3>a1</h3><div>x</div><span></span><div>y</div><span></span>'
+        '<h3>a2</h3><div>z</div><span></span>'
+        '<h2>b</h2><h3>b1</h3><div>w</div><span></span>'
+        '<h2>c</h2><footer id="end"></footer><h3>after the end</h3></body></html>')
+
+
+def as_texts(tree):
+    return {key if key == 'leaf' else key.get_text(): [leaf.get_text() for leaf in val] if key == 'leaf'
+            else as_texts(val) for key, val in tree.items()}
+
+
+def test():
+    worker = WebSiteScarperWorker()
+    for parser in ('html.parser', 'lxml', 'selectolax', 'lxml.html'):
+        target = parse_html(PAGE, parser).find('main', id='content')
+        tree = worker.build_connection_tree(target, {'h2': {}}, {'footer': {'id': 'end'}}, 'h2.h3.div', None)[1]
+        assert as_texts(tree) == {'a': {'a1': {'leaf': ['x', 'y']}, 'a2': {'leaf': ['z']}}, 'b': {'b1': {'leaf': ['w']}},
+                                  'c': {}}, \
+            (parser, as_texts(tree))
+
+        # no ending point - stop at the end of the document
+        tree = worker.build_connection_tree(target, {'h2': {}}, None, 'h2.h3.div', None)[1]
+        assert list(as_texts(tree)) == ['a', 'b', 'c'], (parser, as_texts(tree))
+        # missing starting point - empty tree
+        assert worker.build_connection_tree(target, {'h4': {}}, None, 'h2.h3.div', None)[1] == {}
+
+        # first leaf of every leaf list
+        branches = worker.get_dfs_branches(worker.build_connection_tree(
+            target, {'h2': {}}, {'footer': {'id': 'end'}}, 'h2.h3.div', None)[1])
+        assert [[elem.get_text() for elem in branch] for branch in branches] == \
+            [['a', 'a1', 'x'], ['a', 'a2', 'z'], ['b', 'b1', 'w']], parser
+    print('connection tree - ok')
+
+
+def test_tree_dfs_flow():
+    out_dir = tempfile.mkdtemp()
+    flow = {'flow': [{'actionName': 'path', 'actionParams': {'type': 'single', 'HTMLtype': 'main', 'id': 'content'},
+                      'subActions': [{'actionName': 'buildConnectionTree', 'actionType': 'rec',
+                                      'actionParams': {'treeRelations': 'h2.h3.div',
+                                                       'EndingPoint': {'footer': {'id': 'end'}}},
+                                      'subActions': [{'actionName': 'treeBranch2csv', 'actionType': 'tree_dfs',
+                                                      'actionParams': {'stream': True,
+                                                                       'preDefinedColumns': {'section': '[0]',
+                                                                                             'sub_section': '[1]',
+                                                                                             'leaf': '[2]'}},
+                                                      'subActions': [{'actionName': 'saveToFile',
+                                                                      'actionParams': {'to': 'branches',
+                                                                                       'longName': False,
+                                                                                       'fileType': 'csv',
+                                                                                       'dir': out_dir}}]}]}]}]}
+    worker = WebSiteScarperWorker()
+    msg = {'params': {'title': 'tree', 'dedupContent': False},
+           'payload': {'url_to_scrap': 'http://example.com/tree.html'}}
+    worker.scrap_page(msg, PAGE, worker.load_flow({'inline_scrap_flow': flow}))
+    with open(os.path.join(out_dir, 'branches.csv')) as file:
+        assert file.read().split() == ['section,sub_section,leaf', 'a,a1,x', 'a,a2,z', 'b,b1,w']
+    print('tree_dfs flow - ok')
+
+
+test()
+test_tree_dfs_flow()
@@ -0,0 +1,141 @@
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+
+from StandInHttpServer import start_stand_in_server
+from WebSitesScrapingWorker import *
+from ScrapingMessageCreator import MessageCreator
+from CrawlFrontier import CrawlFrontier, build_frontier_config
+
+
+def test():
+    logging.basicConfig(format='[%(asctime)s -%(levelname)s] (%(processName)-10s) %(message)s')
+    tmp_dir = tempfile.mkdtemp()
+    out_dir = os.path.join(tmp_dir, 'out')
+    pages = {
+        '/index.html': '<html><body><h1>index</h1><a href="a.html">a</a><a href="/b.html#top">b</a>'
+                       '<a href="http://other.example/c.html">c</a></body></html>',
+        '/a.html': '<html><body><h1>a</h1><a href="index.html">index</a><a href="deep.html">deep</a></body></html>',
+        '/b.html': '<html><body><h1>b</h1><a href="/a.html">a</a></body></html>',
+        '/deep.html': '<html><body><h1>deep</h1></body></html>',
+    }
+    server, base_url = start_stand_in_server(pages)
+
+    flow_path = os.path.join(tmp_dir, 'flow.yml')
+    with open(flow_path, 'w') as file:
+        file.write(f'''
+flow:
+  - actionName: path
+    actionParams: {{type: single, HTMLtype: h1}}
+    subActions:
+      - actionName: get
+        actionType: rec
+        actionParams: {{value: text}}
+        subActions:
+          - actionName: saveToFile
+            actionParams: {{to: titles, longName: false, fileType: jsonl, dir: {out_dir}}}
+  - actionName: path
+    actionParams: {{type: all, HTMLtype: a}}
+    subActions:
+      - actionName: enqueueUrls
+        actionParams: {{attr: href}}
+''')
+    params = {'urls': base_url + '/index.html', 'isUrlsInline': True, 'scarpFlowYAml': flow_path,
+              'frontier': {'dir': os.path.join(tmp_dir, 'frontier'), 'maxDepth': 1, 'pollInterval': 0.05}}
+
+    works = queue.Queue()
+    creator = threading.Thread(target=MessageCreator(params).create_messages, args=(works,))
+    creator.start()
+    worker = WebSiteScarperWorker()
+    while creator.is_alive() or not works.empty():
+        try:
+            worker.work(works.get(timeout=0.1))
+        except queue.Empty:
+            pass
+    creator.join()
+    server.shutdown()
+
+    with open(os.path.join(out_dir, 'titles.jsonl')) as file:
+        titles = [json.loads(line) for line in file]
+    # depth 1 only (deep.html is depth 2), other host is filtered, every page once
+    assert sorted(titles) == ['a', 'b', 'index'], titles
+    print('crawl frontier - ok')
+
+
+def test_in_flight():
+    frontier = CrawlFrontier(build_frontier_config({'dir': tempfile.mkdtemp(), 'inFlightTimeout': 0}))
+    frontier.add_seed('http://a.example/', 'flow', None)
+    frontier.add_seed('http://b.example/', 'flow', None)
+    # queued for more than inFlightTimeout, nothing was taken - the workers are not running, not lost
+    time.sleep(0.01)
+    assert frontier.num_of_in_flight() == 0 and frontier.last_taken() == 0
+    assert frontier.requeue_lost() == 0
+    # the timeout restart when a worker take the work
+    frontier.mark_taken(['http://a.example/'], 'flow')
+    assert frontier.last_taken() > 0
+    time.sleep(0.01)
+    assert frontier.num_of_in_flight() == 0
+    # a later work was taken - the queued one is lost and pending again
+    assert frontier.requeue_lost() == 1
+    assert [frontier_url.url for frontier_url in frontier.take_pending(10)] == ['http://b.example/']
+
+    # the workers are not running - the message creator doesn't wait for the queued works forever
+    params = {'urls': 'http://a.example/', 'isUrlsInline': True, 'scarpFlowYAml': 'flow.yml',
+              'frontier': {'dir': tempfile.mkdtemp(), 'pollInterval': 0.01, 'workerStartTimeout': 0.2}}
+    works = queue.Queue()
+    start = time.time()
+    MessageCreator(params).create_messages(works)
+    assert time.time() - start < 5 and works.qsize() == 1
+    print('frontier in flight - ok')
+
+
+def test_lost_work():
+    # the worker dies between the dequeue and marking the work taken - the work is lost
+    out_dir = tempfile.mkdtemp()
+    pages = {'/index.html': '<html><body><h1>index</h1><a href="a.html">a</a><a href="b.html">b</a></body></html>',
+             '/a.html': '<html><body><h1>a</h1></body></html>',
+             '/b.html': '<html><body><h1>b</h1></body></html>'}
+    server, base_url = start_stand_in_server(pages)
+    flow = {'flow': [{'actionName': 'path', 'actionParams': {'type': 'single', 'HTMLtype': 'h1'},
+                      'subActions': [{'actionName': 'get', 'actionType': 'rec', 'actionParams': {'value': 'text'},
+                                      'subActions': [{'actionName': 'saveToFile',
+                                                      'actionParams': {'to': 'titles', 'longName': False,
+                                                                       'fileType': 'jsonl', 'dir': out_dir}}]}]},
+                     {'actionName': 'path', 'actionParams': {'type': 'all', 'HTMLtype': 'a'},
+                      'subActions': [{'actionName': 'enqueueUrls', 'actionParams': {'attr': 'href'}}]}]}
+    flow_path = os.path.join(out_dir, 'flow.json')
+    with open(flow_path, 'w') as file:
+        json.dump(flow, file)
+    params = {'urls': base_url + '/index.html', 'isUrlsInline': True, 'scarpFlowYAml': flow_path,
+              'frontier': {'dir': tempfile.mkdtemp(), 'maxDepth': 1, 'pollInterval': 0.05, 'inFlightTimeout': 0.5}}
+
+    works = queue.Queue()
+    creator = threading.Thread(target=MessageCreator(params).create_messages, args=(works,))
+    creator.start()
+    worker = WebSiteScarperWorker()
+    lost = []
+    while creator.is_alive() or not works.empty():
+        try:
+            msg = works.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if msg['payload']['url_to_scrap'].endswith('/a.html') and not lost:
+            lost.append(msg)
+            continue
+        worker.work(msg)
+    creator.join()
+    server.shutdown()
+
+    assert lost
+    with open(os.path.join(out_dir, 'titles.jsonl')) as file:
+        titles = [json.loads(line) for line in file]
+    assert sorted(titles) == ['a', 'b', 'index'], titles
+    print('frontier lost work - ok')
+
+
+test()
+test_in_flight()
+test_lost_work()
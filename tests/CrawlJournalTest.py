@@ -0,0 +1,61 @@
+import logging
+import os
+import queue
+import tempfile
+
+from StandInHttpServer import start_stand_in_server
+from WebSitesScrapingWorker import *
+from ScrapingMessageCreator import MessageCreator
+
+
+def test():
+    logging.basicConfig(format='[%(asctime)s -%(levelname)s] (%(processName)-10s) %(message)s')
+    tmp_dir = tempfile.mkdtemp()
+    out_dir = os.path.join(tmp_dir, 'out')
+    pages = {f'/page_{idx}.html': f'<html><body><h1 id="title">page {idx}</h1></body></html>' for idx in range(4)}
+    server, base_url = start_stand_in_server(pages)
+
+    flow_path = os.path.join(tmp_dir, 'flow.yml')
+    with open(flow_path, 'w') as file:
+        file.write(f'''
+flow:
+  - actionName: path
+    actionParams: {{type: single, HTMLtype: h1, id: title}}
+    subActions:
+      - actionName: get
+        actionType: rec
+        actionParams: {{value: text}}
+        subActions:
+          - actionName: saveToFile
+            actionParams: {{to: titles, longName: false, fileType: jsonl, dir: {out_dir}}}
+''')
+    urls_path = os.path.join(tmp_dir, 'urls.txt')
+    with open(urls_path, 'w') as file:
+        file.write('\n'.join(base_url + path for path in pages))
+    params = {'urls': urls_path, 'scarpFlowYAml': flow_path, 'journal': {'dir': os.path.join(tmp_dir, 'journal')}}
+
+    works = queue.Queue()
+    MessageCreator(params).create_messages(works)
+    # the crawl die after 2 works
+    worker = WebSiteScarperWorker()
+    for _ in range(2):
+        worker.work(works.get())
+
+    works = queue.Queue()
+    MessageCreator(dict(params, resume=True)).create_messages(works)
+    sent = [works.get() for _ in range(works.qsize())]
+    assert [work['payload']['url_to_scrap'] for work in sent] == [base_url + '/page_2.html', base_url + '/page_3.html']
+    for work in sent:
+        worker.work(work)
+    server.shutdown()
+
+    with open(os.path.join(out_dir, 'titles.jsonl')) as file:
+        assert [json.loads(line) for line in file] == [f'page {idx}' for idx in range(4)]
+
+    journal_dir = os.path.join(tmp_dir, 'journal')
+    records = [json.loads(line) for name in os.listdir(journal_dir) for line in open(os.path.join(journal_dir, name))]
+    assert all(record['outputs'] == [os.path.join(out_dir, 'titles.jsonl')] for record in records)
+    print('crawl journal - ok')
+
+
+test()
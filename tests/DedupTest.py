@@ -0,0 +1,58 @@
+import logging
+import os
+import queue
+import tempfile
+
+from StandInHttpServer import start_stand_in_server
+from WebSitesScrapingWorker import *
+from ScrapingMessageCreator import MessageCreator
+
+
+def test_urls_dedup():
+    urls_file = os.path.join(tempfile.mkdtemp(), 'urls.json')
+    with open(urls_file, 'w') as file:
+        json.dump({'docs': ['https://example.com/a/', 'https://EXAMPLE.com/a?utm_source=x', 'https://example.com/b'],
+                   'more': ['https://example.com/a#top', 'https://example.com/c']}, file)
+    works = queue.Queue()
+    MessageCreator({'urls': urls_file, 'scarpFlowYAml': 'flow.yml'}).create_messages(works)
+    sent = [works.get()['payload']['url_to_scrap'] for _ in range(works.qsize())]
+    assert sent == ['https://example.com/a/', 'https://example.com/b', 'https://example.com/c'], sent
+
+    works = queue.Queue()
+    MessageCreator({'urls': urls_file, 'scarpFlowYAml': 'flow.yml', 'dedupUrls': False}).create_messages(works)
+    assert works.qsize() == 5
+
+
+def test_content_dedup():
+    out_dir = tempfile.mkdtemp()
+    page = '<html><body><h1 id="title">mirror</h1></body></html>'
+    pages = {'/a.html': page, '/mirror/a.html': page}
+    server, base_url = start_stand_in_server(pages)
+
+    flow = {'flow': [{'actionName': 'path',
+                      'actionParams': {'type': 'single', 'HTMLtype': 'h1', 'id': 'title'},
+                      'subActions': [{'actionName': 'get', 'actionType': 'rec', 'actionParams': {'value': 'text'},
+                                      'subActions': [{'actionName': 'saveToFile',
+                                                      'actionParams': {'to': 'title', 'longName': False,
+                                                                       'fileType': 'jsonl', 'dir': out_dir}}]}]}]}
+    worker = WebSiteScarperWorker()
+
+    def scrap_pages(params):
+        for path in pages:
+            worker.work({'params': dict(params, worker_driver='WebSitesScrapingWorker'),
+                         'payload': {'inline_scrap_flow': flow, 'url_to_scrap': base_url + path}})
+        with open(os.path.join(out_dir, 'title.jsonl')) as file:
+            return [json.loads(line) for line in file]
+
+    # opt in - the same page is scraped once
+    assert scrap_pages({'dedupContent': True}) == ['mirror']
+    # by default every page is scraped
+    os.remove(os.path.join(out_dir, 'title.jsonl'))
+    assert scrap_pages({}) == ['mirror', 'mirror']
+    server.shutdown()
+
+
+logging.basicConfig(format='[%(asctime)s -%(levelname)s] (%(processName)-10s) %(message)s')
+test_urls_dedup()
+test_content_dedup()
+print('dedup - ok')
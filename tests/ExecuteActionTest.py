@@ -0,0 +1,86 @@
+import os
+import tempfile
+
+from WebSitesScrapingWorker import *
+from ScrapFlow import ScrapFlowError
+
+PAGE = ('<html><body>'
+        '<ul><li class="item">one</li><li class="item"> two </li><li>not an item</li><li class="item">three</li></ul>'
+        '<div id="links"><a href="/a">a</a><a href="/b">b</a></div>'
+        '<main id="content"></main><h2>a</h2><h3>a1</h3><div>x</div><span></span><h3>a2</h3><div>y</div><span></span>'
+        '<h2>b</h2><h3>b1</h3><div>z</div><span></span><h2>c</h2><footer id="end"></footer>'
+        '</body></html>')
+
+
+def build_flow(out_dir):
+    def save(to):
+        return {'actionName': 'saveToFile', 'actionParams': {'to': to, 'longName': False, 'fileType': 'json',
+                                                            'dir': out_dir}}
+
+    return {'flow': [
+        {'actionName': 'createVar', 'actionParams': {'name': 'items', 'type': 'list'}},
+        {'actionName': 'createVar', 'actionParams': {'name': 'links', 'type': 'dict'}},
+        # loop + single
+        {'actionName': 'path', 'actionParams': {'type': 'all', 'HTMLtype': 'li', 'class': 'item'},
+         'subActions': [{'actionName': 'get', 'actionType': 'loop', 'actionParams': {'value': 'text'},
+                         'subActions': [{'actionName': 'addToVar',
+                                         'actionParams': {'varName': 'items', 'varType': 'list'}}]}]},
+        # rec + block loop
+        {'actionName': 'path', 'actionParams': {'type': 'single', 'HTMLtype': 'div', 'id': 'links'},
+         'subActions': [{'actionName': 'path', 'actionType': 'rec', 'actionParams': {'type': 'all', 'HTMLtype': 'a'},
+                         'subActions': [{'type': 'loop', 'actions': [
+                             {'actionName': 'get', 'actionParams': {'value': 'href'},
+                              'subActions': [{'actionName': 'addToVar', 'actionType': 'rec',
+                                              'actionParams': {'varName': 'links', 'varType': 'dict',
+                                                               'varKey': '$.'}}]},
+                             {'actionName': 'get', 'actionParams': {'value': 'text'},
+                              'subActions': [{'actionName': 'addToVar',
+                                              'actionParams': {'varName': 'items', 'varType': 'list'}}]}]}]}]},
+        # rec + tree_dfs - one item per branch
+        {'actionName': 'path', 'actionParams': {'type': 'single', 'HTMLtype': 'main', 'id': 'content'},
+         'subActions': [{'actionName': 'buildConnectionTree', 'actionType': 'rec',
+                         'actionParams': {'treeRelations': 'h2.h3.div', 'StartintPoint': {'h2': {}},
+                                          'EndingPoint': {'footer': {'id': 'end'}}},
+                         'subActions': [{'actionName': 'treeBranch2csv', 'actionType': 'tree_dfs',
+                                         'actionParams': {'preDefinedColumns': {'section': '[0]',
+                                                                                'sub_section': '[1]',
+                                                                                'leaf': '[2]'}},
+                                         'subActions': [{'actionName': 'addToVar', 'actionType': 'rec',
+                                                         'actionParams': {'varName': 'items', 'varType': 'list',
+                                                                          'varValue': 'branch'}}]}]}]},
+        # Atomic sub action and a block that is not a loop are skipped
+        {'actionName': 'path', 'actionParams': {'type': 'all', 'HTMLtype': 'li'},
+         'subActions': [{'actionName': 'addToVar', 'actionType': 'Atomic',
+                         'actionParams': {'varName': 'items', 'varType': 'list', 'varValue': 'atomic'}},
+                        {'type': 'other', 'actions': []}]},
+        {'actionName': 'getVar', 'actionParams': {'varName': 'items'}, 'subActions': [save('items')]},
+        {'actionName': 'getVar', 'actionParams': {'varName': 'links'}, 'subActions': [save('links')]},
+    ]}
+
+
+def test():
+    # the output of the flow before the action registry (run_single_action if-chain)
+    out_dir = tempfile.mkdtemp()
+    worker = WebSiteScarperWorker()
+    msg = {'params': {}, 'payload': {'url_to_scrap': 'http://example.com/page.html'}}
+    worker.scrap_page(msg, PAGE, worker.load_flow({'inline_scrap_flow': build_flow(out_dir)}))
+    with open(os.path.join(out_dir, 'items.json')) as file:
+        assert json.load(file) == ['one', ' two ', 'three', 'a', 'b', 'branch', 'branch', 'branch']
+    with open(os.path.join(out_dir, 'links.json')) as file:
+        assert json.load(file) == {'/a': '/a', '/b': '/b'}
+    print('execute action modes - ok')
+
+
+def test_unknown_action_type():
+    flow = {'flow': [{'actionName': 'path', 'actionParams': {'type': 'all', 'HTMLtype': 'li'},
+                      'subActions': [{'actionName': 'get', 'actionType': 'lop', 'actionParams': {'value': 'text'}}]}]}
+    try:
+        WebSiteScarperWorker().load_flow({'inline_scrap_flow': flow})
+        assert False, 'expected ScrapFlowError'
+    except ScrapFlowError as e:
+        assert 'unknown actionType lop' in str(e)
+    print('unknown action type - ok')
+
+
+test()
+test_unknown_action_type()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from StandInHttpServer import start_stand_in_server
+from WebSitesScrapingWorker import *
+from ScrapActions import ActionHandler, register_action
+
+
+@register_action('fetchWithSource')
+class FetchWithSourceAction(ActionHandler):
+    '''
+    preProcess action of the test - fetch the page and keep where it came from in the execution vars
+    '''
+
+    def run(self, worker, target_value, ctx):
+        ctx.execution_vars['source'] = 'pre_processed'
+        return get_session_pool().fetch(target_value).content
+
+NUM_OF_PAGES = 16
+
+
+def test():
+    out_dir = tempfile.mkdtemp()
+    flow = {'flow': [{'actionName': 'createVar', 'actionParams': {'name': 'texts', 'type': 'list'}},
+                     {'actionName': 'path', 'actionParams': {'type': 'all', 'HTMLtype': 'p'},
+                      'subActions': [{'actionName': 'get', 'actionType': 'loop', 'actionParams': {'value': 'text'},
+                                      'subActions': [{'actionName': 'addToVar',
+                                                      'actionParams': {'varName': 'texts', 'varType': 'list'}}]}]},
+                     {'actionName': 'getVar', 'actionParams': {'varName': 'texts'},
+                      'subActions': [{'actionName': 'saveToFile',
+                                      'actionParams': {'to': 'texts', 'longName': False, 'fileType': 'json',
+                                                       'dir': out_dir, 'name_prefix': '$title'}}]}]}
+    worker = WebSiteScarperWorker()
+    scrap_flow = worker.load_flow({'inline_scrap_flow': flow})
+
+    def scrap(idx):
+        msg = {'params': {'title': f'page_{idx}', 'dedupContent': False},
+               'payload': {'url_to_scrap': f'http://example.com/page_{idx}.html'}}
+        page = ''.join(f'<p>{idx}-{line}</p>' for line in range(50))
+        return worker.scrap_page(msg, f'<html><body>{page}</body></html>', scrap_flow)
+
+    # one worker object shared by many threads - every page has its own execution vars
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(scrap, range(NUM_OF_PAGES)))
+
+    for idx in range(NUM_OF_PAGES):
+        with open(os.path.join(out_dir, f'page_{idx}_texts.json')) as file:
+            assert json.load(file) == [f'{idx}-{line}' for line in range(50)]
+    print('execution context - ok')
+
+
+def test_pre_process_vars():
+    # the preProcess actions and the flow share the execution vars of the work
+    out_dir = tempfile.mkdtemp()
+    server, base_url = start_stand_in_server({'/page.html': '<html><body><h1>title</h1></body></html>'})
+    flow = {'preProcess': [{'actionName': 'fetchWithSource', 'actionParams': {}}],
+            'flow': [{'actionName': 'path', 'actionParams': {'type': 'single', 'HTMLtype': 'h1'},
+                      'subActions': [{'actionName': 'get', 'actionType': 'rec', 'actionParams': {'value': 'text'},
+                                      'subActions': [{'actionName': 'saveToFile',
+                                                      'actionParams': {'to': 'title', 'longName': False,
+                                                                       'fileType': 'json', 'dir': out_dir,
+                                                                       'name_prefix': '$source'}}]}]}]}
+    WebSiteScarperWorker().work({'params': {'worker_driver': 'WebSitesScrapingWorker'},
+                                 'payload': {'inline_scrap_flow': flow, 'url_to_scrap': base_url + '/page.html'}})
+    server.shutdown()
+    with open(os.path.join(out_dir, 'pre_processed_title.json')) as file:
+        assert json.load(file) == 'title'
+    print('preProcess vars - ok')
+
+
+test()
+test_pre_process_vars()
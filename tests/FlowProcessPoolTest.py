@@ -0,0 +1,111 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+
+from StandInHttpServer import start_stand_in_server
+from WebSitesScrapingWorker import *
+from AsyncFetchEngine import AsyncFetchEngine
+from FlowProcessPool import FlowProcessPool
+
+NUM_OF_PAGES = 8
+NUM_OF_ROWS = 3000
+
+
+def test():
+    logging.basicConfig(format='[%(asctime)s -%(levelname)s] (%(processName)-10s) %(message)s')
+    out_dirs = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+    rows = ''.join(f'<tr><td>{idx}</td><td>value {idx}</td></tr>' for idx in range(NUM_OF_ROWS))
+    pages = {f'/page_{idx}.html': f'<html><body><table class="data"><tr><th>id</th><th>value</th></tr>{rows}</table>'
+                                  f'</body></html>' for idx in range(NUM_OF_PAGES)}
+    server, base_url = start_stand_in_server(pages)
+
+    def build_msgs(out_dir):
+        flow = {'flow': [{'actionName': 'table2csv', 'actionParams': {'class': 'data', 'stream': True},
+                          'subActions': [{'actionName': 'saveToFile',
+                                          'actionParams': {'to': 'table', 'longName': False, 'fileType': 'csv',
+                                                           'dir': out_dir, 'name_prefix': '$title'}}]}]}
+        return [{'params': {'worker_driver': 'WebSitesScrapingWorker', 'title': path.split('.')[0][1:],
+                            'dedupContent': False},
+                 'payload': {'inline_scrap_flow': flow, 'url_to_scrap': base_url + path}} for path in pages]
+
+    worker = WebSiteScarperWorker()
+    start = time.time()
+    AsyncFetchEngine(worker, concurrency=NUM_OF_PAGES).run(build_msgs(out_dirs[0]))
+    in_process = time.time() - start
+
+    flow_pool = FlowProcessPool(processes=4, shared_memory_threshold=1024)
+    start = time.time()
+    results = AsyncFetchEngine(worker, concurrency=NUM_OF_PAGES, flow_pool=flow_pool).run(build_msgs(out_dirs[1]))
+    pooled = time.time() - start
+    flow_pool.close()
+    server.shutdown()
+
+    assert not [res for res in results if isinstance(res, Exception)], results
+    assert sorted(os.listdir(out_dirs[0])) == sorted(os.listdir(out_dirs[1]))
+    for name in os.listdir(out_dirs[0]):
+        with open(os.path.join(out_dirs[0], name)) as file, open(os.path.join(out_dirs[1], name)) as pooled_file:
+            assert file.read() == pooled_file.read()
+    print(f'{NUM_OF_PAGES} pages - in process {in_process:.2f}s, process pool ({os.cpu_count()} cores) {pooled:.2f}s')
+
+
+def pool_in_daemon(out_dir, results):
+    flow = {'flow': [{'actionName': 'path', 'actionParams': {'type': 'single', 'HTMLtype': 'h1'},
+                      'subActions': [{'actionName': 'get', 'actionType': 'rec', 'actionParams': {'value': 'text'},
+                                      'subActions': [{'actionName': 'saveToFile',
+                                                      'actionParams': {'to': 'title', 'longName': False,
+                                                                       'fileType': 'json', 'dir': out_dir}}]}]}]}
+    msg = {'params': {'worker_driver': 'WebSitesScrapingWorker'},
+           'payload': {'inline_scrap_flow': flow, 'url_to_scrap': 'http://example.com/page.html'}}
+    flow_pool = FlowProcessPool(processes=2)
+    try:
+        flow_pool.submit(msg, '<html><body><h1>from the pool</h1></body></html>').result(timeout=60)
+        results.put(flow_pool._threads[0].is_alive())
+    finally:
+        flow_pool.close()
+
+
+def test_daemon_worker():
+    # WLO workers are daemon processes - the flow processes are not multiprocessing children
+    out_dir = tempfile.mkdtemp()
+    results = multiprocessing.get_context('fork').Queue()
+    process = multiprocessing.get_context('fork').Process(target=pool_in_daemon, args=(out_dir, results),
+                                                          daemon=True)
+    process.start()
+    assert results.get(timeout=60) is True
+    process.join()
+    assert process.exitcode == 0
+    with open(os.path.join(out_dir, 'title.json')) as file:
+        assert json.load(file) == 'from the pool'
+    print('daemon worker - ok')
+
+
+def test_not_modified():
+    # the response cache returns PAGE_NOT_MODIFIED on 304 - the pooled path skips the flow too
+    out_dir = tempfile.mkdtemp()
+    server, base_url = start_stand_in_server({'/page.html': '<html><body><h1>cached</h1></body></html>'})
+    flow = {'flow': [{'actionName': 'path', 'actionParams': {'type': 'single', 'HTMLtype': 'h1'},
+                      'subActions': [{'actionName': 'get', 'actionType': 'rec', 'actionParams': {'value': 'text'},
+                                      'subActions': [{'actionName': 'saveToFile',
+                                                      'actionParams': {'to': 'title', 'longName': False,
+                                                                       'fileType': 'jsonl', 'dir': out_dir}}]}]}]}
+    msg = {'params': {'worker_driver': 'WebSitesScrapingWorker', 'responseCache': {'dir': tempfile.mkdtemp()}},
+           'payload': {'inline_scrap_flow': flow, 'url_to_scrap': base_url + '/page.html'}}
+    flow_pool = FlowProcessPool(processes=1)
+    engine = AsyncFetchEngine(WebSiteScarperWorker(), flow_pool=flow_pool)
+    try:
+        results = engine.run([msg]) + engine.run([msg])
+    finally:
+        flow_pool.close()
+        server.shutdown()
+
+    assert not [res for res in results if isinstance(res, Exception)], results
+    assert server.requests_count == 2
+    with open(os.path.join(out_dir, 'title.jsonl')) as file:
+        assert [json.loads(line) for line in file] == ['cached']
+    print('not modified - ok')
+
+test()
+test_daemon_worker()
+test_not_modified()
@@ -0,0 +1,50 @@
+from WebSitesScrapingWorker import *
+from HtmlParsers import parse_html, PARSER_BACKENDS
+from PathSelectors import PathSelector
+
+PAGE = '''<html><head><title>parsers</title></head><body>
+<div id="main" class="content wide" data-kind="list">
+  <h1>Title <b>bold</b></h1>
+  <ul><li class="item">one</li><li class="item other"> two </li><li>three</li></ul>
+  <a href="/a" rel="next">a link</a><a href="/b">b link</a>
+  <p>text &amp; entity<br>after break</p>
+</div>
+<table class="data"><tr><th>id</th><th>name </th></tr><tr><td>1</td><td>one</td></tr>
+<tr><td>2</td><td> two <i>x</i></td></tr></table>
+</body></html>'''
+
+
+def parser_output(parser):
+    worker = WebSiteScarperWorker()
+    document = parse_html(PAGE, parser)
+    main = document.find('div', id='main')
+    items = document.findAll('li', class_='item')
+    links = main.find_all('a')
+    return {
+        'find': (main.name, main.get('id'), main.get('class'), main.get('data-kind'), main.get('missing', 'default'),
+                 main.has_attr('data-kind'), main.find('h1').get_text()),
+        'findAll': [item.get_text() for item in items],
+        'get': [(link.get('href'), link.get('rel')) for link in links],
+        'get_text': (document.find('p').get_text(), document.find('p').text,
+                     document.find('h1').get_text(separator='|', strip=True)),
+        'attrs': [item.get_text() for item in document.find_all('a', attrs={'rel': 'next'})],
+        'table2csv': [list(row) for row in worker.table2csv(document, class_='data', stream=True)],
+        'path': [element.get_text() for element in worker.HTMLpath(document, 'all', 'li', None, None, None, None)],
+        'path selector': ([element.get('href') for element in PathSelector(css='div#main > a').select(document,
+                                                                                                     single=False)],
+                          PathSelector('a', attr={'rel': 'next'}).select(document, single=True).get_text()),
+    }
+
+
+def test():
+    expected = parser_output('html.parser')
+    assert expected['findAll'] == ['one', ' two '], expected
+    assert expected['table2csv'] == [['1', 'one'], ['2', 'two x']], expected
+    for parser in PARSER_BACKENDS:
+        output = parser_output(parser)
+        for key, value in expected.items():
+            assert output[key] == value, (parser, key, output[key], value)
+    print(f'parsers parity ({", ".join(PARSER_BACKENDS)}) - ok')
+
+
+test()
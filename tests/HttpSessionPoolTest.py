@@ -0,0 +1,33 @@
+from StandInHttpServer import start_stand_in_server
+from HttpSessionPool import HttpSessionPool
+
+
+def test():
+    server, base_url = start_stand_in_server({'/page.html': '<html><body>page</body></html>'})
+    pool = HttpSessionPool()
+
+    session, config = pool.get_session()
+    assert pool.get_session()[0] is session and config['poolMaxSize'] == 8
+    # one keep alive connection for all the requests of the same config
+    for _ in range(5):
+        response = pool.fetch(base_url + '/page.html')
+        assert response.status_code == 200 and response.text == '<html><body>page</body></html>'
+    assert pool.fetch(base_url + '/missing.html').status_code == 404
+    assert server.requests_count == 6 and server.connections_count == 1, server.connections_count
+
+    # other config - other session (and connection), the default session is still shared
+    other_session, other_config = pool.get_session({'timeout': [1, 5], 'headers': {'X-Test': '1'}})
+    assert other_session is not session and other_session.headers['X-Test'] == '1'
+    assert pool.get_session({'headers': {'X-Test': '1'}, 'timeout': [1, 5]})[0] is other_session
+    pool.fetch(base_url + '/page.html', {'timeout': [1, 5], 'headers': {'X-Test': '1'}})
+    pool.fetch(base_url + '/page.html')
+    assert server.connections_count == 2
+
+    pool.close()
+    assert pool.get_session()[0] is not session
+    pool.close()
+    server.shutdown()
+    print('http session pool - ok')
+
+
+test()
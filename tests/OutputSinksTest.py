@@ -0,0 +1,43 @@
+import gzip
+import json
+import os
+import tempfile
+
+from OutputSinks import OutputSinks, MAX_OPEN_WRITERS
+from TableExtraction import TableRowStream
+
+NUM_OF_TARGETS = MAX_OPEN_WRITERS * 3
+
+
+def num_of_open_files(sinks):
+    return len([writer for writer in sinks.writers.values() if getattr(writer, 'file', None)])
+
+
+def test_open_writers_cap():
+    out_dir = tempfile.mkdtemp()
+    sinks = OutputSinks()
+    # two rounds over more targets than the cap - every target is closed and reopened
+    for round_idx in range(2):
+        for idx in range(NUM_OF_TARGETS):
+            table = TableRowStream(['k', 'v'], [[idx, round_idx]])
+            sinks.write(os.path.join(out_dir, f'table_{idx}'), 'csv', table)
+            sinks.write(os.path.join(out_dir, f'gz_table_{idx}'), 'csv', TableRowStream(['k', 'v'], [[idx, 'gz']]),
+                        {'compression': 'gzip'})
+            sinks.write(os.path.join(out_dir, f'value_{idx}'), 'jsonl', {'round': round_idx})
+            assert num_of_open_files(sinks) <= MAX_OPEN_WRITERS
+    assert sinks.num_of_rows == NUM_OF_TARGETS * 4
+    sinks.close()
+
+    assert len(os.listdir(out_dir)) == NUM_OF_TARGETS * 3
+    for idx in range(NUM_OF_TARGETS):
+        with open(os.path.join(out_dir, f'table_{idx}.csv')) as file:
+            # the header is written once, the reopened file is appended
+            assert file.read() == f'k,v\n{idx},0\n{idx},1\n'
+        with gzip.open(os.path.join(out_dir, f'gz_table_{idx}.csv.gz'), 'rt') as file:
+            assert file.read() == f'k,v\n{idx},gz\n{idx},gz\n'
+        with open(os.path.join(out_dir, f'value_{idx}.jsonl')) as file:
+            assert [json.loads(line) for line in file] == [{'round': 0}, {'round': 1}]
+    print('open writers cap - ok')
+
+
+test_open_writers_cap()
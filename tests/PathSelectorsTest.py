@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+
+from PathSelectors import PathSelector, PathSelectorError
+from HtmlParsers import parse_html, LxmlNode
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGE = '''<html><body>
+<div id="links"><!-- nav --><a href="/a">hello a</a><a href="/b">b</a><?pi x?></div>
+</body></html>'''
+
+
+LAZY_CODE = '''
+import sys
+from PathSelectors import PathSelector
+PathSelector('a')
+assert 'lxml' not in sys.modules, 'lxml is imported by the selector build'
+# soupsieve import bs4 (and its lxml builder) - only the css to xpath translation is checked
+PathSelector(css='a:-soup-contains("hello")')
+assert 'cssselect' not in sys.modules, 'cssselect is imported by the selector build'
+'''
+
+
+def test_lazy_xpath():
+    # building a selector doesn't translate it to xpath (nor import lxml / cssselect) - checked in a new interpreter,
+    # this one may have them imported already
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get('PYTHONPATH')])))
+    subprocess.run([sys.executable, '-c', LAZY_CODE], check=True, env=env)
+
+    selector = PathSelector(css='a:-soup-contains("hello")')
+    elements = selector.select(parse_html(PAGE, 'html.parser'), single=False)
+    assert [element['href'] for element in elements] == ['/a'], elements
+    assert len(PathSelector('a').select(parse_html(PAGE, 'lxml.html'), single=False)) == 2
+
+    # soupsieve only selector on the lxml.html parser
+    try:
+        PathSelector(css='a:-soup-contains("hello")').select(parse_html(PAGE, 'lxml.html'), single=False)
+        assert False, 'expected PathSelectorError'
+    except PathSelectorError:
+        pass
+    print('lazy xpath - ok')
+
+
+def test_xpath_results():
+    document = parse_html(PAGE, 'lxml.html')
+    assert PathSelector(xpath='//a/@href').select(document, single=False) == ['/a', '/b']
+    assert PathSelector(xpath='//a/text()').select(document, single=True) == 'hello a'
+    # comments and processing instructions are skipped
+    elements = PathSelector(xpath='//div/node()').select(document, single=False)
+    assert [element.name for element in elements] == ['a', 'a'], elements
+    assert all(isinstance(element, LxmlNode) for element in elements)
+    assert PathSelector(xpath='count(//a)').select(document, single=True) == 2
+    print('xpath results - ok')
+
+
+test_lazy_xpath()
+test_xpath_results()
@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from StandInHttpServer import start_stand_in_server
+from HttpSessionPool import get_session_pool
+from PolitenessScheduler import HostThrottle, build_politeness_config, interleave_by_host, parse_retry_after
+
+
+def test_interleave():
+    urls = [(None, f'http://a.com/{idx}') for idx in range(4)] + [(None, 'http://b.com/0'), (None, 'http://c.com/0')]
+    assert [url for _, url in interleave_by_host(urls, window=100)] == \
+           ['http://a.com/0', 'http://b.com/0', 'http://c.com/0', 'http://a.com/1', 'http://a.com/2', 'http://a.com/3']
+    # small window - still every url exactly once
+    assert sorted(interleave_by_host(urls, window=2)) == sorted(urls)
+
+
+def test_throttle():
+    pages = {f'/page_{idx}.html': '<html></html>' for idx in range(4)}
+    pages['/robots.txt'] = 'User-agent: *\nCrawl-delay: 0.3\n'
+    server, base_url = start_stand_in_server(pages)
+    throttle = HostThrottle(get_session_pool(), build_politeness_config({'dir': tempfile.mkdtemp(), 'qps': 100}))
+
+    start = time.time()
+    for idx in range(4):
+        assert throttle.fetch(f'{base_url}/page_{idx}.html').status_code == 200
+    elapsed = time.time() - start
+    server.shutdown()
+    # the robots crawl delay (0.3s) is stronger than the qps
+    assert elapsed >= 0.9, elapsed
+
+    # throttled - the delay is doubled and the next request is postponed by Retry-After
+    host = base_url
+    throttle._adapt(host, failed=True, retry_after=parse_retry_after('2'))
+    assert throttle.host_delay(host) == 0.6
+    next_time = throttle._db.execute('SELECT next_time FROM hosts WHERE host = ?', (host,)).fetchone()[0]
+    assert next_time - time.time() > 1.5
+    # success - additive decrease of the delay, never below the crawl delay
+    for _ in range(20):
+        throttle._adapt(host, failed=False)
+    assert throttle.host_delay(host) == 0.3
+
+
+def fetch_pages(config, urls):
+    throttle = HostThrottle(get_session_pool(), config)
+    threads = [threading.Thread(target=throttle.fetch, args=(url,)) for url in urls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_shared_concurrency():
+    pages = {f'/page_{idx}.html': '<html></html>' for idx in range(12)}
+    server, base_url = start_stand_in_server(pages, latency=0.2)
+    config = build_politeness_config({'dir': tempfile.mkdtemp(), 'qps': 0, 'perHostConcurrency': 2,
+                                      'respectRobots': False})
+    # slot of a killed process
+    throttle = HostThrottle(get_session_pool(), config)
+    dead_process = multiprocessing.get_context('fork').Process(target=os._exit, args=(0,))
+    dead_process.start()
+    dead_process.join()
+    throttle._db.execute('INSERT INTO in_flight (host, pid, started) VALUES (?, ?, ?)',
+                         (base_url, dead_process.pid, time.time()))
+
+    # 3 worker processes, 4 threads each - max 2 requests in flight to the host in total
+    urls = [f'{base_url}/page_{idx}.html' for idx in range(12)]
+    processes = [multiprocessing.get_context('fork').Process(target=fetch_pages, args=(config, urls[idx::3]))
+                 for idx in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    server.shutdown()
+
+    assert all(process.exitcode == 0 for process in processes)
+    assert server.requests_count == 12 and server.max_in_flight == 2, server.max_in_flight
+    assert throttle._db.execute('SELECT COUNT(*) FROM in_flight').fetchone()[0] == 0
+
+
+test_interleave()
+test_throttle()
+test_shared_concurrency()
+print('politeness - ok')
@@ -0,0 +1,90 @@
+import logging
+import os
+import tempfile
+
+from StandInHttpServer import start_stand_in_server
+from WebSitesScrapingWorker import *
+
+
+def test():
+    logging.basicConfig(format='[%(asctime)s -%(levelname)s] (%(processName)-10s) %(message)s')
+    out_dir = tempfile.mkdtemp()
+    cache_dir = tempfile.mkdtemp()
+    pages = {'/page.html': '<html><body><h1 id="title">first</h1></body></html>'}
+    server, base_url = start_stand_in_server(pages)
+
+    flow = {'flow': [{'actionName': 'path',
+                      'actionParams': {'type': 'single', 'HTMLtype': 'h1', 'id': 'title'},
+                      'subActions': [{'actionName': 'get', 'actionType': 'rec', 'actionParams': {'value': 'text'},
+                                      'subActions': [{'actionName': 'saveToFile',
+                                                      'actionParams': {'to': 'title', 'longName': False,
+                                                                       'fileType': 'jsonl', 'dir': out_dir}}]}]}]}
+    msg = {'params': {'worker_driver': 'WebSitesScrapingWorker', 'responseCache': {'dir': cache_dir}},
+           'payload': {'inline_scrap_flow': flow, 'url_to_scrap': base_url + '/page.html'}}
+    worker = WebSiteScarperWorker()
+
+    def scraped_titles():
+        with open(os.path.join(out_dir, 'title.jsonl')) as file:
+            return [json.loads(line) for line in file]
+
+    worker.work(msg)
+    assert scraped_titles() == ['first']
+
+    # unchanged page - 304 and the flow is skipped
+    worker.work(msg)
+    assert scraped_titles() == ['first']
+
+    # changed flow - the cached body is scraped again
+    msg['params']['title'] = 'other'
+    worker.work(msg)
+    assert scraped_titles() == ['first', 'first']
+
+    # changed page - new body
+    pages['/page.html'] = '<html><body><h1 id="title">second</h1></body></html>'
+    worker.work(msg)
+    assert scraped_titles() == ['first', 'first', 'second']
+
+    server.shutdown()
+    assert server.requests_count == 4
+
+    # size limit - the least recently used bodies are evicted
+    cache = get_response_cache({'dir': tempfile.mkdtemp(), 'maxBytes': 100})
+    cache.store('http://a', b'a' * 60, '"a"', None)
+    cache.store('http://b', b'b' * 60, '"b"', None)
+    assert cache.lookup('http://a') is None and cache.lookup('http://b') is not None
+    # replaced body - the running total size follow the table
+    cache.store('http://b', b'b' * 30, '"b2"', None)
+    cache.store('http://c', b'c' * 30, '"c"', None)
+    total_size = cache._db.execute('SELECT total_size FROM cache_size').fetchone()[0]
+    assert total_size == cache._db.execute('SELECT SUM(size) FROM responses').fetchone()[0] == 60
+    print('response cache - ok')
+
+
+class EvictingSessionPool(object):
+    '''
+    Evict the cached entries while the conditional request is in flight
+    '''
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def fetch(self, URL, http_config=None, headers=None):
+        self.cache.store('http://other', b'o' * 100, '"o"', None)
+        return get_session_pool().fetch(URL, http_config, headers=headers)
+
+
+def test_evicted_on_not_modified():
+    body = '<html><body>cached</body></html>'
+    server, base_url = start_stand_in_server({'/page.html': body})
+    cache = get_response_cache({'dir': tempfile.mkdtemp(), 'maxBytes': 100})
+    assert cache.fetch(get_session_pool(), base_url + '/page.html') == body.encode('utf-8')
+    # 304 - the body was read with the lookup, before the eviction
+    assert cache.fetch(EvictingSessionPool(cache), base_url + '/page.html') == body.encode('utf-8')
+    assert cache.lookup(base_url + '/page.html') is None
+    server.shutdown()
+    assert server.requests_count == 2
+    print('evicted on not modified - ok')
+
+
+test()
+test_evicted_on_not_modified()
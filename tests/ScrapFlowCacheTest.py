@@ -0,0 +1,61 @@
+import os
+import tempfile
+
+from ScrapFlow import ScrapFlowCache, ScrapFlowError
+
+FLOW = '''
+flow:
+  - actionName: path
+    actionParams: {type: single, HTMLtype: h1}
+'''
+
+
+def test():
+    cache = ScrapFlowCache(max_size=2)
+    flow_path = os.path.join(tempfile.mkdtemp(), 'flow.yml')
+    with open(flow_path, 'w') as file:
+        file.write(FLOW)
+
+    compiled_flow = cache.load(flow_path)
+    assert cache.load(flow_path) is compiled_flow
+    assert compiled_flow.flow[0]['actionParams']['HTMLtype'] == 'h1'
+    # the compiled flow is shared between the works - immutable
+    try:
+        compiled_flow.flow[0]['actionParams']['HTMLtype'] = 'h2'
+        assert False, 'expected TypeError'
+    except TypeError:
+        pass
+
+    # same size, new mtime
+    with open(flow_path, 'w') as file:
+        file.write(FLOW.replace('h1', 'h2'))
+    stat = os.stat(flow_path)
+    os.utime(flow_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    changed_flow = cache.load(flow_path)
+    assert changed_flow is not compiled_flow and changed_flow.flow[0]['actionParams']['HTMLtype'] == 'h2'
+    assert changed_flow.fingerprint != compiled_flow.fingerprint
+
+    # same mtime, new size
+    stat = os.stat(flow_path)
+    with open(flow_path, 'w') as file:
+        file.write(FLOW.replace('h1', 'h3 '))
+    os.utime(flow_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert cache.load(flow_path).flow[0]['actionParams']['HTMLtype'] == 'h3'
+
+    # inline flows are keyed by their content, the least recently used flows are evicted
+    inline_flow = {'flow': [{'actionName': 'path', 'actionParams': {'type': 'all', 'HTMLtype': 'a'}}]}
+    compiled_inline = cache.load_inline(inline_flow)
+    assert cache.load_inline(dict(inline_flow)) is compiled_inline
+    cache.load_inline(FLOW)
+    assert len(cache._flows) == 2 and cache.load_inline(inline_flow) is compiled_inline
+
+    # invalid flow is not cached
+    try:
+        cache.load_inline({'flow': [{'actionName': 'unknownAction'}]})
+        assert False, 'expected ScrapFlowError'
+    except ScrapFlowError:
+        pass
+    print('scrap flow cache - ok')
+
+
+test()
@@ -0,0 +1,69 @@
+import logging
+import os
+import socket
+import tempfile
+
+import requests
+
+from StandInHttpServer import start_stand_in_server
+from WebSitesScrapingWorker import *
+from ScrapMetrics import build_report
+
+NUM_OF_PAGES = 5
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test():
+    logging.basicConfig(format='[%(asctime)s -%(levelname)s] (%(processName)-10s) %(message)s')
+    out_dir = tempfile.mkdtemp()
+    metrics_dir = tempfile.mkdtemp()
+    pages = {f'/page_{idx}.html': '<html><body><table><tr><th>k</th></tr>' +
+             ''.join(f'<tr><td>{idx}-{row}</td></tr>' for row in range(10)) + '</table></body></html>'
+             for idx in range(NUM_OF_PAGES)}
+    server, base_url = start_stand_in_server(pages)
+
+    flow = {'flow': [{'actionName': 'table2csv', 'actionParams': {},
+                      'subActions': [{'actionName': 'saveToFile', 'actionType': 'rec',
+                                      'actionParams': {'to': 'rows', 'longName': False, 'fileType': 'csv',
+                                                       'dir': out_dir, 'name_prefix': '$title'}}]}]}
+    port = free_port()
+    metrics_config = {'dir': metrics_dir, 'port': port, 'flushInterval': 0}
+    worker = WebSiteScarperWorker()
+    for idx in range(NUM_OF_PAGES):
+        worker.work({'params': {'worker_driver': 'WebSitesScrapingWorker', 'title': f'page_{idx}',
+                                'metrics': metrics_config},
+                     'payload': {'inline_scrap_flow': flow, 'url_to_scrap': f'{base_url}/page_{idx}.html'}})
+    # missing page - the flow fails on the empty page
+    try:
+        worker.work({'params': {'worker_driver': 'WebSitesScrapingWorker', 'metrics': metrics_config},
+                     'payload': {'inline_scrap_flow': flow, 'url_to_scrap': f'{base_url}/missing.html'}})
+    except IndexError:
+        pass
+    server.shutdown()
+
+    report = build_report(metrics_dir)
+    assert report['stages']['fetch']['http']['count'] == NUM_OF_PAGES + 1, report
+    assert report['stages']['parse']['html.parser']['count'] == NUM_OF_PAGES + 1, report
+    assert report['stages']['action']['table2csv']['count'] == NUM_OF_PAGES + 1, report
+    assert report['stages']['action']['saveToFile']['count'] == NUM_OF_PAGES, report
+    assert report['stages']['scrap']['page']['count'] == NUM_OF_PAGES + 1, report
+    counters = report['counters']
+    assert counters['pages_scraped'] == NUM_OF_PAGES and counters['pages_failed'] == 1, counters
+    assert counters['rows'] == NUM_OF_PAGES * 10, counters
+    assert counters['fetched_bytes'] == sum(len(page) for page in pages.values()), counters
+
+    # prometheus endpoint of the process
+    text = requests.get(f'http://127.0.0.1:{port}/metrics').text
+    assert f'scraper_stage_seconds_count{{stage="action",name="saveToFile"}} {NUM_OF_PAGES}' in text, text
+    assert f'scraper_stage_seconds_bucket{{stage="action",name="saveToFile",le="+Inf"}} {NUM_OF_PAGES}' in text
+    assert f'scraper_rows_total {NUM_OF_PAGES * 10}' in text
+    assert requests.get(f'http://127.0.0.1:{port}/report.json').json()['counters'] == counters
+    print('scrap metrics - ok')
+
+
+test()
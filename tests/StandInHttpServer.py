@@ -0,0 +1,75 @@
+import hashlib
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    '''
+    Serve the pages dict of the server - {path: html}, sleep `latency` seconds before every response.
+    Every page has an ETag - conditional requests of unchanged pages get 304
+    Keep alive (HTTP/1.1) - server.connections_count is the number of tcp connections that were opened
+    server.max_in_flight is the max number of requests that were served at the same time
+    '''
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.counters_lock:
+            self.server.connections_count += 1
+
+    def do_GET(self):
+        with self.server.counters_lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+        try:
+            self._get()
+        finally:
+            with self.server.counters_lock:
+                self.server.in_flight -= 1
+
+    def _get(self):
+        time.sleep(self.server.latency)
+        self.server.requests_count += 1
+        page = self.server.pages.get(self.path)
+        if page is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = page.encode('utf-8') if isinstance(page, str) else page
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stand_in_server(pages, latency=0.0, port=0):
+    '''
+    Start a local http server on a background thread
+    :param pages: {path: html}
+    :param latency: seconds to wait before every response
+    :return: (server, base url) - call server.shutdown() when done
+    '''
+    server = ThreadingHTTPServer(('127.0.0.1', port), StandInHandler)
+    server.daemon_threads = True
+    server.pages = pages
+    server.latency = latency
+    server.requests_count = 0
+    server.connections_count = 0
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.counters_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
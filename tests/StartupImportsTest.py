@@ -0,0 +1,16 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from StartupBenchmark import measure_startup
+
+
+def test():
+    # the heavy dependencies are imported on their first use, not by the worker import
+    result = measure_startup()
+    assert result['loadedModules'] == [], result['loadedModules']
+    print(f'startup imports - ok ({result["importSeconds"]:.3f}s, {result["peakRssMb"]:.1f} MB)')
+
+
+test()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+
+from WebSitesScrapingWorker import *
+from HtmlParsers import parse_html
+
+PAGE = '''<html><body>
+<div id="t0"><table class="data"><tr><th>Name</th><th>Age x</th></tr>
+<tr><td> a  "b" </td><td>1</td></tr><tr><td>c  d</td></tr><tr><td>skip</td><td>1</td><td>2</td></tr></table></div>
+<div id="t1"><table class="data"><tr><th>Name</th><th>City</th><th>Name</th></tr>
+<tr><td>e</td><td>f</td><td>g</td></tr></table></div>
+<div id="t2"><table><tr><th>Other</th></tr><tr><td>h</td></tr></table></div>
+</body></html>'''
+
+
+def test():
+    worker = WebSiteScarperWorker()
+    for parser in ('html.parser', 'lxml', 'selectolax', 'lxml.html'):
+        soup = parse_html(PAGE, parser)
+        ctx = ExecutionContext()
+        ctx.execution_vars['pages'] = ['p0', 'p1']
+        data_frame = worker.tables2csv(soup, class_='data', pre_defined_columns={'page': '$pages.pop'},
+                                       num_of_column_to_enforce=-1, ctx=ctx)
+        # the columns of the tables are aligned by name, cells without header are in unnamed column
+        assert list(data_frame.columns) == ['table_id', 'page', 'Name', 'Age_x', '', 'City', 'Name'], parser
+        assert data_frame.fillna('').values.tolist() == [[0, 'p0', 'a b', '1', '', '', ''],
+                                                         [0, 'p0', 'c d', '', '', '', ''],
+                                                         [0, 'p0', 'skip', '1', '2', '', ''],
+                                                         [1, 'p1', 'e', '', '', 'f', 'g']], \
+            (parser, data_frame.values.tolist())
+
+        # same cells as table2csv of every table
+        for table_id, num_of_columns in ((0, 2), (1, 3)):
+            table = worker.table2csv(soup.find('div', id=f't{table_id}'), num_of_column_to_enforce=num_of_columns)
+            rows = worker.tables2csv(soup, class_='data', num_of_column_to_enforce=num_of_columns)
+            rows = rows[rows['table_id'] == table_id].drop(columns='table_id').dropna(axis=1, how='all')
+            assert list(rows.columns) == list(table.columns), (parser, list(rows.columns))
+            assert rows.values.tolist() == table.values.tolist(), (parser, rows.values.tolist())
+    print('tables2csv - ok')
+
+
+def test_tree_branches():
+    out_dir = tempfile.mkdtemp()
+    page = ('<html><body><main id="content"></main>'
+            '<h2>a</h2><div><table><tr><th>k</th></tr><tr><td>1</td></tr><tr><td>2</td></tr></table></div><span></span>'
+            '<h2>b</h2><div><table><tr><th>k</th></tr><tr><td>3</td></tr></table></div><span></span>'
+            '<h2>c</h2><footer id="end"></footer></body></html>')
+    flow = {'flow': [{'actionName': 'path', 'actionParams': {'type': 'single', 'HTMLtype': 'main', 'id': 'content'},
+                      'subActions': [{'actionName': 'buildConnectionTree', 'actionType': 'rec',
+                                      'actionParams': {'treeRelations': 'h2.div',
+                                                       'EndingPoint': {'footer': {'id': 'end'}}},
+                                      'subActions': [{'actionName': 'treeBranches2csv', 'actionType': 'rec',
+                                                      'actionParams': {'idxOfHtmlTable': 1,
+                                                                       'preDefinedColumns': {'section': '[0]'}},
+                                                      'subActions': [{'actionName': 'saveToFile',
+                                                                      'actionParams': {'to': 'branches',
+                                                                                       'longName': False,
+                                                                                       'fileType': 'csv',
+                                                                                       'dir': out_dir}}]}]}]}]}
+    worker = WebSiteScarperWorker()
+    msg = {'params': {'title': 'tree', 'dedupContent': False},
+           'payload': {'url_to_scrap': 'http://example.com/tree.html'}}
+    worker.scrap_page(msg, page, worker.load_flow({'inline_scrap_flow': flow}))
+    with open(os.path.join(out_dir, 'branches.csv')) as file:
+        assert file.read().split() == ['table_id,section,k', '0,a,1', '0,a,2', '1,b,3']
+    print('treeBranches2csv - ok')
+
+
+test()
+test_tree_branches()
@@ -0,0 +1,62 @@
+import os
+import tempfile
+
+from WebSitesScrapingWorker import *
+from HtmlParsers import parse_html
+
+ROWS = ''.join(f'<tr><td>{idx}</td><td> value, "{idx}" </td><td>x</td></tr>' for idx in range(50))
+PAGE = (f'<html><body><table class="data"><tr><th>id</th><th>value</th><th>extra</th></tr>{ROWS}'
+        f'<tr><td>short</td></tr></table></body></html>')
+
+
+def build_ctx(execution_vars):
+    ctx = ExecutionContext()
+    ctx.execution_vars.update(execution_vars)
+    return ctx
+
+
+def test():
+    worker = WebSiteScarperWorker()
+    soup = parse_html(PAGE, 'html.parser')
+    ctx = build_ctx({'section': 'fixed', 'pages': ['first', 'second']})
+    columns = {'section': '$section', 'page': '$pages.pop', 'static': 'static value'}
+
+    data_frame = worker.table2csv(soup, class_='data', pre_defined_columns=columns, ctx=ctx)
+    table_stream = worker.table2csv(soup, class_='data', pre_defined_columns=columns, stream=True, ctx=ctx)
+    # the vars are resolved when the action run, not when the rows are consumed
+    assert ctx.execution_vars['pages'] == []
+    assert table_stream.header == list(data_frame.columns)
+    rows = list(table_stream)
+    assert {row[1] for row in rows} == {'second'} and set(data_frame['page']) == {'first'}
+    # short rows - padded by the DataFrame (NaN) and when the stream is written
+    assert [row[2:] for row in rows[:-1]] == [row[2:] for row in data_frame.values.tolist()[:-1]]
+    assert rows[-1][3:] == ['short'] and len(rows) == len(data_frame)
+    # the stream is consumed once
+    assert list(table_stream) == []
+
+    # saveToFile writes the stream in the to_csv dialect
+    out_dir = tempfile.mkdtemp()
+    data_frame.to_csv(os.path.join(out_dir, 'data_frame.csv'), index=False, sep=',', encoding='utf-8')
+    ctx = build_ctx({'section': 'fixed', 'pages': ['first']})
+    worker.execute_action(soup, {'actionName': 'table2csv',
+                                 'actionParams': {'class': 'data', 'stream': True, 'preDefinedColumns': columns},
+                                 'subActions': [{'actionName': 'saveToFile',
+                                                 'actionParams': {'to': 'stream', 'longName': False,
+                                                                  'fileType': 'csv', 'dir': out_dir}}]}, ctx)
+    with open(os.path.join(out_dir, 'data_frame.csv')) as file, open(os.path.join(out_dir, 'stream.csv')) as stream:
+        assert file.read() == stream.read()
+
+    ctx = build_ctx({'section': 'fixed', 'pages': ['first']})
+    worker.execute_action(soup, {'actionName': 'table2csv',
+                                 'actionParams': {'class': 'data', 'stream': True, 'preDefinedColumns': columns},
+                                 'subActions': [{'actionName': 'saveToFile',
+                                                 'actionParams': {'to': 'stream', 'longName': False,
+                                                                  'fileType': 'jsonl', 'dir': out_dir}}]}, ctx)
+    with open(os.path.join(out_dir, 'stream.jsonl')) as file:
+        lines = [json.loads(line) for line in file]
+    assert len(lines) == 51 and lines[-1] == {'section': 'fixed', 'page': 'first', 'static': 'static value',
+                                              'id': 'short', 'value': None, 'extra': None}, lines[-1]
+    print('table stream - ok')
+
+
+test()
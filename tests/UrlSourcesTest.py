@@ -0,0 +1,40 @@
+import gzip
+import json
+import os
+import tempfile
+
+import UrlSources
+from UrlSources import iter_url_source
+
+
+def test():
+    # tiny chunks - the json values are split between chunks
+    UrlSources.READ_CHUNK_SIZE = 7
+    tmp_dir = tempfile.mkdtemp()
+    content = {'docs': ['http://x/1', 'http://x/"2'], 'empty': [], 'more': ['http://y/é']}
+    expected = [('docs', 'http://x/1'), ('docs', 'http://x/"2'), ('more', 'http://y/é')]
+
+    json_path = os.path.join(tmp_dir, 'urls.json')
+    with open(json_path, 'w') as file:
+        json.dump(content, file, indent=2)
+    assert list(iter_url_source(json_path)) == expected
+
+    with gzip.open(json_path + '.gz', 'wt') as file:
+        json.dump(content, file)
+    assert list(iter_url_source(json_path + '.gz')) == expected
+
+    sources = {
+        'urls.jsonl': ('"http://a"\n{"url": "http://b", "title": "t"}\n', [(None, 'http://a'), ('t', 'http://b')]),
+        'urls.csv': ('title,url\nt,http://a\n,http://b\n', [('t', 'http://a'), (None, 'http://b')]),
+        'no_header.csv': ('http://a,t\nhttp://b\n', [('t', 'http://a'), (None, 'http://b')]),
+        'urls.txt': ('# comment\nhttp://a\n\n http://b \n', [(None, 'http://a'), (None, 'http://b')]),
+    }
+    for name, (text, expected) in sources.items():
+        path = os.path.join(tmp_dir, name)
+        with open(path, 'w') as file:
+            file.write(text)
+        assert list(iter_url_source(path)) == expected, name
+    print('url sources - ok')
+
+
+test()